@@ -0,0 +1,123 @@
+"""Seeded synthetic maps for benchmarks.
+
+generate() builds one map; SCENARIOS are the named profiles the suite
+runs on every size in rules.MAP_SHAPES. The same (size, profile, seed)
+always gives the same map.
+"""
+import random
+
+from map_state import MapState
+from rules import MAP_SHAPES, TECHS
+
+# Tech sets from a single lumber chain to a fully researched economy tree
+TECH_SETS = {
+    'early': frozenset({'hunting', 'forestry', 'mathematics', 'riding', 'roads', 'trade'}),
+    'mid': frozenset({
+        'climbing', 'mining', 'hunting', 'forestry', 'mathematics', 'organization',
+        'farming', 'riding', 'roads', 'trade',
+    }),
+    'full': frozenset(TECHS),
+}
+
+# city_density is cities and villages per 100 tiles; the ratios are the share
+# of land tiles with forest, crop and fruit or animal, and of mountains with metal.
+SCENARIOS = {
+    'sparse': dict(city_density=1.5, expanded=0.0, forest=0.35, crop=0.1, wild=0.1,
+                   metal=0.3, mountains=0.08, water=0.15, techs='early'),
+    'typical': dict(city_density=2.5, expanded=0.3, forest=0.25, crop=0.2, wild=0.08,
+                    metal=0.5, mountains=0.1, water=0.12, techs='mid'),
+    'dense': dict(city_density=4.0, expanded=0.6, forest=0.2, crop=0.3, wild=0.05,
+                  metal=0.6, mountains=0.12, water=0.08, techs='full'),
+}
+
+
+def generate(size, seed=0, city_density=2.5, expanded=0.3, forest=0.25, crop=0.2, wild=0.08,
+             metal=0.5, mountains=0.1, water=0.12, villages=0.3):
+    """A size x size MapState drawn from seed.
+
+    Mountains come in ranges and water in lakes and coast rather than
+    scattered tiles. Cities and villages are at least three tiles apart;
+    villages is the share of them left as villages, and expanded the share
+    of cities at border level 2.
+    """
+    if size not in MAP_SHAPES:
+        raise ValueError(f"Unsupported map size: {size}")
+    rng = random.Random(f"{size}/{seed}")
+    tiles = size * size
+    terrain = {(r, c): 'land' for r in range(size) for c in range(size)}
+
+    # Coast along one or two edges, then lakes, grown as blobs
+    for edge in rng.sample(('top', 'bottom', 'left', 'right'), rng.randint(1, 2)):
+        depth = max(1, size // 12)
+        for i in range(size):
+            for d in range(rng.randint(0, depth)):
+                r, c = {
+                    'top': (d, i), 'bottom': (size - 1 - d, i),
+                    'left': (i, d), 'right': (i, size - 1 - d),
+                }[edge]
+                terrain[(r, c)] = 'ocean' if d == 0 else 'water'
+    _grow(terrain, rng, 'water', int(tiles * water), blobs=max(1, size // 8))
+    _grow(terrain, rng, 'mountain', int(tiles * mountains), blobs=max(1, size // 6),
+          walk=True)
+
+    resources = {}
+    for pos, t in terrain.items():
+        roll = rng.random()
+        if t == 'land':
+            if roll < forest:
+                resources[pos] = 'forest'
+            elif roll < forest + crop:
+                resources[pos] = 'crop'
+            elif roll < forest + crop + wild:
+                resources[pos] = rng.choice(('fruit', 'animal'))
+        elif t == 'mountain' and roll < metal:
+            resources[pos] = 'metal'
+
+    centres = []
+    land = [pos for pos, t in terrain.items() if t == 'land']
+    rng.shuffle(land)
+    target = max(1, round(tiles * city_density / 100))
+    for r, c in land:
+        if len(centres) >= target:
+            break
+        if all(max(abs(r - x), abs(c - y)) >= 3 for x, y in centres):
+            centres.append((r, c))
+    cities, village_set = [], set()
+    for pos in centres:
+        if cities and rng.random() < villages:
+            village_set.add(pos)
+            continue
+        resources.pop(pos, None)
+        cities.append({
+            'id': len(cities) + 1, 'row': pos[0], 'col': pos[1], 'population': 1,
+            'border_level': 2 if rng.random() < expanded else 1,
+        })
+    return MapState(terrain=terrain, resources=resources, cities=tuple(cities),
+                    villages=frozenset(village_set))
+
+
+def scenario(size, name, seed=0):
+    """(state, techs) for the named SCENARIOS profile."""
+    options = dict(SCENARIOS[name])
+    techs = TECH_SETS[options.pop('techs')]
+    return generate(size, seed, **options), techs
+
+
+def _grow(terrain, rng, kind, count, blobs, walk=False):
+    """Turn about count land tiles into kind, spread over blobs patches."""
+    size = max(r for r, _ in terrain) + 1
+    per_blob = max(1, count // blobs)
+    for _ in range(blobs):
+        pos = (rng.randrange(size), rng.randrange(size))
+        frontier = [pos]
+        placed = 0
+        while frontier and placed < per_blob:
+            # Ranges follow a random walk; lakes grow from any frontier tile
+            r, c = frontier.pop() if walk else frontier.pop(rng.randrange(len(frontier)))
+            if terrain.get((r, c)) == 'land':
+                terrain[(r, c)] = kind
+                placed += 1
+            for dr, dc in rng.sample(((0, 1), (1, 0), (0, -1), (-1, 0)), 4 if not walk else 2):
+                nxt = (r + dr, c + dc)
+                if nxt in terrain and terrain[nxt] == 'land':
+                    frontier.append(nxt)
@@ -0,0 +1,78 @@
+"""Compare plain-dict and PersistentMap map layers.
+
+Run from the repository root: python -m benchmarks.persistent_maps
+
+For each map size, a layer with a value on most tiles is used as the parent
+and one child is derived per tile, as the optimizer does when it expands a
+step. Reports time per update and per lookup, and the memory held by all
+children kept alive at once.
+"""
+import random
+import time
+import tracemalloc
+
+from persistent_map import PersistentMap
+
+SIZES = (22, 30)
+FILL = 0.6
+
+
+def _layer(size, rng):
+    return {
+        (r, c): rng.choice(('lumber_hut', 'farm', 'mine', 'market'))
+        for r in range(size) for c in range(size)
+        if rng.random() < FILL
+    }
+
+
+def _dict_set(layer, pos, value):
+    return {**layer, pos: value}
+
+
+def _persistent_set(layer, pos, value):
+    return layer.set(pos, value)
+
+
+def _measure(parent, update, positions):
+    tracemalloc.start()
+    start = time.perf_counter()
+    children = [update(parent, pos, 'sawmill') for pos in positions]
+    update_time = time.perf_counter() - start
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for child in children[:50]:
+        for pos in positions:
+            child.get(pos)
+    lookup_time = time.perf_counter() - start
+    return {
+        'update_us': update_time / len(positions) * 1e6,
+        'lookup_ns': lookup_time / (len(positions) * min(len(children), 50)) * 1e9,
+        'children_kib': held / 1024,
+    }
+
+
+def run(seed=0):
+    rng = random.Random(seed)
+    results = {}
+    for size in SIZES:
+        layer = _layer(size, rng)
+        positions = [(r, c) for r in range(size) for c in range(size)]
+        results[size] = {
+            'dict': _measure(layer, _dict_set, positions),
+            'persistent': _measure(PersistentMap.from_mapping(layer), _persistent_set, positions),
+        }
+    return results
+
+
+def main():
+    print(f"{'size':>5} {'layer':>11} {'update us':>10} {'lookup ns':>10} {'children KiB':>13}")
+    for size, by_kind in run().items():
+        for kind, r in by_kind.items():
+            print(f"{size:>5} {kind:>11} {r['update_us']:>10.2f} {r['lookup_ns']:>10.1f} "
+                  f"{r['children_kib']:>13.0f}")
+
+
+if __name__ == '__main__':
+    main()
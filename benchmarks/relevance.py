@@ -0,0 +1,63 @@
+"""Measure how much relevance pruning shrinks greedy search.
+
+Run from the repository root: python -m benchmarks.relevance
+
+On the 'typical' benchmarks.maps scenario at several sizes, reports the
+legal moves at the start with and without pruning, the candidates greedy
+search scores over a whole run, the run time and the income reached.
+"""
+import time
+
+from benchmarks.maps import scenario
+from economics import total_income, building_value
+from moves import legal_moves
+from optimizer import optimize
+from relevance import relevant_actions
+
+SIZES = (11, 18, 30)
+SCENARIO = 'typical'
+
+
+def _run(state, techs, prune):
+    scored = 0
+
+    def score(s, actions):
+        nonlocal scored
+        scored += 1
+        return (total_income(s), building_value(s))
+
+    start = time.perf_counter()
+    result = optimize(state, techs, score, max_depth=200, prune=prune)
+    return {
+        'scored': scored,
+        'seconds': time.perf_counter() - start,
+        'income': result['income'],
+    }
+
+
+def run(seed=0):
+    results = {}
+    for size in SIZES:
+        state, techs = scenario(size, SCENARIO, seed)
+        relevant = relevant_actions(state, techs)
+        results[size] = {
+            'moves': len(legal_moves(state, techs)),
+            'relevant_moves': len(legal_moves(state, techs, relevant)),
+            'all': _run(state, techs, prune=False),
+            'pruned': _run(state, techs, prune=True),
+        }
+    return results
+
+
+def main():
+    print(f"{'size':>5} {'moves':>12} {'scored':>16} {'seconds':>14} {'income':>10}")
+    for size, r in run().items():
+        full, pruned = r['all'], r['pruned']
+        print(f"{size:>5} {r['moves']:>5} -> {r['relevant_moves']:<4} "
+              f"{full['scored']:>7} -> {pruned['scored']:<6} "
+              f"{full['seconds']:>6.2f} -> {pruned['seconds']:<5.2f} "
+              f"{full['income']:>4} -> {pruned['income']:<3}")
+
+
+if __name__ == '__main__':
+    main()
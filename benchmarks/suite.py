@@ -0,0 +1,192 @@
+"""Time the engine's hot paths and full optimize runs on synthetic maps.
+
+Run from the repository root:
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --compare baseline.json
+    python -m benchmarks.suite --compare baseline.json --current results.json
+
+Every size in rules.MAP_SHAPES is run with each benchmarks.maps scenario.
+Per case it times legal_moves, apply_action over every legal move,
+total_income and territory_ownership on a mid-game state (caches cleared),
+and a full greedy optimize from the empty map; each timing is the best of
+--repeat runs. --compare reads a stored baseline and exits with status 1
+if any timing got more than --threshold slower or any income dropped;
+without --current it runs the suite first.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+from actions import apply_action
+from benchmarks.maps import SCENARIOS, scenario
+from economics import total_income, building_value
+from map_state import MapState
+from moves import legal_moves
+from optimizer import optimize
+from rules import MAP_SHAPES
+
+OPTIMIZE_DEPTH = 40
+
+
+def _score(state, actions):
+    return (total_income(state), building_value(state), -actions.cost)
+
+
+def _fresh(state):
+    """A copy of state with no cached territory, income or hash."""
+    return MapState(
+        terrain=state.terrain, resources=state.resources, buildings=state.buildings,
+        cities=state.cities, villages=state.villages, monuments=state.monuments,
+        lighthouses=state.lighthouses,
+    )
+
+
+def _best(fn, repeat):
+    """Best wall time of fn over repeat runs, in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_case(size, name, seed=0, repeat=5):
+    state, techs = scenario(size, name, seed)
+    # Every run starts from a copy with no caches, so later runs gain nothing
+    results = []
+    optimize_seconds = _best(
+        lambda: results.append(optimize(_fresh(state), techs, _score, max_depth=OPTIMIZE_DEPTH)),
+        repeat,
+    )
+    result = results[0]
+
+    # A mid-game state: half of the plan built
+    middle = state
+    for action in result['actions'][:len(result['actions']) // 2]:
+        middle = apply_action(middle, action)
+    middle = _fresh(middle)
+    moves = legal_moves(middle, techs)
+
+    def apply_all():
+        for action in moves:
+            apply_action(middle, action)
+
+    return {
+        'tiles': len(state.terrain),
+        'cities': len(state.cities),
+        'moves': len(moves),
+        'income': result['income'],
+        'seconds': {
+            'legal_moves': _best(lambda: legal_moves(middle, techs), repeat),
+            'apply_action': _best(apply_all, repeat) / max(len(moves), 1),
+            'total_income': _best(lambda: total_income(_fresh(middle)), repeat),
+            'territory_ownership': _best(lambda: _fresh(middle).territory_ownership(), repeat),
+            'optimize': optimize_seconds,
+        },
+    }
+
+
+def run(sizes=None, scenarios=None, seed=0, repeat=5):
+    cases = {}
+    for size in sorted(sizes or MAP_SHAPES):
+        for name in scenarios or SCENARIOS:
+            cases[f"{size}/{name}"] = run_case(size, name, seed, repeat)
+    return {
+        'python': platform.python_version(),
+        'seed': seed,
+        'repeat': repeat,
+        'cases': cases,
+    }
+
+
+def compare(baseline, current, threshold=0.25):
+    """Return (case, metric, baseline, current, verdict) rows and whether any regressed.
+
+    verdict is 'slower' or 'faster' when a timing moved by more than
+    threshold as a fraction of the baseline, 'lower income' when the
+    optimized income dropped, and '' otherwise. Cases missing from either
+    side are skipped.
+    """
+    rows = []
+    regressed = False
+    for case, now in current['cases'].items():
+        before = baseline['cases'].get(case)
+        if before is None:
+            continue
+        for metric, seconds in now['seconds'].items():
+            old = before['seconds'].get(metric)
+            if old is None:
+                continue
+            verdict = ''
+            if seconds > old * (1 + threshold):
+                verdict = 'slower'
+                regressed = True
+            elif seconds < old / (1 + threshold):
+                verdict = 'faster'
+            rows.append((case, metric, old, seconds, verdict))
+        if now['income'] < before['income']:
+            rows.append((case, 'income', before['income'], now['income'], 'lower income'))
+            regressed = True
+    return rows, regressed
+
+
+def _print_results(results):
+    metrics = ('legal_moves', 'apply_action', 'total_income', 'territory_ownership', 'optimize')
+    print(f"{'case':>12} {'moves':>6} {'income':>6} " + ' '.join(f"{m:>19}" for m in metrics))
+    for case, r in results['cases'].items():
+        timings = ' '.join(f"{r['seconds'][m] * 1e3:>16.3f} ms" for m in metrics)
+        print(f"{case:>12} {r['moves']:>6} {r['income']:>6} {timings}")
+
+
+def _print_comparison(rows):
+    print(f"{'case':>12} {'metric':>19} {'baseline':>12} {'current':>12} {'change':>8}")
+    for case, metric, old, new, verdict in rows:
+        if metric == 'income':
+            print(f"{case:>12} {metric:>19} {old:>12} {new:>12} {'':>8}  {verdict}")
+            continue
+        change = (new / old - 1) * 100 if old else 0.0
+        print(f"{case:>12} {metric:>19} {old * 1e3:>9.3f} ms {new * 1e3:>9.3f} ms "
+              f"{change:>+7.1f}%  {verdict}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', choices=sorted(MAP_SHAPES))
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', metavar='BASELINE', help='baseline JSON to compare with')
+    parser.add_argument('--current', help='compare this results file instead of running')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='slowdown fraction flagged as a regression (default 0.25)')
+    args = parser.parse_args(argv)
+
+    if args.current:
+        with open(args.current) as f:
+            results = json.load(f)
+    else:
+        results = run(args.sizes, args.scenarios, args.seed, args.repeat)
+        _print_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows, regressed = compare(baseline, results, args.threshold)
+        print()
+        _print_comparison(rows)
+        if regressed:
+            print('\nRegressions against', args.compare)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
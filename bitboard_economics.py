@@ -0,0 +1,58 @@
+from bitboard_state import layout, bits
+from rules import MULTIPLIERS, MARKET_CAP, RULES
+
+_MARKET = RULES.building_ids['market']
+_MULTIPLIERS = [
+    (RULES.building_ids[name], RULES.building_ids[m['resource']], m['weight'])
+    for name, m in MULTIPLIERS.items()
+]
+
+
+def multiplier_levels(state):
+    """Map the bit index of every multiplier to its level.
+
+    A level is the popcount of the multiplier's neighbourhood intersected
+    with its resource building's board, times the weight.
+    """
+    _, _, neighbourhoods = layout(state.size)
+    boards = state.building_boards
+    levels = {}
+    for code, resource, weight in _MULTIPLIERS:
+        for i in bits(boards[code]):
+            levels[i] = weight * (neighbourhoods[i] & boards[resource]).bit_count()
+    return levels
+
+
+def market_raw(state, levels=None):
+    """Map the bit index of every market to its uncapped sum of adjacent levels."""
+    if levels is None:
+        levels = multiplier_levels(state)
+    _, _, neighbourhoods = layout(state.size)
+    multipliers = 0
+    for code, _, _ in _MULTIPLIERS:
+        multipliers |= state.building_boards[code]
+    return {
+        i: sum(levels[j] for j in bits(neighbourhoods[i] & multipliers))
+        for i in bits(state.building_boards[_MARKET])
+    }
+
+
+def levels(state):
+    """(multiplier levels, market raw sums) keyed by position, as economics caches them."""
+    stride = state.size + 1
+    multipliers = multiplier_levels(state)
+    markets = market_raw(state, multipliers)
+    return (
+        {divmod(i, stride): level for i, level in multipliers.items()},
+        {divmod(i, stride): raw for i, raw in markets.items()},
+    )
+
+
+def total_income(state):
+    return sum(min(raw, MARKET_CAP) for raw in market_raw(state).values())
+
+
+def building_value(state):
+    """economics.building_value computed from the boards."""
+    multipliers = multiplier_levels(state)
+    return sum(multipliers.values()) + state.built.bit_count() - len(multipliers)
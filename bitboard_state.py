@@ -0,0 +1,405 @@
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+
+import zobrist
+from grid_state import shape_for
+from map_state import MapState, _city_rehash
+from rules import RULES
+
+
+@lru_cache(maxsize=None)
+def layout(size):
+    """Bit geometry of a size x size board.
+
+    Tile (r, c) is bit r * (size + 1) + c; the spare bit closing each row
+    stops horizontal shifts wrapping onto the next row. Returns
+    (stride, full, neighbourhoods) where full has every tile's bit set and
+    neighbourhoods[i] is the board of bit i's up to 8 neighbours.
+    """
+    stride = size + 1
+    row = (1 << size) - 1
+    full = 0
+    for r in range(size):
+        full |= row << r * stride
+    neighbourhoods = [0] * (size * stride)
+    for r in range(size):
+        for c in range(size):
+            i = r * stride + c
+            neighbourhoods[i] = neighbours(1 << i, size, stride, full)
+    return stride, full, tuple(neighbourhoods)
+
+
+def neighbours(board, size, stride=None, full=None):
+    """Board of every tile adjacent to a tile in board, by shift-and-or."""
+    if stride is None:
+        stride, full, _ = layout(size)
+    across = board << 1 | board >> 1
+    row = board | across
+    return (across | row << stride | row >> stride) & full
+
+
+def dilate(board, size):
+    """board grown by one tile in every direction."""
+    return board | neighbours(board, size)
+
+
+def bits(board):
+    """Indices of board's set bits, lowest first."""
+    while board:
+        low = board & -board
+        yield low.bit_length() - 1
+        board ^= low
+
+
+@dataclass(frozen=True, eq=False)
+class BitboardState:
+    """MapState equivalent with every layer as Python-int bitboards.
+
+    moves and economics recognise it and use mask arithmetic for legal
+    move sets and multiplier levels; elsewhere it stands in for MapState
+    through the same queries. terrain, resource and building boards are
+    tuples indexed by RULES id, with entry 0 unused, and territories
+    holds one board per city, in city order.
+    """
+    size: int
+    terrain_boards: tuple
+    resource_boards: tuple
+    building_boards: tuple
+    territories: tuple = ()
+    cities: tuple = ()
+    villages: frozenset = field(default_factory=frozenset)
+    monuments: frozenset = field(default_factory=frozenset)
+    lighthouses: frozenset = field(default_factory=frozenset)
+    # Full levels come from bitboard_economics.levels, read off the boards.
+    _income: object = field(default=None, repr=False)
+    # Matches MapState's hash for the same map; the first computation decodes every board.
+    _zobrist: int = field(default=None, repr=False)
+
+    @classmethod
+    def from_map_state(cls, state, size=None):
+        if size is None:
+            size = shape_for(state)
+        boards = []
+        for values, ids, count in (
+            (state.terrain, RULES.terrain_ids, len(RULES.terrains)),
+            (state.resources, RULES.resource_ids, len(RULES.resources)),
+            (state.buildings, RULES.building_ids, len(RULES.buildings)),
+        ):
+            layer = [0] * count
+            for pos, name in values.items():
+                layer[ids[name]] |= _bit(pos, size)
+            boards.append(tuple(layer))
+        terrain_boards, resource_boards, building_boards = boards
+        return cls(
+            size=size,
+            terrain_boards=terrain_boards,
+            resource_boards=resource_boards,
+            building_boards=building_boards,
+            territories=_territories(size, _or(terrain_boards), state.cities),
+            cities=state.cities,
+            villages=state.villages,
+            monuments=state.monuments,
+            lighthouses=state.lighthouses,
+        )
+
+    def to_map_state(self):
+        return MapState(
+            terrain=self.terrain,
+            resources=self.resources,
+            buildings=self.buildings,
+            cities=self.cities,
+            villages=self.villages,
+            monuments=self.monuments,
+            lighthouses=self.lighthouses,
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, BitboardState):
+            return NotImplemented
+        return (
+            self.size == other.size
+            and self.terrain_boards == other.terrain_boards
+            and self.resource_boards == other.resource_boards
+            and self.building_boards == other.building_boards
+            and self.cities == other.cities
+            and self.villages == other.villages
+            and self.monuments == other.monuments
+            and self.lighthouses == other.lighthouses
+        )
+
+    def __hash__(self):
+        return self.zobrist()
+
+    def index(self, pos):
+        """Bit index of pos, or None off the board."""
+        r, c = pos
+        if 0 <= r < self.size and 0 <= c < self.size:
+            return r * (self.size + 1) + c
+        return None
+
+    def positions(self, board):
+        """Set of the positions of board's set bits."""
+        stride = self.size + 1
+        return {divmod(i, stride) for i in bits(board)}
+
+    def _name_at(self, boards, names, pos):
+        i = self.index(pos)
+        if i is None:
+            return None
+        for code in range(1, len(boards)):
+            if boards[code] >> i & 1:
+                return names[code]
+        return None
+
+    def terrain_at(self, pos):
+        return self._name_at(self.terrain_boards, RULES.terrains, pos)
+
+    def resource_at(self, pos):
+        return self._name_at(self.resource_boards, RULES.resources, pos)
+
+    def building_at(self, pos):
+        return self._name_at(self.building_boards, RULES.buildings, pos)
+
+    def _layer_dict(self, boards, names):
+        stride = self.size + 1
+        return {
+            divmod(i, stride): names[code]
+            for code in range(1, len(boards))
+            for i in bits(boards[code])
+        }
+
+    @property
+    def terrain(self):
+        return self._layer_dict(self.terrain_boards, RULES.terrains)
+
+    @property
+    def resources(self):
+        return self._layer_dict(self.resource_boards, RULES.resources)
+
+    @property
+    def buildings(self):
+        return self._layer_dict(self.building_boards, RULES.buildings)
+
+    @property
+    def defined(self):
+        """Board of tiles with terrain."""
+        return _or(self.terrain_boards)
+
+    @property
+    def built(self):
+        """Board of tiles with a building."""
+        return _or(self.building_boards)
+
+    @property
+    def owned(self):
+        """Board of tiles in some city's territory."""
+        return _or(self.territories)
+
+    def defined_positions(self):
+        return self.positions(self.defined)
+
+    def occupied_positions(self):
+        return self.positions(self.built) | self.monuments | self.lighthouses
+
+    def is_occupied(self, pos):
+        i = self.index(pos)
+        return (
+            (i is not None and bool(self.built >> i & 1))
+            or pos in self.monuments or pos in self.lighthouses
+        )
+
+    def territory_ownership(self):
+        """Map each defined tile to the id of its owning city. First city claims contested tiles."""
+        stride = self.size + 1
+        return {
+            divmod(i, stride): city['id']
+            for city, board in zip(self.cities, self.territories)
+            for i in bits(board)
+        }
+
+    def owner_of(self, pos):
+        """Return the id of the city owning pos, or None."""
+        i = self.index(pos)
+        if i is None:
+            return None
+        for city, board in zip(self.cities, self.territories):
+            if board >> i & 1:
+                return city['id']
+        return None
+
+    def territory_of(self, city_id):
+        """Board of the tiles city_id owns."""
+        for city, board in zip(self.cities, self.territories):
+            if city['id'] == city_id:
+                return board
+        return 0
+
+    def tiles_owned_by(self, city_id):
+        """Return set of positions owned by a specific city."""
+        return frozenset(self.positions(self.territory_of(city_id)))
+
+    def city_has_building(self, city_id, building):
+        return bool(self.territory_of(city_id) & self.building_boards[RULES.building_ids[building]])
+
+    def tile_targets(self, techs):
+        """(action type, building, board) for every tile action, as _tile_moves orders them.
+
+        Each board holds the tiles where the action is legal now, found by
+        mask intersection: builds take eligible terrain/resource tiles that
+        are owned and free, minus the territories of cities that already
+        have a one-per-city building; terrain actions and harvests take
+        owned tiles with the resource they need. building is None for
+        actions other than builds, and boards are empty for actions techs
+        do not unlock.
+        """
+        tech_mask = RULES.tech_mask(techs)
+        available = RULES.available_buildings(tech_mask)
+        owned = self.owned
+        free = owned & ~self.built
+        for pos in self.monuments | self.lighthouses:
+            i = self.index(pos)
+            if i is not None:
+                free &= ~(1 << i)
+        eligible = _eligible_boards(self.terrain_boards, self.resource_boards)
+        targets = []
+        for code in range(1, len(RULES.buildings)):
+            board = 0
+            if available >> code & 1:
+                board = eligible[code] & free
+                if RULES.one_per_city >> code & 1:
+                    for territory in self.territories:
+                        if territory & self.building_boards[code]:
+                            board &= ~territory
+            targets.append(('build', RULES.buildings[code], board))
+
+        def unlocked(action_type):
+            unlock = RULES.action_unlock[RULES.action_ids[action_type]]
+            return RULES.unlocked(unlock, tech_mask)
+
+        forest = self.resource_boards[RULES.resource_ids['forest']] & owned
+        bare_land = (
+            self.terrain_boards[RULES.terrain_ids['land']] & free
+            & ~_or(self.resource_boards)
+        )
+        harvestable = 0
+        for code, unlock in enumerate(RULES.harvest_unlock):
+            if unlock & tech_mask:
+                harvestable |= self.resource_boards[code]
+        for action_type, board in (
+            ('clear_forest', forest),
+            ('burn_forest', forest),
+            ('grow_forest', bare_land),
+        ):
+            targets.append((action_type, None, board if unlocked(action_type) else 0))
+        targets.append(('harvest', None, harvestable & owned))
+        return targets
+
+    def zobrist(self):
+        """64-bit Zobrist hash, maintained incrementally by the with_* methods."""
+        if self._zobrist is None:
+            object.__setattr__(self, '_zobrist', zobrist.state_hash(self))
+        return self._zobrist
+
+    def _set(self, boards, pos, code):
+        bit = _bit(pos, self.size)
+        return tuple(
+            (board | bit) if i == code and code else (board & ~bit)
+            for i, board in enumerate(boards)
+        )
+
+    def with_building(self, pos, building):
+        """Return a new state with building placed at pos."""
+        h = self._zobrist
+        if h is not None:
+            h ^= zobrist.layer_delta('building', pos, self.building_at(pos), building)
+        return replace(
+            self, building_boards=self._set(self.building_boards, pos, RULES.building_ids[building]),
+            _income=None, _zobrist=h,
+        )
+
+    def with_resource(self, pos, resource):
+        """Return a new state with pos's resource replaced; None removes it."""
+        h = self._zobrist
+        if h is not None:
+            h ^= zobrist.layer_delta('resource', pos, self.resource_at(pos), resource)
+        return replace(
+            self, resource_boards=self._set(self.resource_boards, pos, RULES.resource_ids[resource]),
+            _zobrist=h,
+        )
+
+    def with_city(self, city, villages):
+        """Return a new state with city appended and villages replaced."""
+        cities = self.cities + (city,)
+        return replace(self, cities=cities, villages=villages,
+                       territories=_territories(self.size, self.defined, cities),
+                       _zobrist=_city_rehash(self._zobrist, self, cities, villages))
+
+    def with_border_level(self, city_id, border_level):
+        """Return a new state with one city's border level changed."""
+        cities = tuple(
+            {**c, 'border_level': border_level} if c['id'] == city_id else c
+            for c in self.cities
+        )
+        return replace(self, cities=cities,
+                       territories=_territories(self.size, self.defined, cities),
+                       _zobrist=_city_rehash(self._zobrist, self, cities, self.villages))
+
+
+def _bit(pos, size):
+    r, c = pos
+    if not (0 <= r < size and 0 <= c < size):
+        raise ValueError(f"{pos} is off a {size}x{size} board")
+    return 1 << r * (size + 1) + c
+
+
+def _or(boards):
+    total = 0
+    for board in boards:
+        total |= board
+    return total
+
+
+def _square(size, city):
+    """Board of city's border square, clipped to the map."""
+    stride = size + 1
+    radius = city['border_level']
+    r0, r1 = max(city['row'] - radius, 0), min(city['row'] + radius + 1, size)
+    c0, c1 = max(city['col'] - radius, 0), min(city['col'] + radius + 1, size)
+    if r0 >= r1 or c0 >= c1:
+        return 0
+    row = ((1 << c1 - c0) - 1) << c0
+    board = 0
+    for r in range(r0, r1):
+        board |= row << r * stride
+    return board
+
+
+def _territories(size, defined, cities):
+    """One board per city: its square's defined tiles not held by an earlier city."""
+    claimed = 0
+    territories = []
+    for city in cities:
+        board = _square(size, city) & defined & ~claimed
+        claimed |= board
+        territories.append(board)
+    return tuple(territories)
+
+
+def _eligible_boards(terrain_boards, resource_boards):
+    """Board of each building's eligible tiles, indexed by building id."""
+    no_resource = ~_or(resource_boards)
+    eligible = [0] * len(RULES.buildings)
+    for t, terrain in enumerate(terrain_boards):
+        if not terrain:
+            continue
+        for r in range(len(RULES.resources)):
+            mask = RULES.buildable[t][r]
+            if not mask:
+                continue
+            tiles = terrain & (resource_boards[r] if r else no_resource)
+            if not tiles:
+                continue
+            for code in range(1, len(eligible)):
+                if mask >> code & 1:
+                    eligible[code] |= tiles
+    return eligible
@@ -0,0 +1,335 @@
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product, repeat
+
+from actions import apply_action
+from economics import total_income
+from map_state import adjacent_positions
+from rules import MULTIPLIERS, MARKET_CAP, ONE_PER_CITY, can_build, available_with_techs
+
+# The resource building each multiplier counts, and its weight
+_RESOURCE = {name: (m['resource'], m['weight']) for name, m in MULTIPLIERS.items()}
+# Resource building placed on each resource in the ideal end state
+_FILL = {'forest': 'lumber_hut', 'crop': 'farm', 'metal': 'mine'}
+# Per-city placement order: multipliers first, then the market
+_SLOTS = ('sawmill', 'windmill', 'forge', 'market')
+# Combos a best reply tries between deadline checks
+DEADLINE_CHECK_EVERY = 64
+
+
+class Problem:
+    """
+    Per-city placement enumerations for one state and tech set.
+
+    base is the ideal end-state layout before any placement: the existing
+    buildings, a resource building on every free owned resource tile and a
+    market on every other free tile that can hold one. Each city gets one
+    entry (city id, combos, zone, context): combos lists every choice of at
+    most one sawmill, windmill, forge and extra market (on a tile the base
+    gives to a resource building) on its free tiles, as
+    ((pos, building), ...), empty first. zone holds the
+    tiles whose market income a combo can change and context the tiles
+    outside the territory that income depends on. market_swaps lists the
+    resource-building tiles that could hold a market instead.
+    """
+
+    def __init__(self, state, techs):
+        available = available_with_techs(techs)['buildings']
+        ownership = state.territory_ownership()
+        free = {
+            pos: city_id for pos, city_id in ownership.items()
+            if not state.is_occupied(pos)
+        }
+        self.base = dict(state.buildings)
+        for pos in free:
+            resource = state.resource_at(pos)
+            fill = _FILL.get(resource, 'market')
+            if fill in available and can_build(fill, state.terrain_at(pos), resource):
+                self.base[pos] = fill
+
+        def eligible(pos, building):
+            return building in available and can_build(
+                building, state.terrain_at(pos), state.resource_at(pos)
+            )
+
+        # A multiplier tile needs a resource building next to it to be worth anything
+        multiplier_tiles = {
+            pos for pos in free
+            for name, (resource, _) in _RESOURCE.items()
+            if eligible(pos, name)
+            and any(self.base.get(adj) == resource for adj in adjacent_positions(pos))
+        }
+        multiplier_tiles |= {pos for pos, b in state.buildings.items() if b in MULTIPLIERS}
+
+        self.cities = []
+        self.market_swaps = []
+        for city in state.cities:
+            tiles = sorted(pos for pos, city_id in free.items() if city_id == city['id'])
+            options = []
+            for slot in _SLOTS:
+                if slot in ONE_PER_CITY and state.city_has_building(city['id'], slot):
+                    candidates = []
+                elif slot == 'market':
+                    candidates = [
+                        pos for pos in tiles if eligible(pos, slot) and self.base.get(pos) != slot
+                        and any(adj in multiplier_tiles for adj in adjacent_positions(pos))
+                    ]
+                else:
+                    candidates = [
+                        pos for pos in tiles if pos in multiplier_tiles and eligible(pos, slot)
+                        and any(self.base.get(adj) == _RESOURCE[slot][0]
+                                for adj in adjacent_positions(pos))
+                    ]
+                options.append([None] + candidates)
+            combos = []
+            for choice in product(*options):
+                placed = [pos for pos in choice if pos is not None]
+                if len(placed) == len(set(placed)):
+                    combos.append(tuple(
+                        (pos, slot) for pos, slot in zip(choice, _SLOTS) if pos is not None
+                    ))
+            combos.sort(key=len)
+            self.market_swaps.extend(
+                pos for pos in tiles
+                if eligible(pos, 'market') and self.base.get(pos) not in (None, 'market')
+            )
+            zone = sorted(_within(tiles, 2))
+            context = sorted(_within(tiles, 4) - set(tiles))
+            self.cities.append((city['id'], combos, zone, context))
+
+    def layout(self, choices):
+        """Base layout with each city's chosen combo placed."""
+        layout = dict(self.base)
+        for (_, combos, _, _), choice in zip(self.cities, choices):
+            layout.update(combos[choice])
+        return layout
+
+
+def descend(problem, seed, responses=None, deadline=None):
+    """
+    One coordinate-descent run from a random start seeded by seed.
+
+    Each pass re-picks every city's best combo with the others fixed, until
+    a pass changes nothing or deadline (a time.monotonic() value) passes;
+    a city whose combos are cut short by the deadline takes the best of
+    those tried, if it beats its current one.
+    responses caches best replies by city and surrounding layout; pass the
+    same dict to reuse them across runs. Returns (income, choices,
+    converged) with one combo index per city.
+    """
+    if responses is None:
+        responses = {}
+    rng = random.Random(seed)
+    choices = [rng.randrange(len(combos)) for _, combos, _, _ in problem.cities]
+    layout = problem.layout(choices)
+
+    improved = True
+    while improved:
+        improved = False
+        for i, (city_id, combos, zone, context) in enumerate(problem.cities):
+            if deadline is not None and time.monotonic() >= deadline:
+                return _income(layout, list(layout)), tuple(choices), False
+            current = choices[i]
+            for pos, _ in combos[current]:
+                _restore(layout, problem.base, pos)
+            key = (city_id, tuple(layout.get(pos) for pos in context))
+            best = responses.get(key)
+            finished = True
+            if best is None:
+                best, finished = _best_reply(layout, combos, zone, deadline)
+                if finished:
+                    responses[key] = best
+            if best != current and _zone_income(layout, combos[best], zone) > _zone_income(
+                layout, combos[current], zone
+            ):
+                choices[i] = best
+                improved = True
+            layout.update(combos[choices[i]])
+            if not finished:
+                return _income(layout, list(layout)), tuple(choices), False
+
+    return _income(layout, list(layout)), tuple(choices), True
+
+
+def solve(state, techs, score_fn, restarts=8, patience=3, seed=0, workers=None,
+          deadline=None, report=None, pool=None):
+    """
+    Best plan over up to restarts coordinate-descent runs.
+
+    Run k uses seed + k, so the result does not depend on workers. Runs
+    are ranked by score_fn on the plan they produce, and the search stops
+    once patience runs in a row fail to beat the best so far. Past
+    deadline, runs stop where they are and the best plan is returned with
+    'complete' False; 'runs' counts the runs made. report(runs, state,
+    actions) is called whenever the best plan improves. pool, a shared
+    ProcessPoolExecutor, runs batches of workers runs instead of a pool
+    started for this call.
+    """
+    problem = Problem(state, techs)
+    best = None
+    since_improved = 0
+    batch = workers if workers and workers > 1 else 1
+    owned = batch > 1 and pool is None
+    if owned:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(problem,))
+    responses = {}
+    complete = True
+    runs = 0
+    try:
+        for start in range(0, restarts, batch):
+            if deadline is not None and time.monotonic() >= deadline:
+                complete = False
+                break
+            seeds = range(seed + start, seed + min(start + batch, restarts))
+            if batch == 1:
+                results = [descend(problem, s, responses, deadline) for s in seeds]
+            elif owned:
+                results = pool.map(_worker_descend, seeds, repeat(deadline))
+            else:
+                # A shared pool's workers serve other problems, so each run carries its own
+                results = pool.map(descend, repeat(problem), seeds, repeat(None), repeat(deadline))
+            for _, choices, converged in results:
+                complete = complete and converged
+                runs += 1
+                plan = _plan(state, problem, choices)
+                score = score_fn(plan['state'], plan['actions'])
+                if best is None or score > best[0]:
+                    best = (score, plan)
+                    since_improved = 0
+                    if report is not None:
+                        report(runs, plan['state'], plan['actions'])
+                else:
+                    since_improved += 1
+                if since_improved >= patience:
+                    break
+            if since_improved >= patience:
+                break
+    finally:
+        if owned:
+            pool.shutdown()
+    plan = _plan(state, problem, [0] * len(problem.cities)) if best is None else best[1]
+    return {**plan, 'complete': complete, 'runs': runs}
+
+
+def _plan(state, problem, choices):
+    """Build actions for choices, leaving out buildings that add no income."""
+    layout = problem.layout(choices)
+    _polish(layout, problem.market_swaps)
+    placed = {
+        pos: building for pos, building in layout.items()
+        if state.building_at(pos) is None
+    }
+    keep = {}
+    for pos, building in placed.items():
+        if building in MULTIPLIERS:
+            if _level(layout, pos) > 0 and any(
+                layout.get(adj) == 'market' for adj in adjacent_positions(pos)
+            ):
+                keep[pos] = building
+        elif building == 'market':
+            if _market_raw(layout, pos) > 0:
+                keep[pos] = building
+    for pos, building in placed.items():
+        if building not in MULTIPLIERS and building != 'market' and any(
+            _RESOURCE.get(keep.get(adj) or state.building_at(adj), (None,))[0] == building
+            for adj in adjacent_positions(pos)
+        ):
+            keep[pos] = building
+
+    order = {building: rank for rank, building in enumerate(_SLOTS)}
+    actions = [
+        ('build', pos, building)
+        for pos, building in sorted(keep.items(), key=lambda item: (order.get(item[1], -1), item[0]))
+    ]
+    final = state
+    for action in actions:
+        final = apply_action(final, action)
+    return {'state': final, 'actions': actions, 'income': total_income(final)}
+
+
+def _polish(layout, swaps):
+    """Turn resource buildings into markets, one at a time, while that raises income."""
+    improved = True
+    while improved:
+        improved = False
+        for pos in swaps:
+            if layout[pos] == 'market':
+                continue
+            nearby = _within([pos], 2)
+            before = _income(layout, nearby)
+            old = layout[pos]
+            layout[pos] = 'market'
+            if _income(layout, nearby) > before:
+                improved = True
+            else:
+                layout[pos] = old
+
+
+def _best_reply(layout, combos, zone, deadline=None):
+    """(index of the best combo, whether every combo was tried before deadline)."""
+    best, best_income = 0, -1
+    for index, combo in enumerate(combos):
+        if deadline is not None and index and index % DEADLINE_CHECK_EVERY == 0:
+            if time.monotonic() >= deadline:
+                return best, False
+        income = _zone_income(layout, combo, zone)
+        if income > best_income:
+            best, best_income = index, income
+    return best, True
+
+
+def _zone_income(layout, combo, zone):
+    """Market income over zone with combo placed on top of layout."""
+    saved = {pos: layout[pos] for pos, _ in combo if pos in layout}
+    layout.update(combo)
+    total = _income(layout, zone)
+    for pos, _ in combo:
+        _restore(layout, saved, pos)
+    return total
+
+
+def _income(layout, positions):
+    return sum(
+        min(_market_raw(layout, pos), MARKET_CAP)
+        for pos in positions if layout.get(pos) == 'market'
+    )
+
+
+def _market_raw(layout, pos):
+    return sum(_level(layout, adj) for adj in adjacent_positions(pos) if layout.get(adj) in MULTIPLIERS)
+
+
+def _level(layout, pos):
+    resource, weight = _RESOURCE[layout[pos]]
+    return weight * sum(1 for adj in adjacent_positions(pos) if layout.get(adj) == resource)
+
+
+def _restore(layout, base, pos):
+    if pos in base:
+        layout[pos] = base[pos]
+    else:
+        layout.pop(pos, None)
+
+
+def _within(tiles, distance):
+    return {
+        (r + dr, c + dc)
+        for r, c in tiles
+        for dr in range(-distance, distance + 1)
+        for dc in range(-distance, distance + 1)
+    }
+
+
+_worker_problem = None
+_worker_responses = {}
+
+
+def _init_worker(problem):
+    global _worker_problem
+    _worker_problem = problem
+
+
+def _worker_descend(seed, deadline):
+    return descend(_worker_problem, seed, _worker_responses, deadline)
@@ -0,0 +1,88 @@
+from actions import validate_action, apply_action
+from map_state import MapState
+from rules import MAX_BORDER_LEVEL
+
+# Market income couples tiles at most two steps apart
+_REACH = 2
+
+
+def components(state):
+    """
+    Split state into sub-states that cannot affect each other's income.
+
+    Cities and villages are grouped when their largest possible territories
+    come within two tiles of each other; each group becomes a MapState
+    holding its cities and villages, in their original order, and every
+    tile within two tiles of those territories. Returns [state] when
+    everything is one group.
+    """
+    units = [((c['row'], c['col']), max(c['border_level'], MAX_BORDER_LEVEL)) for c in state.cities]
+    units += [(pos, MAX_BORDER_LEVEL) for pos in sorted(state.villages)]
+
+    parent = list(range(len(units)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, ((ri, ci), radius_i) in enumerate(units):
+        for j in range(i + 1, len(units)):
+            (rj, cj), radius_j = units[j]
+            if max(abs(ri - rj), abs(ci - cj)) <= radius_i + radius_j + _REACH:
+                parent[find(j)] = find(i)
+
+    groups = {}
+    for i in range(len(units)):
+        groups.setdefault(find(i), []).append(i)
+    if len(groups) <= 1:
+        return [state]
+
+    cities = state.cities
+    parts = []
+    for members in groups.values():
+        area = set()
+        for i in members:
+            (r, c), radius = units[i]
+            reach = radius + _REACH
+            area |= {
+                (r + dr, c + dc)
+                for dr in range(-reach, reach + 1)
+                for dc in range(-reach, reach + 1)
+            }
+        centres = {units[i][0] for i in members}
+        parts.append(MapState(
+            terrain={pos: t for pos, t in state.terrain.items() if pos in area},
+            resources={pos: r for pos, r in state.resources.items() if pos in area},
+            buildings={pos: b for pos, b in state.buildings.items() if pos in area},
+            cities=tuple(c for c in cities if (c['row'], c['col']) in centres),
+            villages=frozenset(pos for pos in state.villages if pos in centres),
+            monuments=frozenset(pos for pos in state.monuments if pos in area),
+            lighthouses=frozenset(pos for pos in state.lighthouses if pos in area),
+        ))
+    return parts
+
+
+def merge(state, techs, plans):
+    """
+    Replay each (part, actions) plan on the full state; return (state, actions).
+
+    City ids a part's found_city actions create are renumbered to the ids
+    they get on the full state, and any action that no longer validates
+    there is dropped.
+    """
+    merged = []
+    for part, actions in plans:
+        part_id = max((c['id'] for c in part.cities), default=0)
+        ids = {}
+        for action in actions:
+            if action[0] == 'found_city':
+                part_id += 1
+                ids[part_id] = max((c['id'] for c in state.cities), default=0) + 1
+            elif action[0] == 'expand_borders':
+                action = (action[0], ids.get(action[1], action[1]))
+            if validate_action(state, action, techs) is None:
+                state = apply_action(state, action)
+                merged.append(action)
+    return state, merged
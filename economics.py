@@ -1,9 +1,15 @@
+from dataclasses import dataclass
+
 from map_state import adjacent_positions
 from rules import (
     MULTIPLIERS, multiplier_resource, MARKET_CAP, is_multiplier,
     BUILDINGS, TERRAIN_ACTIONS, HARVEST_ACTIONS,
 )
 from actions import apply_action
+import bitboard_economics
+from bitboard_state import BitboardState
+from grid_state import GridState
+from grid_economics import score_candidates
 
 
 def multiplier_level(pos, state):
@@ -25,12 +31,139 @@ def market_income(pos, state):
     return min(total, MARKET_CAP)
 
 
+@dataclass
+class _IncomeLevels:
+    """Income bookkeeping cached on a MapState.
+
+    multipliers maps each multiplier to its level and markets maps each market
+    to its uncapped sum of adjacent levels. Both are None on states whose
+    totals were carried forward by apply_with_income; they are filled in the
+    first time the state is used as the parent of an income_delta.
+    """
+    total: int
+    value: int
+    multipliers: dict = None
+    markets: dict = None
+
+
+def _levels(state, full=False):
+    levels = state._income
+    if levels is None or (full and levels.multipliers is None):
+        if isinstance(state, BitboardState):
+            multipliers, markets = bitboard_economics.levels(state)
+            count = state.built.bit_count()
+        else:
+            multipliers = {
+                pos: multiplier_level(pos, state)
+                for pos, bldg in state.buildings.items()
+                if is_multiplier(bldg)
+            }
+            markets = {
+                pos: sum(multipliers.get(adj, 0) for adj in adjacent_positions(pos))
+                for pos, bldg in state.buildings.items()
+                if bldg == 'market'
+            }
+            count = len(state.buildings)
+        levels = _IncomeLevels(
+            total=sum(min(raw, MARKET_CAP) for raw in markets.values()),
+            value=sum(multipliers.values()) + count - len(multipliers),
+            multipliers=multipliers,
+            markets=markets,
+        )
+        object.__setattr__(state, '_income', levels)
+    return levels
+
+
 def total_income(state):
-    return sum(
-        market_income(pos, state)
-        for pos, bldg in state.buildings.items()
-        if bldg == 'market'
-    )
+    return _levels(state).total
+
+
+def building_value(state):
+    """Sum of multiplier levels plus one for every other building.
+
+    Used as a tiebreak that rewards building towards income before it pays.
+    """
+    return _levels(state).value
+
+
+def _deltas(state, action):
+    """Return (income, building value) change from applying a legal action."""
+    if action[0] != 'build':
+        return 0, 0
+    pos, building = action[1], action[2]
+    levels = _levels(state, full=True)
+
+    # Multipliers whose level changes, and by how much
+    changed = {}
+    if is_multiplier(building):
+        resource, weight = multiplier_resource(building)
+        changed[pos] = sum(
+            weight for adj in adjacent_positions(pos) if state.building_at(adj) == resource
+        )
+    else:
+        for adj in adjacent_positions(pos):
+            bldg = state.building_at(adj)
+            if bldg and is_multiplier(bldg):
+                resource, weight = multiplier_resource(bldg)
+                if resource == building:
+                    changed[adj] = weight
+
+    # Markets whose uncapped sum changes, and by how much
+    raw_changes = {}
+    for mult, change in changed.items():
+        for adj in adjacent_positions(mult):
+            if adj in levels.markets:
+                raw_changes[adj] = raw_changes.get(adj, 0) + change
+
+    income = 0
+    for market, change in raw_changes.items():
+        raw = levels.markets[market]
+        income += min(raw + change, MARKET_CAP) - min(raw, MARKET_CAP)
+    if building == 'market':
+        raw = sum(levels.multipliers.get(adj, 0) for adj in adjacent_positions(pos))
+        income += min(raw, MARKET_CAP)
+
+    value = sum(changed.values()) + (0 if is_multiplier(building) else 1)
+    return income, value
+
+
+def income_delta(state, action):
+    """Return the change in total income from applying a legal action to state.
+
+    Only the radius-2 neighbourhood of a build is examined; other actions
+    never change income.
+    """
+    return _deltas(state, action)[0]
+
+
+def apply_with_income(state, action):
+    """Apply action, carrying the parent's income and building value forward.
+
+    The new state's total_income and building_value are then O(1).
+    """
+    new_state = apply_action(state, action)
+    if new_state._income is None:
+        income, value = _deltas(state, action)
+        levels = _levels(state)
+        object.__setattr__(new_state, '_income', _IncomeLevels(
+            total=levels.total + income,
+            value=levels.value + value,
+        ))
+    return new_state
+
+
+def apply_all_with_income(state, actions):
+    """apply_with_income for every action; grid states are scored in one batch."""
+    if not isinstance(state, GridState) or not actions:
+        return [apply_with_income(state, action) for action in actions]
+    incomes, values = score_candidates(state, actions)
+    children = []
+    for action, income, value in zip(actions, incomes.tolist(), values.tolist()):
+        new_state = apply_action(state, action)
+        if new_state._income is None:
+            object.__setattr__(new_state, '_income', _IncomeLevels(total=income, value=value))
+        children.append(new_state)
+    return children
 
 
 def action_cost(action, state):
@@ -68,9 +201,7 @@ def action_population(action, state):
             return BUILDING_POPULATION[building]
         if is_multiplier(building):
             # Simulate placing the building to compute its level
-            from dataclasses import replace
-            new_state = replace(state, buildings={**state.buildings, pos: building})
-            return multiplier_level(pos, new_state)
+            return multiplier_level(pos, state.with_building(pos, building))
         return 0
     if action_type == 'harvest':
         pos = action[1]
@@ -79,19 +210,44 @@ def action_population(action, state):
     return 0
 
 
+class ActionPath(tuple):
+    """Actions in the order applied from some starting state, with running totals.
+
+    cost and population are the sequence's action_cost and action_population
+    sums. It is a tuple of actions, so score functions can treat it as the
+    action list; then() extends it by one action without replaying the
+    ones before.
+    """
+    cost = 0
+    population = 0
+
+    def then(self, action, state):
+        """This path followed by action, applied to state (where this path ends)."""
+        path = ActionPath((*self, action))
+        path.cost = self.cost + action_cost(action, state)
+        path.population = self.population + action_population(action, state)
+        return path
+
+    def replay(self, actions, state):
+        """This path followed by actions, replayed from state (where this path ends)."""
+        path = self
+        for action in actions:
+            path = path.then(action, state)
+            state = apply_action(state, action)
+        return path
+
+    def __add__(self, other):
+        if not isinstance(other, ActionPath):
+            return NotImplemented
+        path = ActionPath(tuple.__add__(self, other))
+        path.cost = self.cost + other.cost
+        path.population = self.population + other.population
+        return path
+
+
 def sequence_population(actions, initial_state):
-    total = 0
-    state = initial_state
-    for action in actions:
-        total += action_population(action, state)
-        state = apply_action(state, action)
-    return total
+    return ActionPath().replay(actions, initial_state).population
 
 
 def sequence_cost(actions, initial_state):
-    total = 0
-    state = initial_state
-    for action in actions:
-        total += action_cost(action, state)
-        state = apply_action(state, action)
-    return total
+    return ActionPath().replay(actions, initial_state).cost
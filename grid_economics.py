@@ -0,0 +1,72 @@
+import numpy as np
+
+from grid_state import BUILDING_CODES
+from rules import MULTIPLIERS, MARKET_CAP
+
+_MARKET = BUILDING_CODES['market']
+_MULTIPLIER_CODES = [BUILDING_CODES[name] for name in MULTIPLIERS]
+
+
+def neighbour_sum(layer):
+    """Sum each tile's 8 neighbours over the last two axes (a 3x3 convolution
+    with a zero centre); tiles beyond the edge count as 0."""
+    n_rows, n_cols = layer.shape[-2:]
+    pad = [(0, 0)] * (layer.ndim - 2) + [(1, 1), (1, 1)]
+    padded = np.pad(layer.astype(np.int32), pad)
+    total = np.zeros(layer.shape, dtype=np.int32)
+    for dr in (0, 1, 2):
+        for dc in (0, 1, 2):
+            if (dr, dc) != (1, 1):
+                total += padded[..., dr:dr + n_rows, dc:dc + n_cols]
+    return total
+
+
+def multiplier_levels(building_codes):
+    """Level of every multiplier tile, 0 elsewhere.
+
+    building_codes has shape (..., rows, cols); leading axes are a batch.
+    """
+    levels = np.zeros(building_codes.shape, dtype=np.int32)
+    for name, m in MULTIPLIERS.items():
+        resource_count = neighbour_sum(building_codes == BUILDING_CODES[m['resource']])
+        is_multiplier = building_codes == BUILDING_CODES[name]
+        levels += np.where(is_multiplier, m['weight'] * resource_count, 0)
+    return levels
+
+
+def market_incomes(building_codes, levels=None):
+    """Capped income of every market tile, 0 elsewhere."""
+    if levels is None:
+        levels = multiplier_levels(building_codes)
+    raw = neighbour_sum(levels)
+    return np.where(building_codes == _MARKET, np.minimum(raw, MARKET_CAP), 0)
+
+
+def total_incomes(building_codes):
+    """Total income of each state in a (..., rows, cols) stack."""
+    return market_incomes(building_codes).sum(axis=(-2, -1))
+
+
+def building_values(building_codes, levels=None):
+    """economics.building_value for each state in a stack."""
+    if levels is None:
+        levels = multiplier_levels(building_codes)
+    is_multiplier = np.isin(building_codes, _MULTIPLIER_CODES)
+    others = (building_codes != 0) & ~is_multiplier
+    return levels.sum(axis=(-2, -1)) + others.sum(axis=(-2, -1))
+
+
+def score_candidates(state, actions):
+    """Return (incomes, building values) arrays for state after each action.
+
+    The candidates' building layers are stacked along a leading axis and
+    evaluated in one pass; actions other than builds leave the layer as is.
+    """
+    stack = np.repeat(state.building_codes[np.newaxis], len(actions), axis=0)
+    for i, action in enumerate(actions):
+        if action[0] == 'build':
+            r, c = action[1]
+            stack[i, r, c] = BUILDING_CODES[action[2]]
+    levels = multiplier_levels(stack)
+    incomes = market_incomes(stack, levels).sum(axis=(-2, -1))
+    return incomes, building_values(stack, levels)
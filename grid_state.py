@@ -0,0 +1,251 @@
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+
+import zobrist
+from map_state import MapState, _city_rehash
+from rules import RULES, MAP_SHAPES
+
+# Integer codes for each layer; code 0 is undefined terrain, no resource or no building.
+TERRAINS = RULES.terrains
+RESOURCES = RULES.resources
+BUILDING_TYPES = RULES.buildings
+
+TERRAIN_CODES = {name: code for code, name in enumerate(TERRAINS)}
+RESOURCE_CODES = {name: code for code, name in enumerate(RESOURCES)}
+BUILDING_CODES = {name: code for code, name in enumerate(BUILDING_TYPES)}
+
+
+def shape_for(state):
+    """Return the smallest map shape that holds every position used by state."""
+    positions = (
+        set(state.terrain) | set(state.resources) | set(state.buildings)
+        | state.villages | state.monuments | state.lighthouses
+        | {(c['row'], c['col']) for c in state.cities}
+    )
+    if any(r < 0 or c < 0 for r, c in positions):
+        raise ValueError("Grid states need non-negative positions")
+    extent = max((max(r, c) + 1 for r, c in positions), default=0)
+    for size in sorted(MAP_SHAPES):
+        if size >= extent:
+            return size
+    raise ValueError(f"No map shape holds positions up to {extent - 1}")
+
+
+@dataclass(frozen=True, eq=False)
+class GridState:
+    """Dense MapState equivalent: one small-integer NumPy layer per map layer.
+
+    Any code written against MapState takes it too. A new state costs
+    one small array copy. owner holds the id of the owning city, 0 for
+    none, so city ids must be positive.
+    """
+    terrain_codes: np.ndarray
+    resource_codes: np.ndarray
+    building_codes: np.ndarray
+    owner: np.ndarray
+    cities: tuple = ()
+    villages: frozenset = field(default_factory=frozenset)
+    monuments: frozenset = field(default_factory=frozenset)
+    lighthouses: frozenset = field(default_factory=frozenset)
+    # Filled in for whole batches of children by apply_all_with_income,
+    # from score_candidates, rather than one child at a time.
+    _income: object = field(default=None, repr=False)
+    _defined: frozenset = field(default=None, repr=False)
+    # The first computation reads dict copies of all three layers.
+    _zobrist: int = field(default=None, repr=False)
+
+    @classmethod
+    def from_map_state(cls, state, size=None):
+        if size is None:
+            size = shape_for(state)
+        layers = [np.zeros((size, size), dtype=np.int8) for _ in range(3)]
+        for layer, values, codes in zip(
+            layers,
+            (state.terrain, state.resources, state.buildings),
+            (TERRAIN_CODES, RESOURCE_CODES, BUILDING_CODES),
+        ):
+            for (r, c), name in values.items():
+                layer[r, c] = codes[name]
+        terrain_codes, resource_codes, building_codes = layers
+        owner = np.zeros((size, size), dtype=np.int32)
+        for city in state.cities:
+            _claim_square(owner, terrain_codes, state.cities, city)
+        return cls(
+            terrain_codes=terrain_codes,
+            resource_codes=resource_codes,
+            building_codes=building_codes,
+            owner=owner,
+            cities=state.cities,
+            villages=state.villages,
+            monuments=state.monuments,
+            lighthouses=state.lighthouses,
+        )
+
+    def to_map_state(self):
+        return MapState(
+            terrain=self.terrain,
+            resources=self.resources,
+            buildings=self.buildings,
+            cities=self.cities,
+            villages=self.villages,
+            monuments=self.monuments,
+            lighthouses=self.lighthouses,
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, GridState):
+            return NotImplemented
+        return (
+            np.array_equal(self.terrain_codes, other.terrain_codes)
+            and np.array_equal(self.resource_codes, other.resource_codes)
+            and np.array_equal(self.building_codes, other.building_codes)
+            and self.cities == other.cities
+            and self.villages == other.villages
+            and self.monuments == other.monuments
+            and self.lighthouses == other.lighthouses
+        )
+
+    def __hash__(self):
+        return self.zobrist()
+
+    @property
+    def size(self):
+        return self.terrain_codes.shape[0]
+
+    def _code_at(self, layer, pos):
+        r, c = pos
+        n = self.size
+        if 0 <= r < n and 0 <= c < n:
+            return layer.item(r, c)
+        return 0
+
+    def terrain_at(self, pos):
+        return TERRAINS[self._code_at(self.terrain_codes, pos)]
+
+    def resource_at(self, pos):
+        return RESOURCES[self._code_at(self.resource_codes, pos)]
+
+    def building_at(self, pos):
+        return BUILDING_TYPES[self._code_at(self.building_codes, pos)]
+
+    @property
+    def terrain(self):
+        return _layer_dict(self.terrain_codes, TERRAINS)
+
+    @property
+    def resources(self):
+        return _layer_dict(self.resource_codes, RESOURCES)
+
+    @property
+    def buildings(self):
+        return _layer_dict(self.building_codes, BUILDING_TYPES)
+
+    def defined_positions(self):
+        if self._defined is None:
+            defined = frozenset(_positions(self.terrain_codes != 0))
+            object.__setattr__(self, '_defined', defined)
+        return set(self._defined)
+
+    def occupied_positions(self):
+        return set(_positions(self.building_codes != 0)) | self.monuments | self.lighthouses
+
+    def is_occupied(self, pos):
+        return (
+            self._code_at(self.building_codes, pos) != 0
+            or pos in self.monuments or pos in self.lighthouses
+        )
+
+    def territory_ownership(self):
+        """Map each defined tile to the id of its owning city. First city claims contested tiles."""
+        rows, cols = np.nonzero(self.owner)
+        return {
+            (r, c): city_id
+            for r, c, city_id in zip(rows.tolist(), cols.tolist(), self.owner[rows, cols].tolist())
+        }
+
+    def owner_of(self, pos):
+        """Return the id of the city owning pos, or None."""
+        return self._code_at(self.owner, pos) or None
+
+    def tiles_owned_by(self, city_id):
+        """Return set of positions owned by a specific city."""
+        return frozenset(_positions(self.owner == city_id))
+
+    def city_has_building(self, city_id, building):
+        return bool(np.any(
+            (self.owner == city_id) & (self.building_codes == BUILDING_CODES[building])
+        ))
+
+    def zobrist(self):
+        """64-bit Zobrist hash, maintained incrementally by the with_* methods."""
+        if self._zobrist is None:
+            object.__setattr__(self, '_zobrist', zobrist.state_hash(self))
+        return self._zobrist
+
+    def with_building(self, pos, building):
+        """Return a new state with building placed at pos."""
+        building_codes = self.building_codes.copy()
+        building_codes[pos] = BUILDING_CODES[building]
+        h = self._zobrist
+        if h is not None:
+            h ^= zobrist.layer_delta('building', pos, self.building_at(pos), building)
+        return replace(self, building_codes=building_codes, _income=None, _zobrist=h)
+
+    def with_resource(self, pos, resource):
+        """Return a new state with pos's resource replaced; None removes it."""
+        resource_codes = self.resource_codes.copy()
+        resource_codes[pos] = RESOURCE_CODES[resource]
+        h = self._zobrist
+        if h is not None:
+            h ^= zobrist.layer_delta('resource', pos, self.resource_at(pos), resource)
+        return replace(self, resource_codes=resource_codes, _zobrist=h)
+
+    def with_city(self, city, villages):
+        """Return a new state with city appended and villages replaced."""
+        cities = self.cities + (city,)
+        owner = self.owner.copy()
+        _claim_square(owner, self.terrain_codes, cities, city)
+        return replace(self, cities=cities, villages=villages, owner=owner,
+                       _zobrist=_city_rehash(self._zobrist, self, cities, villages))
+
+    def with_border_level(self, city_id, border_level):
+        """Return a new state with one city's border level changed."""
+        cities = tuple(
+            {**c, 'border_level': border_level} if c['id'] == city_id else c
+            for c in self.cities
+        )
+        owner = self.owner.copy()
+        for city in cities:
+            if city['id'] == city_id:
+                _claim_square(owner, self.terrain_codes, cities, city)
+        return replace(self, cities=cities, owner=owner,
+                       _zobrist=_city_rehash(self._zobrist, self, cities, self.villages))
+
+
+def _positions(mask):
+    rows, cols = np.nonzero(mask)
+    return zip(rows.tolist(), cols.tolist())
+
+
+def _layer_dict(layer, names):
+    rows, cols = np.nonzero(layer)
+    return {
+        (r, c): names[code]
+        for r, c, code in zip(rows.tolist(), cols.tolist(), layer[rows, cols].tolist())
+    }
+
+
+def _claim_square(owner, terrain_codes, cities, city):
+    """Give city each defined tile of its square not held by a city earlier in cities."""
+    n = owner.shape[0]
+    radius = city['border_level']
+    r0, r1 = max(city['row'] - radius, 0), min(city['row'] + radius + 1, n)
+    c0, c1 = max(city['col'] - radius, 0), min(city['col'] + radius + 1, n)
+    if r0 >= r1 or c0 >= c1:
+        return
+    rank = [c['id'] for c in cities].index(city['id'])
+    later = [c['id'] for c in cities[rank + 1:]]
+    square = owner[r0:r1, c0:c1]
+    claimable = (square == 0) | np.isin(square, later)
+    square[claimable & (terrain_codes[r0:r1, c0:c1] != 0)] = city['id']
@@ -0,0 +1,124 @@
+import multiprocessing
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when max_queued jobs are already waiting or running."""
+
+
+class Cancelled(Exception):
+    """Raised inside a job whose cancellation was requested."""
+
+
+class JobQueue:
+    """
+    In-process job runner on a bounded pool of worker processes.
+
+    fn(payload, progress) runs in a worker; it may call progress(info) with
+    a picklable dict, which is what status() reports while the job runs,
+    and must return a picklable result. A cancelled job stops at its next
+    progress call. The pool and the shared status store start on the first
+    submit. The most recent keep_finished finished jobs stay queryable.
+    """
+
+    def __init__(self, fn, max_workers=2, max_queued=16, keep_finished=256):
+        self.fn = fn
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.keep_finished = keep_finished
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._pool = None
+        self._manager = None
+        self._shared = None
+        self._cancelled = None
+
+    def _start(self):
+        if self._pool is None:
+            self._manager = multiprocessing.Manager()
+            self._shared = self._manager.dict()
+            self._cancelled = self._manager.dict()
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def submit(self, payload):
+        """Queue a job and return its id; raise QueueFull if the queue is at capacity."""
+        with self._lock:
+            self._start()
+            active = sum(1 for future in self._jobs.values() if not future.done())
+            if active >= self.max_queued:
+                raise QueueFull(f"{active} jobs already queued")
+            self._forget_finished()
+            job_id = uuid.uuid4().hex
+            self._shared[job_id] = {'status': 'queued'}
+            self._jobs[job_id] = self._pool.submit(
+                _run, self.fn, job_id, payload, self._shared, self._cancelled,
+            )
+            return job_id
+
+    def status(self, job_id):
+        """Return the job's status dict, or None for an unknown id.
+
+        'status' is one of queued, running, done, failed and cancelled;
+        running jobs carry their latest 'progress', done jobs their
+        'result' and failed jobs their 'error'.
+        """
+        with self._lock:
+            future = self._jobs.get(job_id)
+            if future is None:
+                return None
+            info = {'id': job_id, **self._shared.get(job_id, {})}
+        if future.cancelled():
+            info['status'] = 'cancelled'
+        elif future.done():
+            error = future.exception()
+            if isinstance(error, Cancelled):
+                info['status'] = 'cancelled'
+            elif error is not None:
+                info['status'] = 'failed'
+                info['error'] = str(error)
+            else:
+                info['status'] = 'done'
+                info['result'] = future.result()
+            info.pop('progress', None)
+        return info
+
+    def cancel(self, job_id):
+        """Request cancellation; return False for an unknown or finished job."""
+        with self._lock:
+            future = self._jobs.get(job_id)
+            if future is None or future.done():
+                return False
+            if not future.cancel():
+                # Already handed to a worker: stop it at its next progress call
+                self._cancelled[job_id] = True
+            return True
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._manager.shutdown()
+                self._pool = None
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, future in self._jobs.items() if future.done()]
+        for job_id in finished[:max(len(finished) - self.keep_finished, 0)]:
+            del self._jobs[job_id]
+            self._shared.pop(job_id, None)
+            self._cancelled.pop(job_id, None)
+
+
+def _run(fn, job_id, payload, shared, cancelled):
+    if job_id in cancelled:
+        raise Cancelled(job_id)
+    shared[job_id] = {'status': 'running'}
+
+    def progress(info):
+        if job_id in cancelled:
+            raise Cancelled(job_id)
+        shared[job_id] = {'status': 'running', 'progress': info}
+
+    return fn(payload, progress)
@@ -1,4 +1,7 @@
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
+
+import zobrist
+from persistent_map import PersistentMap
 
 
 def is_adjacent(a, b):
@@ -26,6 +29,30 @@ class MapState:
     villages: frozenset = field(default_factory=frozenset)
     monuments: frozenset = field(default_factory=frozenset)
     lighthouses: frozenset = field(default_factory=frozenset)
+    # Caches below start empty in every new state, replace() included; only
+    # the with_* methods hand them on, through _derive.
+    # Lazily built (ownership, tiles per city) index. with_building and
+    # with_resource keep it; with_city and with_border_level update it
+    # rather than rebuilding it.
+    _territory: tuple = field(default=None, init=False, compare=False, repr=False)
+    # Income levels cached by economics; only valid for these buildings.
+    _income: object = field(default=None, init=False, compare=False, repr=False)
+    # Zobrist hash, computed on first use and then updated by the with_* methods.
+    _zobrist: int = field(default=None, init=False, compare=False, repr=False)
+
+    def __post_init__(self):
+        # Resources and buildings change with every action; keep them in
+        # persistent maps so child states share structure with their parent.
+        # Terrain never changes and stays a plain dict.
+        for name in ('resources', 'buildings'):
+            layer = getattr(self, name)
+            if not isinstance(layer, PersistentMap):
+                object.__setattr__(self, name, PersistentMap.from_mapping(layer))
+        for name in ('_territory', '_income', '_zobrist'):
+            object.__setattr__(self, name, None)
+
+    def __hash__(self):
+        return self.zobrist()
 
     def terrain_at(self, pos):
         return self.terrain.get(pos)
@@ -42,18 +69,148 @@ class MapState:
     def occupied_positions(self):
         return set(self.buildings.keys()) | self.monuments | self.lighthouses
 
+    def is_occupied(self, pos):
+        return pos in self.buildings or pos in self.monuments or pos in self.lighthouses
+
+    def _territory_index(self):
+        if self._territory is None:
+            ownership = PersistentMap()
+            city_tiles = {}
+            rank = _city_rank(self.cities)
+            for city in self.cities:
+                claimed = _claim_square(ownership, city_tiles, self.terrain, rank, city)
+                ownership = ownership.set_many(claimed.items())
+            object.__setattr__(self, '_territory', (ownership, city_tiles))
+        return self._territory
+
     def territory_ownership(self):
-        """Map each defined tile to the id of its owning city. First city claims contested tiles."""
-        ownership = {}
-        for city in self.cities:
-            radius = city['border_level']
-            for dr in range(-radius, radius + 1):
-                for dc in range(-radius, radius + 1):
-                    pos = (city['row'] + dr, city['col'] + dc)
-                    if pos in self.terrain and pos not in ownership:
-                        ownership[pos] = city['id']
-        return ownership
+        """Map each defined tile to the id of its owning city. First city claims contested tiles.
+
+        The mapping is the state's cached index, a PersistentMap that later
+        states share rows of.
+        """
+        return self._territory_index()[0]
+
+    def owner_of(self, pos):
+        """Return the id of the city owning pos, or None."""
+        return self._territory_index()[0].get(pos)
 
     def tiles_owned_by(self, city_id):
         """Return set of positions owned by a specific city."""
-        return {pos for pos, cid in self.territory_ownership().items() if cid == city_id}
+        return self._territory_index()[1].get(city_id, frozenset())
+
+    def city_has_building(self, city_id, building):
+        return any(self.buildings.get(pos) == building for pos in self.tiles_owned_by(city_id))
+
+    def zobrist(self):
+        """64-bit Zobrist hash, maintained incrementally by the with_* methods."""
+        if self._zobrist is None:
+            object.__setattr__(self, '_zobrist', zobrist.state_hash(self))
+        return self._zobrist
+
+    def with_building(self, pos, building):
+        """Return a new state with building placed at pos."""
+        h = self._zobrist
+        if h is not None:
+            h ^= zobrist.layer_delta('building', pos, self.building_at(pos), building)
+        return self._derive({'buildings': self.buildings.set(pos, building)},
+                            _territory=self._territory, _zobrist=h)
+
+    def with_resource(self, pos, resource):
+        """Return a new state with pos's resource replaced; None removes it."""
+        if resource is None:
+            resources = self.resources.delete(pos)
+        else:
+            resources = self.resources.set(pos, resource)
+        h = self._zobrist
+        if h is not None:
+            h ^= zobrist.layer_delta('resource', pos, self.resource_at(pos), resource)
+        return self._derive({'resources': resources}, _territory=self._territory,
+                            _income=self._income, _zobrist=h)
+
+    def with_city(self, city, villages):
+        """Return a new state with city appended and villages replaced."""
+        cities = self.cities + (city,)
+        return self._derive({'cities': cities, 'villages': villages},
+                            _territory=self._territory_after(cities, city),
+                            _income=self._income,
+                            _zobrist=_city_rehash(self._zobrist, self, cities, villages))
+
+    def with_border_level(self, city_id, border_level):
+        """Return a new state with one city's border level changed."""
+        cities = tuple(
+            {**c, 'border_level': border_level} if c['id'] == city_id else c
+            for c in self.cities
+        )
+        territory = self._territory
+        for city in cities:
+            if city['id'] == city_id:
+                territory = self._territory_after(cities, city)
+        return self._derive({'cities': cities}, _territory=territory, _income=self._income,
+                            _zobrist=_city_rehash(self._zobrist, self, cities, self.villages))
+
+    def _derive(self, changes, **caches):
+        """replace(self, **changes), then set the caches still valid for the new state."""
+        state = replace(self, **changes)
+        for name, value in caches.items():
+            object.__setattr__(state, name, value)
+        return state
+
+    def _territory_after(self, cities, city):
+        """Index for cities, given that only city's square grew; None if never built.
+
+        Only the rows of city's square are copied; the rest of the ownership
+        layer is shared with this state's.
+        """
+        if self._territory is None:
+            return None
+        ownership, city_tiles = self._territory
+        city_tiles = dict(city_tiles)
+        claimed = _claim_square(ownership, city_tiles, self.terrain, _city_rank(cities), city)
+        return ownership.set_many(claimed.items()), city_tiles
+
+
+def _city_rehash(h, state, cities, villages):
+    """Update hash h for state's cities and villages being replaced."""
+    if h is None:
+        return None
+    for city in set(map(zobrist.city_key, state.cities)) ^ set(map(zobrist.city_key, cities)):
+        h ^= city
+    for pos in state.villages ^ villages:
+        h ^= zobrist.key('village', pos)
+    return h
+
+
+def _city_rank(cities):
+    """Map each city id to its position in cities; lower ranks win contested tiles."""
+    return {c['id']: i for i, c in enumerate(cities)}
+
+
+def _claim_square(ownership, city_tiles, terrain, rank, city):
+    """Tiles of city's square not held by a city ranked before it, as {pos: city id}.
+
+    ownership is the PersistentMap the claims are then applied to;
+    city_tiles is updated in place. Only tiles inside the square are
+    visited, so growing one city's borders updates an existing index
+    without rescanning the others.
+    """
+    city_id = city['id']
+    radius = city['border_level']
+    claimed = {}
+    lost = {}
+    for r in range(city['row'] - radius, city['row'] + radius + 1):
+        owners = ownership.row(r)
+        for c in range(city['col'] - radius, city['col'] + radius + 1):
+            pos = (r, c)
+            if pos not in terrain:
+                continue
+            owner = owners.get(pos)
+            if owner is not None and rank[owner] <= rank[city_id]:
+                continue
+            claimed[pos] = city_id
+            if owner is not None:
+                lost.setdefault(owner, set()).add(pos)
+    for owner, tiles in lost.items():
+        city_tiles[owner] = city_tiles[owner] - tiles
+    city_tiles[city_id] = city_tiles.get(city_id, frozenset()) | frozenset(claimed)
+    return claimed
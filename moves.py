@@ -1,9 +1,32 @@
-from actions import validate_action
-from rules import BUILDINGS
+from actions import validate_action, apply_action
+from bitboard_state import BitboardState
+from rules import RULES, ONE_PER_CITY
 
 
-def legal_moves(state, techs):
-    """Enumerate all legal actions for the given state and tech set."""
+def legal_moves(state, techs, relevant=None):
+    """Enumerate all legal actions for the given state and tech set.
+
+    relevant, a set from relevance.relevant_actions, restricts tile actions
+    to those in it.
+    """
+    moves = _global_moves(state, techs)
+
+    if isinstance(state, BitboardState):
+        # Every tile action's targets come from a few mask intersections
+        targets = state.tile_targets(techs)
+        for pos in state.positions(state.owned):
+            moves.extend(_tile_moves(state, pos, techs, relevant, targets))
+        return moves
+
+    for pos in state.defined_positions():
+        if state.owner_of(pos) is None:
+            continue
+        moves.extend(_tile_moves(state, pos, techs, relevant))
+
+    return moves
+
+
+def _global_moves(state, techs):
     moves = []
 
     # Found city moves
@@ -18,22 +41,109 @@ def legal_moves(state, techs):
         if validate_action(state, action, techs) is None:
             moves.append(action)
 
-    ownership = state.territory_ownership()
+    return moves
 
-    for pos in state.defined_positions():
-        if pos not in ownership:
-            continue
 
-        # Build moves
-        for building in BUILDINGS:
+def _tile_moves(state, pos, techs, relevant=None, targets=None):
+    """Legal tile actions at pos; targets, from BitboardState.tile_targets, replaces validation."""
+    if targets is not None:
+        i = state.index(pos)
+        moves = []
+        for action_type, building, board in targets:
+            if board >> i & 1:
+                action = ('build', pos, building) if building else (action_type, pos)
+                if relevant is None or action in relevant:
+                    moves.append(action)
+        return moves
+
+    moves = []
+
+    # Build moves: the compiled tables give the eligible, unlocked buildings
+    # in one lookup, as validate_action would find them one by one
+    city_id = state.owner_of(pos)
+    terrain = state.terrain_at(pos)
+    if city_id is not None and terrain is not None and not state.is_occupied(pos):
+        mask = RULES.buildable_at(terrain, state.resource_at(pos))
+        mask &= RULES.available_buildings(RULES.tech_mask(techs))
+        for building in RULES.names_in(mask):
             action = ('build', pos, building)
-            if validate_action(state, action, techs) is None:
-                moves.append(action)
+            if relevant is not None and action not in relevant:
+                continue
+            if building in ONE_PER_CITY and state.city_has_building(city_id, building):
+                continue
+            moves.append(action)
 
-        # Terrain modification and harvest moves
-        for action_type in ('clear_forest', 'burn_forest', 'grow_forest', 'harvest'):
-            action = (action_type, pos)
-            if validate_action(state, action, techs) is None:
-                moves.append(action)
+    # Terrain modification and harvest moves
+    for action_type in ('clear_forest', 'burn_forest', 'grow_forest', 'harvest'):
+        action = (action_type, pos)
+        if relevant is not None and action not in relevant:
+            continue
+        if validate_action(state, action, techs) is None:
+            moves.append(action)
 
     return moves
+
+
+class MoveGenerator:
+    """Legal moves for a state, kept up to date as actions are applied.
+
+    Moves are held per tile. Applying an action re-validates only the tiles
+    whose legality it can affect: the tile itself, the owning city's tiles
+    for a one-per-city building, and the tiles of every city whose territory
+    changed. moves() returns the same list as
+    legal_moves(self.state, techs, relevant).
+    """
+
+    def __init__(self, state, techs, relevant=None):
+        self.state = state
+        self.techs = techs
+        self.relevant = relevant
+        self._global = _global_moves(state, techs)
+        self._tiles = {
+            pos: self._validate_tile(pos) for pos in state.defined_positions()
+        }
+
+    def _validate_tile(self, pos):
+        if self.state.owner_of(pos) is None:
+            return []
+        return _tile_moves(self.state, pos, self.techs, self.relevant)
+
+    def moves(self):
+        moves = list(self._global)
+        for tile_moves in self._tiles.values():
+            moves.extend(tile_moves)
+        return moves
+
+    def apply(self, action, new_state=None):
+        """Advance to the state after action.
+
+        new_state may be passed when the caller has already applied it.
+        """
+        old_state = self.state
+        if new_state is None:
+            new_state = apply_action(old_state, action)
+        self.state = new_state
+        self._global = _global_moves(new_state, self.techs)
+        for pos in self._dirty_tiles(old_state, action):
+            if pos in self._tiles:
+                self._tiles[pos] = self._validate_tile(pos)
+
+    def _dirty_tiles(self, old_state, action):
+        action_type = action[0]
+        if action_type == 'build':
+            pos, building = action[1], action[2]
+            city_id = old_state.owner_of(pos)
+            if building in ONE_PER_CITY and city_id is not None:
+                return old_state.tiles_owned_by(city_id) | {pos}
+            return {pos}
+        if action_type in ('found_city', 'expand_borders'):
+            dirty = set()
+            for city in self.state.cities:
+                before = old_state.tiles_owned_by(city['id'])
+                after = self.state.tiles_owned_by(city['id'])
+                # MapState shares unchanged territory sets; other backends
+                # build a new set per call, so compare those by value
+                if before is not after and before != after:
+                    dirty |= before | after
+            return dirty
+        return {action[1]}
@@ -1,38 +1,496 @@
-from moves import legal_moves
-from actions import apply_action
-from economics import total_income, sequence_cost
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import repeat
 
+import coordinate_descent
+import decompose as decomposition
+import relevance
+from actions import validate_action, apply_action
+from moves import MoveGenerator, legal_moves
+from economics import total_income, apply_with_income, apply_all_with_income, ActionPath
 
-def optimize(initial_state, techs, score_fn, max_depth=20):
+STRATEGIES = ('greedy', 'beam', 'coordinate')
+
+
+class SearchStats:
+    """Call counts, cumulative time and search size for optimize runs.
+
+    Pass one as optimize's stats to fill it in; without one the search
+    takes no timings at all. phases maps each phase to [calls, seconds]:
+    'moves' (legal move generation, validation included), 'revalidate'
+    (greedy's incremental move updates after each step), 'apply' (child
+    states built by apply_action, income carried forward), 'score'
+    (score_fn calls) and 'optimize' (whole runs). candidates holds the
+    candidates evaluated at each step, peak_states the most states the
+    search held at once.
     """
-    Greedy optimizer: repeatedly pick the best legal action until
-    no improvement or max_depth reached.
+
+    def __init__(self):
+        self.phases = {}
+        self.candidates = []
+        self.peak_states = 0
+
+    def add(self, phase, seconds, calls=1):
+        entry = self.phases.setdefault(phase, [0, 0.0])
+        entry[0] += calls
+        entry[1] += seconds
+
+    def step(self, candidates, states):
+        self.candidates.append(candidates)
+        self.peak_states = max(self.peak_states, states)
+
+    def merge(self, other):
+        """Add other's counts to these, as for parts of one run."""
+        for phase, (calls, seconds) in other.phases.items():
+            self.add(phase, seconds, calls)
+        self.candidates += other.candidates
+        self.peak_states = max(self.peak_states, other.peak_states)
+
+    def as_dict(self):
+        return {
+            'phases': {
+                phase: {'calls': calls, 'seconds': seconds}
+                for phase, (calls, seconds) in self.phases.items()
+            },
+            'steps': len(self.candidates),
+            'candidates': sum(self.candidates),
+            'candidates_per_step': list(self.candidates),
+            'peak_states': self.peak_states,
+        }
+
+
+def _timed(stats, phase, calls, fn, *args):
+    """fn(*args), added to stats' phase as calls calls when stats is given."""
+    if stats is None:
+        return fn(*args)
+    start = time.perf_counter()
+    result = fn(*args)
+    stats.add(phase, time.perf_counter() - start, calls)
+    return result
+
+
+def optimize(initial_state, techs, score_fn, max_depth=20,
+             strategy='greedy', beam_width=8, workers=None, restarts=8, patience=3, seed=0,
+             deadline=None, progress=None, seed_actions=None, region=None, decompose=False,
+             prune=True, stats=None, pool=None):
     """
+    Search for the best-scoring action sequence of at most max_depth actions.
+
+    score_fn(state, actions) is called with actions as an ActionPath, whose
+    cost and population carry the sequence's running totals. The result
+    has the plan's 'cost' and 'population' alongside its state, actions
+    and income, and 'nodes', 'moves' and 'seconds': the candidate states
+    the search built, the candidate actions score_fn rated (for
+    'coordinate', both count the plans its runs produced) and its wall
+    time.
+
+    strategy 'greedy' repeatedly takes the single best improving action.
+    strategy 'beam' keeps the beam_width best distinct states at each depth,
+    expanding them on a pool of workers processes when workers > 1; score_fn
+    must then be picklable (a module-level function or a partial of one).
+    One of the states is always greedy's next step, so beam search scores
+    at least as well as greedy.
+    strategy 'coordinate' plans the ideal end state by coordinate descent
+    over per-city placements: up to restarts runs seeded from seed, spread
+    over workers processes, stopping after patience runs without a better
+    score. Its plan is not limited by max_depth.
+
+    prune limits greedy and beam search to tile actions that can ever help
+    market income (relevance.relevant_actions on the starting state).
+
+    deadline is a time.monotonic() value. Every strategy keeps a valid best
+    plan so far and returns it once the deadline passes; the result's
+    'complete' is False when that cut the search short.
+
+    progress, if given, is called with an event dict each time the best
+    plan improves: 'step' (actions taken, or restarts run for
+    'coordinate'), 'action' (the latest action, or None), 'actions',
+    'state', 'income', 'cost', 'population' and 'elapsed' seconds since
+    the search started.
+
+    seed_actions warm-starts the search from a previous plan: the actions
+    that still validate, outside region, are kept and the search continues
+    after them (see warm_start). region, a set of positions such as
+    repair_region returns, limits greedy and beam search to actions there;
+    'coordinate' re-plans every free tile around the kept actions.
+
+    decompose splits the map into clusters of cities too far apart to
+    affect each other's income (see decompose.components) and optimises
+    each on its own, on a pool of workers processes when workers > 1, then
+    merges the plans; max_depth then applies to each cluster. progress
+    reports the merged plan as each cluster finishes.
+
+    stats, a SearchStats, collects per-phase counts and timings.
+
+    pool, a ProcessPoolExecutor shared between runs, does the parallel
+    work when workers > 1 instead of a pool started for this run; workers
+    then sets how many tasks go to it at once.
+    """
+    start = time.perf_counter()
+    try:
+        result = _optimize(initial_state, techs, score_fn, max_depth, strategy, beam_width,
+                           workers, restarts, patience, seed, deadline, progress, seed_actions,
+                           region, decompose, prune, stats, pool)
+    finally:
+        seconds = time.perf_counter() - start
+        if stats is not None:
+            stats.add('optimize', seconds)
+    result['seconds'] = seconds
+    return result
+
+
+def _optimize(initial_state, techs, score_fn, max_depth, strategy, beam_width, workers,
+              restarts, patience, seed, deadline, progress, seed_actions, region, decompose,
+              prune, stats, pool):
+    report = _reporter(progress)
+    state, kept = initial_state, ActionPath()
+    if seed_actions is not None:
+        state, kept = warm_start(initial_state, techs, seed_actions, region)
+        kept = ActionPath().replay(kept, initial_state)
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    if decompose:
+        parts = decomposition.components(state)
+        if len(parts) > 1:
+            options = dict(
+                max_depth=max_depth, strategy=strategy, beam_width=beam_width,
+                restarts=restarts, patience=patience, seed=seed, deadline=deadline,
+                region=region, prune=prune,
+            )
+            return _optimize_parts(state, kept, parts, techs,
+                                   partial(_after, score_fn, kept, state), workers, pool,
+                                   report, options, stats)
+    relevant = relevance.relevant_actions(state, techs) if prune else None
+    if strategy == 'greedy':
+        return _greedy(state, kept, techs, score_fn, max_depth, deadline, report, region,
+                       relevant, stats)
+    if strategy == 'beam':
+        return _beam(state, kept, techs, score_fn, max_depth, beam_width, workers, pool,
+                     deadline, report, region, relevant, stats)
+    if strategy == 'coordinate':
+        score_fn = partial(_after, score_fn, kept, state)
+        if stats is not None:
+            score_fn = partial(_timed, stats, 'score', 1, score_fn)
+        result = coordinate_descent.solve(
+            state, techs, score_fn, restarts, patience, seed,
+            workers, deadline, lambda runs, s, actions: report(runs, s, kept.replay(actions, state)),
+            pool,
+        )
+        return _result(result['state'], kept.replay(result['actions'], state), result['complete'],
+                       result['runs'], result['runs'])
+    raise ValueError(f"Unknown strategy: {strategy}")
+
+
+def _optimize_parts(state, kept, parts, techs, score_fn, workers, pool, report, options,
+                    stats):
+    """Optimise each part separately and merge the plans after kept."""
+    pool, owned = _pool_for(workers, pool)
+    timed = stats is not None
+    try:
+        if pool is None:
+            results = (_optimize_part(part, techs, score_fn, timed, options) for part in parts)
+        else:
+            results = (
+                future.result() for future in
+                [pool.submit(_optimize_part, part, techs, score_fn, timed, options)
+                 for part in parts]
+            )
+        actions = kept
+        complete = True
+        nodes = moves = 0
+        for done, (part, (result, part_stats)) in enumerate(zip(parts, results), 1):
+            if timed:
+                stats.merge(part_stats)
+            complete = complete and result['complete']
+            nodes += result['nodes']
+            moves += result['moves']
+            merged_state, merged = decomposition.merge(state, techs, [(part, result['actions'])])
+            actions = actions.replay(merged, state)
+            state = merged_state
+            report(done, state, actions)
+    finally:
+        if owned:
+            pool.shutdown()
+    return _result(state, actions, complete, nodes, moves)
+
+
+def _pool_for(workers, pool):
+    """(executor for parallel work or None, whether it was started here to be shut down)."""
+    if not workers or workers <= 1:
+        return None, False
+    if pool is not None:
+        return pool, False
+    return ProcessPoolExecutor(max_workers=workers), True
+
+
+def _optimize_part(part, techs, score_fn, timed, options):
+    """optimize one part; returns (result, its SearchStats or None)."""
+    stats = SearchStats() if timed else None
+    return optimize(part, techs, score_fn, stats=stats, **options), stats
+
+
+def warm_start(state, techs, seed_actions, region=None):
+    """Replay seed_actions on state, skipping any that no longer validate
+    and any acting inside region. Returns (state, kept actions)."""
+    kept = []
+    for action in seed_actions:
+        if region is not None and _action_pos(state, action) in region:
+            continue
+        if validate_action(state, action, techs) is None:
+            state = apply_action(state, action)
+            kept.append(action)
+    return state, kept
+
+
+def repair_region(state, changed):
+    """Positions whose plan may need redoing after edits at changed positions.
+
+    That is the edited tiles and the territory of every city centred on or
+    owning one, widened by two tiles: a resource building feeds a
+    multiplier that feeds a market two steps away.
+    """
+    changed = set(changed)
+    cities = {state.owner_of(pos) for pos in changed} - {None}
+    cities |= {c['id'] for c in state.cities if (c['row'], c['col']) in changed}
+    core = set(changed)
+    for city_id in cities:
+        core |= state.tiles_owned_by(city_id)
+    return frozenset(
+        (r + dr, c + dc) for r, c in core for dr in range(-2, 3) for dc in range(-2, 3)
+    )
+
+
+def _action_pos(state, action):
+    """The tile an action acts on; a city's centre for expand_borders."""
+    if action[0] == 'expand_borders':
+        for city in state.cities:
+            if city['id'] == action[1]:
+                return (city['row'], city['col'])
+        return None
+    return action[1]
+
+
+def _in_region(state, actions, region):
+    if region is None:
+        return actions
+    return [a for a in actions if _action_pos(state, a) in region]
+
+
+def _after(fn, prefix, start, state, actions):
+    """Call fn on state with prefix, the path to start, prepended to actions.
+
+    actions taken from start are replayed for their totals unless they
+    already come as an ActionPath.
+    """
+    if not isinstance(actions, ActionPath):
+        actions = ActionPath().replay(actions, start)
+    return fn(state, prefix + actions)
+
+
+def _result(state, actions, complete, nodes=0, moves=None):
+    """Result dict of a search; moves defaults to nodes, for searches that rate every child."""
+    return {
+        'state': state,
+        'actions': list(actions),
+        'income': total_income(state),
+        'cost': actions.cost,
+        'population': actions.population,
+        'complete': complete,
+        'nodes': nodes,
+        'moves': nodes if moves is None else moves,
+    }
+
+
+def _expired(deadline):
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def _reporter(progress):
+    """Wrap progress as report(step, state, actions), filling in income and elapsed time."""
+    start = time.monotonic()
+
+    def report(step, state, actions):
+        if progress is not None:
+            progress({
+                'step': step,
+                'action': actions[-1] if actions else None,
+                'actions': list(actions),
+                'state': state,
+                'income': total_income(state),
+                'cost': actions.cost,
+                'population': actions.population,
+                'elapsed': time.monotonic() - start,
+            })
+    return report
+
+
+def _greedy(initial_state, initial_actions, techs, score_fn, max_depth, deadline,
+            report, region, relevant, stats):
     state = initial_state
-    actions_taken = []
+    actions_taken = initial_actions
+    if stats is not None:
+        score_fn = partial(_timed, stats, 'score', 1, score_fn)
+    moves = _timed(stats, 'moves', 1, MoveGenerator, state, techs, relevant)
+    complete = True
+    nodes = rated = 0
 
     for _ in range(max_depth):
         best_action = None
         best_score = score_fn(state, actions_taken)
         best_state = state
+        best_path = actions_taken
 
-        for action in legal_moves(state, techs):
-            new_state = apply_action(state, action)
-            new_actions = actions_taken + [action]
-            s = score_fn(new_state, new_actions)
+        candidates = _in_region(state, moves.moves(), region)
+        children = _timed(stats, 'apply', len(candidates), apply_all_with_income, state, candidates)
+        nodes += len(children)
+        if stats is not None:
+            stats.step(len(candidates), len(children) + 1)
+        for action, new_state in zip(candidates, children):
+            if _expired(deadline):
+                complete = False
+                break
+            path = actions_taken.then(action, state)
+            s = score_fn(new_state, path)
+            rated += 1
             if s > best_score:
                 best_score = s
                 best_action = action
                 best_state = new_state
+                best_path = path
 
+        # The best improving action seen so far still extends a valid plan
         if best_action is None:
             break
 
-        actions_taken.append(best_action)
+        actions_taken = best_path
         state = best_state
+        report(len(actions_taken), state, actions_taken)
+        if not complete:
+            break
+        _timed(stats, 'revalidate', 1, moves.apply, best_action, best_state)
 
-    return {
-        'state': state,
-        'actions': actions_taken,
-        'income': total_income(state),
-    }
+    return _result(state, actions_taken, complete, nodes, rated)
+
+
+def _expand(state, actions, techs, score_fn, region=None, relevant=None):
+    """Score every legal child of state as (score, child hash, action)."""
+    state.zobrist()
+    moves = _in_region(state, legal_moves(state, techs, relevant), region)
+    return [
+        (score_fn(child, actions.then(action, state)), child.zobrist(), action)
+        for action, child in zip(moves, apply_all_with_income(state, moves))
+    ]
+
+
+def _expand_timed(state, actions, techs, score_fn, region=None, relevant=None):
+    """_expand, also returning a SearchStats of its phases."""
+    stats = SearchStats()
+    state.zobrist()
+    moves = _in_region(
+        state, _timed(stats, 'moves', 1, legal_moves, state, techs, relevant), region,
+    )
+    children = _timed(stats, 'apply', len(moves), apply_all_with_income, state, moves)
+    scored = []
+    for action, child in zip(moves, children):
+        path = actions.then(action, state)
+        scored.append((_timed(stats, 'score', 1, score_fn, child, path), child.zobrist(), action))
+    stats.peak_states = len(children) + 1
+    return scored, stats
+
+
+def _beam(initial_state, initial_actions, techs, score_fn, max_depth, beam_width,
+          workers, pool, deadline, report, region, relevant, stats):
+    initial_state.zobrist()
+    # beam[0] follows greedy search for as long as greedy would go on, so
+    # beam search never ends below greedy's plan
+    beam = [(score_fn(initial_state, initial_actions), initial_state, initial_actions)]
+    best = beam[0]
+    greedy = True
+    seen = {initial_state.zobrist()}
+    pool, owned = _pool_for(workers, pool)
+    complete = True
+    nodes = 0
+    try:
+        for _ in range(max_depth):
+            if _expired(deadline):
+                complete = False
+                break
+            expansions, complete = _expand_beam(beam, techs, score_fn, pool, workers, region,
+                                                relevant, deadline, stats)
+            nodes += sum(map(len, expansions))
+
+            # Keep each improving new state once, from its best-scoring parent
+            candidates = {}
+            for parent, children in enumerate(expansions):
+                parent_score = beam[parent][0]
+                for score, child_hash, action in children:
+                    if score <= parent_score or child_hash in seen:
+                        continue
+                    if child_hash not in candidates or score > candidates[child_hash][0]:
+                        candidates[child_hash] = (score, parent, action)
+
+            ranked = sorted(candidates.items(), key=lambda item: item[1][0], reverse=True)
+            if greedy:
+                # Greedy's choice: the first best improving child of its state
+                choice = None
+                for score, child_hash, action in expansions[0]:
+                    if score > (choice[1][0] if choice else beam[0][0]):
+                        choice = (child_hash, (score, 0, action))
+                greedy = choice is not None
+                if greedy:
+                    ranked = [choice] + [item for item in ranked if item[0] != choice[0]]
+            if not ranked:
+                break
+
+            next_beam = []
+            for child_hash, (score, parent, action) in ranked[:beam_width]:
+                _, parent_state, parent_actions = beam[parent]
+                child = apply_with_income(parent_state, action)
+                next_beam.append((score, child, parent_actions.then(action, parent_state)))
+                seen.add(child_hash)
+            beam = next_beam
+            top = max(beam, key=lambda entry: entry[0])
+            if top[0] > best[0]:
+                best = top
+                report(len(best[2]), best[1], best[2])
+            if not complete:
+                break
+    finally:
+        if owned:
+            pool.shutdown()
+
+    _, state, actions = best
+    return _result(state, actions, complete, nodes)
+
+
+def _expand_beam(beam, techs, score_fn, pool, workers, region, relevant, deadline, stats):
+    """Scored children of every beam state, and whether all were expanded.
+
+    Parents are expanded in order, a pool's worth at a time, until the
+    deadline passes; the rest get no children.
+    """
+    expand = _expand if stats is None else _expand_timed
+    chunk = workers if pool is not None else 1
+    expansions = []
+    peak = 0
+    complete = True
+    for start in range(0, len(beam), chunk):
+        if _expired(deadline):
+            complete = False
+            break
+        states = [state for _, state, _ in beam[start:start + chunk]]
+        actions = [path for _, _, path in beam[start:start + chunk]]
+        args = (states, actions, repeat(techs), repeat(score_fn), repeat(region),
+                repeat(relevant))
+        for children in (map(expand, *args) if pool is None else pool.map(expand, *args)):
+            if stats is not None:
+                children, expand_stats = children
+                peak = max(peak, expand_stats.peak_states)
+                stats.merge(expand_stats)
+            expansions.append(children)
+    expansions += [[] for _ in range(len(beam) - len(expansions))]
+    if stats is not None:
+        # Each expansion's children are held only while it runs
+        stats.step(sum(map(len, expansions)), len(beam) + peak)
+    return expansions, complete
@@ -0,0 +1,87 @@
+from collections.abc import Mapping
+
+
+class PersistentMap(Mapping):
+    """Immutable position-keyed mapping with cheap structure-sharing updates.
+
+    Entries are chunked by row: an update copies only the touched row's
+    chunk and the small table of row references, and shares every other
+    row with the original. On the square map shapes that is O(side) work
+    instead of copying the whole layer.
+    """
+
+    __slots__ = ('_rows', '_len')
+
+    def __init__(self, rows=None, length=0):
+        self._rows = rows if rows is not None else {}
+        self._len = length
+
+    @classmethod
+    def from_mapping(cls, mapping):
+        if isinstance(mapping, PersistentMap):
+            return mapping
+        rows = {}
+        for pos, value in mapping.items():
+            rows.setdefault(pos[0], {})[pos] = value
+        return cls(rows, len(mapping))
+
+    def __getitem__(self, pos):
+        row = self._rows.get(pos[0])
+        if row is None:
+            raise KeyError(pos)
+        return row[pos]
+
+    def get(self, pos, default=None):
+        row = self._rows.get(pos[0])
+        if row is None:
+            return default
+        return row.get(pos, default)
+
+    def __contains__(self, pos):
+        row = self._rows.get(pos[0])
+        return row is not None and pos in row
+
+    def __iter__(self):
+        for row in self._rows.values():
+            yield from row
+
+    def __len__(self):
+        return self._len
+
+    def __repr__(self):
+        return f"PersistentMap({dict(self.items())!r})"
+
+    def set(self, pos, value):
+        """Return a new map with pos set to value."""
+        old_row = self._rows.get(pos[0], {})
+        row = {**old_row, pos: value}
+        length = self._len + (0 if pos in old_row else 1)
+        return PersistentMap({**self._rows, pos[0]: row}, length)
+
+    def set_many(self, items):
+        """Return a new map with every (pos, value) of items set, copying each touched row once."""
+        touched = {}
+        for pos, value in items:
+            row = touched.get(pos[0])
+            if row is None:
+                row = touched[pos[0]] = dict(self._rows.get(pos[0], ()))
+            row[pos] = value
+        length = self._len + sum(len(row) - len(self._rows.get(r, ())) for r, row in touched.items())
+        return PersistentMap({**self._rows, **touched}, length)
+
+    def row(self, r):
+        """Entries of row r as a dict shared with the map; it must not be mutated."""
+        return self._rows.get(r, {})
+
+    def delete(self, pos):
+        """Return a new map without pos; the same map if pos is absent."""
+        old_row = self._rows.get(pos[0])
+        if old_row is None or pos not in old_row:
+            return self
+        rows = dict(self._rows)
+        row = {p: v for p, v in old_row.items() if p != pos}
+        if row:
+            rows[pos[0]] = row
+        else:
+            del rows[pos[0]]
+        return PersistentMap(rows, self._len - 1)
@@ -0,0 +1,133 @@
+from map_state import adjacent_positions
+from rules import (
+    MULTIPLIERS, MAX_BORDER_LEVEL, HARVEST_ACTIONS, can_build, available_with_techs,
+)
+
+# The resource building each multiplier counts
+_FEEDS = {m['resource']: name for name, m in MULTIPLIERS.items()}
+# Actions that replace a tile's resource: (resource before, resource after), where None
+# means no resource (grow_forest needs a bare tile), never any resource
+_RESOURCE_CHANGES = {
+    'clear_forest': ('forest', None),
+    'burn_forest': ('forest', 'crop'),
+    'grow_forest': (None, 'forest'),
+}
+# Actions that act on the whole map; their effect is not judged statically
+GLOBAL_ACTIONS = frozenset({'found_city', 'expand_borders'})
+
+
+def relevant_actions(state, techs):
+    """
+    Tile actions that can ever help market income on state with techs.
+
+    A build is relevant if it can take part in a market chain: a market
+    next to a possible multiplier, a multiplier next to both a possible
+    resource building and a possible market, or a resource building next
+    to a possible multiplier of its kind. Possible means already built or
+    buildable on some resource the tile can reach by terrain actions, on
+    any tile a city or village could come to own; the sets are narrowed to
+    a fixed point. A terrain or harvest action is relevant if it leads to a
+    resource some relevant build on that tile needs. Returns a frozenset of
+    actions as moves.legal_moves spells them; GLOBAL_ACTIONS are never in
+    it and should always be kept.
+    """
+    available = available_with_techs(techs)
+    area = _ownable(state)
+    reachable = {
+        pos: _reachable(state.terrain_at(pos), state.resource_at(pos), available['actions'])
+        for pos in area
+    }
+    options = {
+        pos: {
+            b for b in available['buildings']
+            if any(can_build(b, state.terrain_at(pos), r) for r in reachable[pos])
+        }
+        for pos in area if not state.is_occupied(pos)
+    }
+    existing = dict(state.buildings)
+
+    def possible(pos, building):
+        return existing.get(pos) == building or building in options.get(pos, ())
+
+    def useful(pos, building):
+        adjacent = adjacent_positions(pos)
+        if building == 'market':
+            return any(possible(adj, m) for adj in adjacent for m in MULTIPLIERS)
+        if building in MULTIPLIERS:
+            resource = MULTIPLIERS[building]['resource']
+            return (
+                any(possible(adj, resource) for adj in adjacent)
+                and any(possible(adj, 'market') for adj in adjacent)
+            )
+        if building in _FEEDS:
+            return any(possible(adj, _FEEDS[building]) for adj in adjacent)
+        return False
+
+    changed = True
+    while changed:
+        changed = False
+        for pos, buildings in options.items():
+            kept = {b for b in buildings if useful(pos, b)}
+            if kept != buildings:
+                options[pos] = kept
+                changed = True
+
+    relevant = set()
+    for pos, buildings in options.items():
+        terrain, resource = state.terrain_at(pos), state.resource_at(pos)
+        relevant.update(('build', pos, b) for b in buildings)
+        # Resources this tile needs for a relevant build, other than the one it has
+        needed = {
+            r for r in reachable[pos] for b in buildings
+            if r != resource and can_build(b, terrain, r)
+        }
+        if not needed:
+            continue
+        for action_type, (before, after) in _RESOURCE_CHANGES.items():
+            if action_type in available['actions'] and resource == before:
+                if needed & _reachable(terrain, after, available['actions']):
+                    relevant.add((action_type, pos))
+        if resource in HARVEST_ACTIONS and needed & _reachable(terrain, None, available['actions']):
+            relevant.add(('harvest', pos))
+    return frozenset(relevant)
+
+
+def _reachable(terrain, resource, actions):
+    """Resources a tile can end up with through terrain and harvest actions."""
+    seen = {resource}
+    frontier = [resource]
+    while frontier:
+        current = frontier.pop()
+        following = []
+        for action_type, (before, after) in _RESOURCE_CHANGES.items():
+            if action_type in actions and current == before and (
+                action_type != 'grow_forest' or terrain == 'land'
+            ):
+                following.append(after)
+        if current in HARVEST_ACTIONS:
+            following.append(None)
+        for after in following:
+            if after not in seen:
+                seen.add(after)
+                frontier.append(after)
+    return seen
+
+
+def _ownable(state):
+    """Defined tiles that a city or village could come to own."""
+    centres = [
+        ((c['row'], c['col']), max(c['border_level'], MAX_BORDER_LEVEL)) for c in state.cities
+    ]
+    centres += [(pos, MAX_BORDER_LEVEL) for pos in state.villages]
+    defined = state.defined_positions()
+    area = set()
+    for (r, c), radius in centres:
+        area.update(
+            pos for pos in (
+                (r + dr, c + dc)
+                for dr in range(-radius, radius + 1)
+                for dc in range(-radius, radius + 1)
+            )
+            if pos in defined
+        )
+    return area
@@ -1,3 +1,5 @@
+import threading
+
 TERRAIN_TYPES = frozenset({'land', 'mountain', 'water', 'ocean'})
 
 RESOURCE_TYPES = frozenset({'forest', 'crop', 'metal', 'animal', 'fruit'})
@@ -48,8 +50,7 @@ BUILDINGS = {
 
 def can_build(building, terrain, resource):
     """Check if a building can be placed on a tile with the given terrain and resource."""
-    defn = BUILDINGS[building]
-    return (terrain, resource) in defn['eligible']
+    return bool(RULES.buildable_at(terrain, resource) >> RULES.building_ids[building] & 1)
 
 
 MULTIPLIERS = {
@@ -137,7 +138,134 @@ TERRAIN_ACTIONS = {
 
 MAP_SHAPES = frozenset({11, 14, 18, 22, 30})
 
+# Largest border level a city reaches in play (a 5x5 territory)
+MAX_BORDER_LEVEL = 2
+
 HARVEST_ACTIONS = {
     'animal': {'cost': 2, 'population': 1, 'tech': 'hunting'},
     'fruit': {'cost': 2, 'population': 1, 'tech': 'organization'},
 }
+
+ACTIONS = (
+    'build', 'clear_forest', 'burn_forest', 'grow_forest', 'harvest',
+    'found_city', 'expand_borders',
+)
+
+
+# Most entries each RuleSet cache keyed by tech set or tech mask keeps
+TECH_MASK_CACHE_SIZE = 1024
+
+
+class RuleSet:
+    """
+    The rule tables above compiled to integer ids and bitmasks.
+
+    Each layer numbers its names from 1 in a fixed order, with 0 meaning
+    none: undefined terrain, no resource, no building. Tech sets become
+    masks with one bit per entry of techs (unknown names are ignored), and
+    building sets masks with bit 1 << building id. buildable maps every
+    (terrain id, resource id) to the mask of buildings eligible there;
+    building_unlock and action_unlock hold the mask of techs that unlock
+    each building and action, 0 when nothing needs unlocking.
+    """
+
+    def __init__(self):
+        self._masks = {}
+        self._available = {}
+        self._cache_lock = threading.Lock()
+        self.terrains = (None, *sorted(TERRAIN_TYPES))
+        self.resources = (None, *sorted(RESOURCE_TYPES))
+        self.buildings = (None, *BUILDINGS)
+        self.actions = (None, *ACTIONS)
+        self.techs = tuple(TECHS)
+        self.terrain_ids = {name: i for i, name in enumerate(self.terrains)}
+        self.resource_ids = {name: i for i, name in enumerate(self.resources)}
+        self.building_ids = {name: i for i, name in enumerate(self.buildings) if name}
+        self.action_ids = {name: i for i, name in enumerate(self.actions) if name}
+        self.tech_bits = {name: 1 << i for i, name in enumerate(self.techs)}
+
+        self.buildable = tuple(
+            tuple(
+                self.mask_of(
+                    name for name, defn in BUILDINGS.items()
+                    if (terrain, resource) in defn['eligible']
+                )
+                for resource in self.resources
+            )
+            for terrain in self.terrains
+        )
+        self.building_unlock = tuple(
+            self.tech_mask(t for t, tech in TECHS.items() if name in tech['unlocks_buildings'])
+            for name in self.buildings
+        )
+        self.action_unlock = tuple(
+            self.tech_mask(t for t, tech in TECHS.items() if name in tech['unlocks_actions'])
+            for name in self.actions
+        )
+        self.harvest_unlock = tuple(
+            self.tech_mask([HARVEST_ACTIONS[name]['tech']]) if name in HARVEST_ACTIONS else 0
+            for name in self.resources
+        )
+        self.one_per_city = self.mask_of(ONE_PER_CITY)
+
+    def mask_of(self, buildings):
+        """Building mask of the named buildings."""
+        mask = 0
+        for name in buildings:
+            mask |= 1 << self.building_ids[name]
+        return mask
+
+    def names_in(self, mask):
+        """Building names in mask, in building id order."""
+        return [name for i, name in enumerate(self.buildings) if mask >> i & 1]
+
+    def tech_mask(self, techs):
+        """Tech mask of techs; frozensets of known techs are cached, the oldest dropped first."""
+        if isinstance(techs, frozenset):
+            mask = self._masks.get(techs)
+            if mask is None:
+                mask = self.tech_mask(iter(techs))
+                if techs <= self.tech_bits.keys():
+                    self._remember(self._masks, techs, mask)
+            return mask
+        mask = 0
+        for name in techs:
+            mask |= self.tech_bits.get(name, 0)
+        return mask
+
+    def unlocked(self, unlock, tech_mask):
+        """Whether an unlock mask is satisfied by tech_mask."""
+        return not unlock or bool(unlock & tech_mask)
+
+    def available_buildings(self, tech_mask):
+        """Building mask of the buildings tech_mask allows anywhere."""
+        mask = self._available.get(tech_mask)
+        if mask is None:
+            mask = 0
+            for i, unlock in enumerate(self.building_unlock):
+                if i and self.unlocked(unlock, tech_mask):
+                    mask |= 1 << i
+            self._remember(self._available, tech_mask, mask)
+        return mask
+
+    def _remember(self, cache, key, value):
+        """Store value in cache, dropping the oldest entry once TECH_MASK_CACHE_SIZE are held.
+
+        Writers take the lock so that concurrent evictions never pick the
+        same entry; readers only use get.
+        """
+        with self._cache_lock:
+            if len(cache) >= TECH_MASK_CACHE_SIZE:
+                cache.pop(next(iter(cache), None), None)
+            cache[key] = value
+
+    def buildable_at(self, terrain, resource):
+        """Building mask eligible on a tile with the named terrain and resource."""
+        t = self.terrain_ids.get(terrain)
+        r = self.resource_ids.get(resource)
+        if t is None or r is None:
+            return 0
+        return self.buildable[t][r]
+
+
+RULES = RuleSet()
@@ -1,26 +1,173 @@
-from flask import Flask, request, jsonify
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import Flask, Response, g, request, jsonify
+from jobs import JobQueue, QueueFull
 from map_state import MapState
-from optimizer import optimize as run_optimize
-from economics import total_income, sequence_cost, market_income, multiplier_level
-from rules import MAP_SHAPES, is_multiplier
+from persistent_map import PersistentMap
+from metrics import Registry
+from optimizer import optimize as run_optimize, repair_region, STRATEGIES, SearchStats
+from economics import total_income, building_value, market_income
+from result_cache import ResultCache, content_key
+from rules import MAP_SHAPES, RULES
+from sweep import sweep, ECONOMY_TECHS
 
 app = Flask(__name__, static_folder='static', static_url_path='')
 
+# Worker processes for /jobs, and how many jobs may wait or run before
+# new submissions are turned away with 429.
+JOB_WORKERS = max((os.cpu_count() or 2) // 2, 1)
+JOB_QUEUE_DEPTH = 4 * JOB_WORKERS
+
+# Worker processes shared by /optimize/batch and the parallel strategies,
+# and the most scenarios one batch may hold.
+POOL_WORKERS = os.cpu_count() or 1
+BATCH_LIMIT = 512
+_pool = None
+_pool_lock = threading.Lock()
+
+# /optimize results kept in memory; set OPTIMIZE_CACHE_PATH to a SQLite
+# file to keep them across restarts.
+result_cache = ResultCache(
+    max_entries=int(os.environ.get('OPTIMIZE_CACHE_SIZE', 256)),
+    path=os.environ.get('OPTIMIZE_CACHE_PATH'),
+)
+
+# Served at /metrics in Prometheus text format. Solver counters cover every
+# search but those of /jobs, which run in the job queue's own processes;
+# /optimize/batch workers send back what the counters need.
+metrics = Registry()
+REQUEST_LATENCY = metrics.histogram(
+    'http_request_duration_seconds', 'Time to produce a response, by route.', ('endpoint',),
+)
+REQUESTS = metrics.counter(
+    'http_requests_total', 'Requests handled, by route, method and status.',
+    ('endpoint', 'method', 'status'),
+)
+REQUEST_ERRORS = metrics.counter(
+    'http_request_errors_total', 'Requests answered with an error status, by route.',
+    ('endpoint', 'status'),
+)
+IN_FLIGHT = metrics.gauge('http_requests_in_flight', 'Requests being handled now.')
+SEARCHES = metrics.counter('optimizer_runs_total', 'Optimizer runs, by strategy.', ('strategy',))
+NODES = metrics.counter('optimizer_nodes_total', 'Candidate states the optimizer built.')
+MOVES = metrics.counter(
+    'optimizer_moves_evaluated_total', 'Candidate actions the optimizer scored.',
+)
+STEPS = metrics.counter('optimizer_steps_total', 'Actions in the plans the optimizer returned.')
+SEARCH_SECONDS = metrics.histogram(
+    'optimizer_search_duration_seconds', 'Wall time of optimizer runs, by strategy.',
+    ('strategy',),
+)
+MAP_SIDES = metrics.histogram(
+    'optimizer_map_side_tiles', 'Side length of the maps optimized.',
+    buckets=sorted(MAP_SHAPES),
+)
+
+
+@app.before_request
+def _start_request():
+    g.request_start = time.perf_counter()
+    IN_FLIGHT.inc()
+
+
+@app.after_request
+def _record_request(response):
+    # Route patterns rather than paths, so job ids do not become labels
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    if response.status_code >= 400:
+        REQUEST_ERRORS.inc(endpoint=endpoint, status=response.status_code)
+    start = g.pop('request_start', None)
+    if start is not None:
+        def finish():
+            REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint)
+            IN_FLIGHT.dec()
+
+        if response.is_streamed:
+            # A streamed body is produced after this hook, so time it until it closes
+            response.call_on_close(finish)
+        else:
+            finish()
+    return response
+
+
+@app.teardown_request
+def _finish_request(error):
+    # Requests that failed before _record_request ran
+    if g.pop('request_start', None) is not None:
+        IN_FLIGHT.dec()
+
+
+@app.get('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def _observe_search(state, options, result):
+    """Add one optimize run on state, with its result, to the solver metrics."""
+    _record_search(_search_summary(state, options, result))
+
+
+def _search_summary(state, options, result):
+    """What the solver metrics take from one optimize run, as plain data a worker can return."""
+    return {
+        'strategy': options['strategy'],
+        'nodes': result['nodes'],
+        'moves': result['moves'],
+        'steps': len(result['actions']),
+        'seconds': result['seconds'],
+        'side': max((max(r, c) + 1 for r, c in state.terrain), default=0),
+    }
+
+
+def _record_search(summary):
+    SEARCHES.inc(strategy=summary['strategy'])
+    NODES.inc(summary['nodes'])
+    MOVES.inc(summary['moves'])
+    STEPS.inc(summary['steps'])
+    SEARCH_SECONDS.observe(summary['seconds'], strategy=summary['strategy'])
+    MAP_SIDES.observe(summary['side'])
+
 
 @app.route('/')
 def index():
     return app.send_static_file('index.html')
 
 
-def _state_from_json(data):
-    """Convert JSON request data into a MapState."""
+def _shared_pool():
+    """The process pool searches and batches share, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=POOL_WORKERS)
+        return _pool
+
+
+def _tiles_from_json(tiles):
+    """Parse request tiles into (terrain, resources) layers that states may share."""
     terrain = {}
     resources = {}
-    for t in data.get('tiles', []):
+    for t in tiles:
         pos = (t['row'], t['col'])
         terrain[pos] = t['terrain']
         if 'resource' in t:
             resources[pos] = t['resource']
+    return terrain, PersistentMap.from_mapping(resources)
+
+
+def _state_from_json(data, layers=None):
+    """Convert JSON request data into a MapState.
+
+    layers, from _tiles_from_json, replaces parsing data's tiles.
+    """
+    if layers is None:
+        layers = _tiles_from_json(data.get('tiles', []))
+    terrain, resources = layers
 
     cities = tuple(data.get('cities', []))
     villages = frozenset(
@@ -47,27 +194,131 @@ def _state_from_json(data):
     )
 
 
-@app.post('/optimize')
-def optimize_endpoint():
-    data = request.get_json(silent=True)
-    if not data:
-        return jsonify({'error': 'Invalid JSON'}), 400
+def _score(state, actions):
+    return (total_income(state), building_value(state), -actions.cost)
 
-    state = _state_from_json(data)
-    techs = frozenset(data.get('techs', []))
-    initial = state
 
-    def score(state, actions):
-        income = total_income(state)
-        building_value = sum(
-            multiplier_level(pos, state) if is_multiplier(bldg) else 1
-            for pos, bldg in state.buildings.items()
-        )
-        cost = sequence_cost(actions, initial)
-        return (income, building_value, -cost)
+def _search_options(data):
+    """Read optimizer options from request data; raise ValueError if invalid."""
+    strategy = data.get('strategy', 'greedy')
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    beam_width = data.get('beam_width', 8)
+    if not isinstance(beam_width, int) or beam_width < 1:
+        raise ValueError("beam_width must be a positive integer")
+    decompose = data.get('decompose', False)
+    if not isinstance(decompose, bool):
+        raise ValueError("decompose must be true or false")
+    options = {
+        'strategy': strategy, 'beam_width': beam_width, 'decompose': decompose,
+        'workers': POOL_WORKERS,
+    }
+    stats = data.get('stats', False)
+    if not isinstance(stats, bool):
+        raise ValueError("stats must be true or false")
+    if stats:
+        options['stats'] = SearchStats()
+    budget = data.get('time_budget_ms')
+    if budget is not None:
+        if isinstance(budget, bool) or not isinstance(budget, (int, float)) or budget <= 0:
+            raise ValueError("time_budget_ms must be a positive number")
+        options['deadline'] = time.monotonic() + budget / 1000
+    if 'seed_actions' in data:
+        options['seed_actions'] = _actions_from_json(data['seed_actions'])
+    changed = data.get('changed', [])
+    if not isinstance(changed, list) or not all(
+        isinstance(t, dict) and 'row' in t and 'col' in t for t in changed
+    ):
+        raise ValueError("changed must be a list of {row, col} tiles")
+    return options
+
+
+def _actions_from_json(actions):
+    """Turn actions as /optimize returns them, with [row, col] positions, back into tuples.
+
+    Raise ValueError for an action apply_action cannot take: an unknown
+    type or building, the wrong number of arguments, or a position that
+    is not [row, col].
+    """
+    if not isinstance(actions, list) or not all(isinstance(a, list) and a for a in actions):
+        raise ValueError("seed_actions must be a list of actions")
+    return [_action_from_json(action, f"seed_actions[{i}]") for i, action in enumerate(actions)]
+
+
+def _action_from_json(action, where):
+    kind, *args = action
+    if not isinstance(kind, str) or kind not in RULES.action_ids:
+        raise ValueError(f"{where}: unknown action {kind!r}")
+    if kind == 'expand_borders':
+        if len(args) != 1 or not _is_int(args[0]):
+            raise ValueError(f"{where}: expand_borders takes a city id")
+        return (kind, args[0])
+    if kind == 'build':
+        if len(args) != 2:
+            raise ValueError(f"{where}: build takes a position and a building")
+        if not isinstance(args[1], str) or args[1] not in RULES.building_ids:
+            raise ValueError(f"{where}: unknown building {args[1]!r}")
+    elif len(args) != 1:
+        raise ValueError(f"{where}: {kind} takes a position")
+    pos = args[0]
+    if not isinstance(pos, list) or len(pos) != 2 or not all(map(_is_int, pos)):
+        raise ValueError(f"{where}: position must be [row, col]")
+    return (kind, tuple(pos), *args[1:])
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _warm_start_region(data, state):
+    """Region to re-search for a warm start with 'changed' tiles, else None.
+
+    Without changed tiles, or with an empty list, the whole map is searched
+    again after the seed plan.
+    """
+    if 'seed_actions' not in data or not data.get('changed'):
+        return None
+    return repair_region(state, [(t['row'], t['col']) for t in data['changed']])
+
+
+def _cache_key(data, options):
+    """Content hash of everything in a request that can change its plan.
+
+    Positions collapse to one entry each, as _state_from_json reads them, and
+    unordered collections are sorted; city order is kept because the first
+    city claims contested tiles. The time budget is left out, since only
+    complete results are cached.
+    """
+    tiles = {}
+    for t in data.get('tiles', []):
+        tiles[(t['row'], t['col'])] = [t['terrain'], t.get('resource')]
+    pinned = {(p['row'], p['col']): p['building'] for p in data.get('pinned', [])}
+
+    def positions(name):
+        return sorted({(p['row'], p['col']) for p in data.get(name, [])})
+
+    return content_key({
+        'tiles': sorted([*pos, *value] for pos, value in tiles.items()),
+        'cities': list(data.get('cities', [])),
+        'villages': positions('villages'),
+        'monuments': positions('monuments'),
+        'lighthouses': positions('lighthouses'),
+        'pinned': sorted([*pos, building] for pos, building in pinned.items()),
+        'techs': sorted(set(data.get('techs', []))),
+        'strategy': options['strategy'],
+        'beam_width': options['beam_width'],
+        'decompose': options['decompose'],
+        'seed_actions': data.get('seed_actions'),
+        'changed': sorted({(t['row'], t['col']) for t in data.get('changed', [])}),
+    })
+
+
+def _requested_stats(options):
+    return options.get('stats')
 
-    result = run_optimize(state, techs, score)
 
+def _plan_json(result, stats=None):
+    """JSON body describing an optimize() result, with a 'stats' block if stats is given."""
     placements = [
         {'row': pos[0], 'col': pos[1], 'building': bldg}
         for pos, bldg in result['state'].buildings.items()
@@ -80,13 +331,341 @@ def optimize_endpoint():
                 'income': market_income(pos, result['state']),
             })
 
-    return jsonify({
+    body = {
         'placements': placements,
         'markets': markets,
         'total_income': result['income'],
-        'total_cost': sequence_cost(result['actions'], initial),
+        'total_cost': result['cost'],
+        'total_population': result['population'],
         'actions': [list(a) for a in result['actions']],
-    })
+        'complete': result['complete'],
+    }
+    if stats is not None:
+        body['stats'] = stats.as_dict()
+    return body
+
+
+@app.post('/optimize')
+def optimize_endpoint():
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'Invalid JSON'}), 400
+    try:
+        options = _search_options(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    key = _cache_key(data, options)
+    # Stats describe a search, so a request for them always runs one
+    cached = result_cache.get(key) if not data.get('stats') else None
+    if cached is not None:
+        return jsonify(cached), {'X-Cache': 'hit'}
+
+    state = _state_from_json(data)
+    techs = frozenset(data.get('techs', []))
+
+    result = run_optimize(state, techs, _score, pool=_shared_pool(),
+                          region=_warm_start_region(data, state), **options)
+    _observe_search(state, options, result)
+    body = _plan_json(result, _requested_stats(options))
+    if result['complete']:
+        result_cache.put(key, {k: v for k, v in body.items() if k != 'stats'})
+    return jsonify(body), {'X-Cache': 'miss'}
+
+
+@app.get('/cache')
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+
+class _StreamClosed(Exception):
+    pass
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post('/optimize/stream')
+def optimize_stream():
+    """Optimize as /optimize does, streaming Server-Sent Events as the plan improves.
+
+    Each improvement is a 'progress' event with step, action, income,
+    elapsed and the partial plan; the final plan follows as a 'result'
+    event. Closing the stream stops the search at its next improvement.
+    A plan in the /optimize result cache is sent as the 'result' event
+    straight away, and complete plans are added to it.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'Invalid JSON'}), 400
+    try:
+        options = _search_options(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    key = _cache_key(data, options)
+    cached = result_cache.get(key) if not data.get('stats') else None
+    if cached is not None:
+        return Response(_sse('result', cached), mimetype='text/event-stream',
+                        headers={**headers, 'X-Cache': 'hit'})
+
+    initial = _state_from_json(data)
+    techs = frozenset(data.get('techs', []))
+    events = queue.Queue()
+    closed = threading.Event()
+
+    def report(event):
+        if closed.is_set():
+            raise _StreamClosed
+        partial_result = {**event, 'complete': False}
+        events.put(_sse('progress', {
+            'step': event['step'],
+            'action': list(event['action']) if event['action'] else None,
+            'income': event['income'],
+            'elapsed': event['elapsed'],
+            'plan': _plan_json(partial_result),
+        }))
+
+    def run():
+        try:
+            result = run_optimize(initial, techs, _score, progress=report, pool=_shared_pool(),
+                                  region=_warm_start_region(data, initial), **options)
+            _observe_search(initial, options, result)
+            body = _plan_json(result, _requested_stats(options))
+            if result['complete']:
+                result_cache.put(key, {k: v for k, v in body.items() if k != 'stats'})
+            events.put(_sse('result', body))
+        except _StreamClosed:
+            pass
+        except Exception as e:
+            events.put(_sse('error', {'error': str(e)}))
+        finally:
+            events.put(None)
+
+    def stream():
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        try:
+            while (message := events.get()) is not None:
+                yield message
+        finally:
+            closed.set()
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={**headers, 'X-Cache': 'miss'})
+
+
+def _optimize_job(data, progress):
+    """Job body for /jobs: optimize in the calling worker process."""
+    # The job pool already spreads work over processes, and the time
+    # budget starts when the job does rather than when it was queued.
+    options = {**_search_options(data), 'workers': 1}
+    initial = _state_from_json(data)
+    techs = frozenset(data.get('techs', []))
+
+    def report(event):
+        progress({
+            'step': event['step'],
+            'action': list(event['action']) if event['action'] else None,
+            'income': event['income'],
+            'elapsed': event['elapsed'],
+        })
+
+    result = run_optimize(initial, techs, _score, progress=report,
+                          region=_warm_start_region(data, initial), **options)
+    return _plan_json(result, _requested_stats(options))
+
+
+jobs = JobQueue(_optimize_job, max_workers=JOB_WORKERS, max_queued=JOB_QUEUE_DEPTH)
+
+
+@app.post('/jobs')
+def submit_job():
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'Invalid JSON'}), 400
+    try:
+        _search_options(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        job_id = jobs.submit(data)
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 429, {'Retry-After': '1'}
+    return jsonify({'id': job_id, 'status': 'queued'}), 202, {'Location': f'/jobs/{job_id}'}
+
+
+@app.get('/jobs/<job_id>')
+def job_status(job_id):
+    info = jobs.status(job_id)
+    if info is None:
+        return jsonify({'error': f"No job {job_id}"}), 404
+    return jsonify(info)
+
+
+@app.delete('/jobs/<job_id>')
+def cancel_job(job_id):
+    if jobs.status(job_id) is None:
+        return jsonify({'error': f"No job {job_id}"}), 404
+    if not jobs.cancel(job_id):
+        return jsonify({'error': f"Job {job_id} already finished"}), 409
+    return jsonify({'id': job_id, 'status': 'cancelled'})
+
+
+def _batch_scenarios(data):
+    """Scenarios of a batch request, each merged over its 'base'; raise ValueError if invalid."""
+    base = data.get('base', {})
+    scenarios = data.get('scenarios')
+    if not isinstance(base, dict):
+        raise ValueError("base must be an object")
+    if not isinstance(scenarios, list) or not scenarios:
+        raise ValueError("scenarios must be a non-empty list")
+    if len(scenarios) > BATCH_LIMIT:
+        raise ValueError(f"At most {BATCH_LIMIT} scenarios per batch")
+    merged = []
+    for i, scenario in enumerate(scenarios):
+        if not isinstance(scenario, dict):
+            raise ValueError(f"scenarios[{i}] must be an object")
+        merged.append({**base, **scenario})
+    return merged
+
+
+def _optimize_scenario(layers, data, options):
+    """(plan JSON, _search_summary) for one batch scenario on parsed tile layers.
+
+    A scenario that fails gives ({'error': ...}, None).
+    """
+    try:
+        state = _state_from_json(data, layers)
+        result = run_optimize(state, frozenset(data.get('techs', [])), _score,
+                              region=_warm_start_region(data, state), **options)
+        return _plan_json(result, _requested_stats(options)), _search_summary(state, options, result)
+    except Exception as e:
+        return {'error': str(e)}, None
+
+
+def _optimize_scenarios(layers, scenarios):
+    """_optimize_scenario for (data, options) scenarios sharing one map's parsed tile layers."""
+    return [_optimize_scenario(layers, data, options) for data, options in scenarios]
+
+
+@app.post('/optimize/batch')
+def optimize_batch():
+    """Optimize many scenarios in one request, on the shared worker processes.
+
+    The body holds 'scenarios', a list of /optimize request bodies, and
+    optionally 'base', fields every scenario starts from. Each distinct
+    tile list is parsed once, and scenarios over one map go to the
+    workers in chunks that carry its terrain once per chunk. Each
+    scenario runs single-process, its time budget counted from when the
+    request arrived. Returns 'results' in scenario order: a plan as
+    /optimize gives it, or an 'error' for a scenario that failed.
+    Complete plans go through the /optimize result cache.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'Invalid JSON'}), 400
+    try:
+        scenarios = _batch_scenarios(data)
+        options = []
+        keys = []
+        for i, scenario in enumerate(scenarios):
+            try:
+                options.append({**_search_options(scenario), 'workers': 1})
+                keys.append(_cache_key(scenario, options[i]))
+            except ValueError as e:
+                raise ValueError(f"scenarios[{i}]: {e}")
+            except (KeyError, TypeError) as e:
+                raise ValueError(f"scenarios[{i}]: malformed field {e}")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    results = [None] * len(scenarios)
+    by_map = {}
+    for i, (scenario, key) in enumerate(zip(scenarios, keys)):
+        cached = result_cache.get(key) if not scenario.get('stats') else None
+        if cached is not None:
+            results[i] = cached
+        else:
+            by_map.setdefault(content_key(scenario.get('tiles', [])), []).append(i)
+
+    chunks = []
+    for indices in by_map.values():
+        layers = _tiles_from_json(scenarios[indices[0]].get('tiles', []))
+        count = min(POOL_WORKERS, len(indices))
+        chunks.extend((layers, indices[n::count]) for n in range(count))
+
+    work = [(layers, [(scenarios[i], options[i]) for i in indices]) for layers, indices in chunks]
+    if POOL_WORKERS > 1 and len(work) > 1:
+        futures = [_shared_pool().submit(_optimize_scenarios, *chunk) for chunk in work]
+        planned = [future.result() for future in futures]
+    else:
+        planned = [_optimize_scenarios(*chunk) for chunk in work]
+
+    # Scenarios run in worker processes are counted here, where /metrics is served
+    for (_, indices), bodies in zip(chunks, planned):
+        for i, (body, summary) in zip(indices, bodies):
+            if summary is not None:
+                _record_search(summary)
+            results[i] = body
+            if body.get('complete'):
+                result_cache.put(keys[i], {k: v for k, v in body.items() if k != 'stats'})
+    return jsonify({'results': results})
+
+
+@app.post('/optimize/sweep')
+def optimize_sweep():
+    """Optimize one map for every researchable set of economy techs.
+
+    The body is an /optimize request; its 'techs' are held throughout and
+    'sweep', by default every tech in sweep.ECONOMY_TECHS, lists the techs
+    to vary. Returns 'lattice', one entry per tech set with its 'techs',
+    'total_income', 'total_cost' and the index of its plan in 'plans'.
+    Tech sets that unlock the same moves share a plan; 'searches' counts
+    the optimize runs the sweep took.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'Invalid JSON'}), 400
+    try:
+        options = _search_options(data)
+        if 'seed_actions' in data:
+            raise ValueError("seed_actions cannot be used with a sweep")
+        swept = data.get('sweep', list(ECONOMY_TECHS))
+        if not isinstance(swept, list) or any(t not in ECONOMY_TECHS for t in swept):
+            raise ValueError(f"sweep must list techs from {', '.join(ECONOMY_TECHS)}")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    state = _state_from_json(data)
+    techs = frozenset(data.get('techs', []))
+    swept = [t for t in ECONOMY_TECHS if t in swept]
+    result = sweep(state, _score, swept, held=techs, pool=_shared_pool(), **options)
+
+    plans = {}
+    lattice = []
+    for subset, plan in result['results'].items():
+        index = plans.setdefault(id(plan), (len(plans), plan))[0]
+        lattice.append({
+            'techs': [t for t in swept if t in subset],
+            'total_income': plan['income'],
+            'total_cost': plan['cost'],
+            'plan': index,
+        })
+    for _, plan in plans.values():
+        _observe_search(state, options, plan)
+    body = {
+        'techs': swept,
+        'searches': result['searches'],
+        'lattice': lattice,
+        'plans': [_plan_json(plan) for _, plan in plans.values()],
+    }
+    stats = _requested_stats(options)
+    if stats is not None:
+        body['stats'] = stats.as_dict()
+    return jsonify(body)
 
 
 @app.post('/territory')
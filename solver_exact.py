@@ -0,0 +1,378 @@
+import time
+
+import coordinate_descent
+from actions import apply_action
+from economics import total_income
+from map_state import adjacent_positions
+from rules import (
+    BUILDINGS, MULTIPLIERS, MARKET_CAP, ONE_PER_CITY,
+    can_build, is_multiplier, available_with_techs,
+)
+
+# The multiplier fed by each resource building
+_FEEDS = {m['resource']: name for name, m in MULTIPLIERS.items()}
+
+
+class _Stop(Exception):
+    pass
+
+
+def solve(state, techs, node_limit=None, time_limit=None):
+    """
+    Branch-and-bound search for the placement of buildings on free owned
+    tiles that maximises total market income.
+
+    Every free owned tile either gets one building it is eligible for or
+    stays empty. Terrain actions and territory changes are not considered.
+    Returns the best plan found together with 'optimal' (the search
+    finished), 'nodes' explored, 'bound' (an upper bound on the optimal
+    income) and 'gap' (bound minus the income found). node_limit and
+    time_limit (seconds) stop the search early.
+
+    A single coordinate descent run, given at most half of time_limit,
+    seeds the incumbent so the bound prunes from the start.
+    """
+    search = _Search(state, techs, node_limit, time_limit)
+    search.run(_seed(state, techs, time_limit))
+    actions = [
+        ('build', pos, building)
+        for pos, building in sorted(search.assignment.items())
+        if building is not None
+    ]
+    final = state
+    for action in actions:
+        final = apply_action(final, action)
+    income = total_income(final)
+    bound = max(search.upper_bound, income)
+    return {
+        'state': final,
+        'actions': actions,
+        'income': income,
+        'optimal': search.complete,
+        'nodes': search.nodes,
+        'bound': bound,
+        'gap': bound - income,
+    }
+
+
+def _seed(state, techs, time_limit):
+    """Buildings of one coordinate descent run, as {pos: building}."""
+    deadline = None if time_limit is None else time.monotonic() + time_limit / 2
+    plan = coordinate_descent.solve(
+        state, techs, lambda s, actions: total_income(s), restarts=1, patience=1, workers=1,
+        deadline=deadline,
+    )
+    return {action[1]: action[2] for action in plan['actions'] if action[0] == 'build'}
+
+
+class _Search:
+    """
+    Depth-first branch and bound over one tile at a time.
+
+    poss[pos] is the set of buildings still possible at pos, with None for
+    an empty tile; existing buildings are fixed singletons. The bound is the
+    sum over possible markets of the income each could reach if every
+    neighbour took its most useful remaining option. It is admissible and
+    exact once every tile is fixed.
+
+    twin[pos] is an earlier tile of the same city with the same options
+    and the same neighbours with options, apart from each other. Swapping
+    the two tiles' buildings cannot change income, so pos only takes
+    options ranked no higher than its twin's (symmetry pruning).
+    """
+
+    def __init__(self, state, techs, node_limit, time_limit):
+        self.node_limit = node_limit
+        self.deadline = None if time_limit is None else time.monotonic() + time_limit
+        self.nodes = 0
+        self.complete = True
+        self.upper_bound = 0
+        self.assignment = {}
+
+        available = available_with_techs(techs)['buildings']
+        self.poss = {pos: frozenset({b}) for pos, b in state.buildings.items()}
+        self.city_of = {}
+        for pos in sorted(state.defined_positions()):
+            city_id = state.owner_of(pos)
+            if city_id is None or state.is_occupied(pos):
+                continue
+            terrain, resource = state.terrain_at(pos), state.resource_at(pos)
+            options = {b for b in available if can_build(b, terrain, resource)}
+            for building in ONE_PER_CITY & options:
+                if state.city_has_building(city_id, building):
+                    options.discard(building)
+            self.poss[pos] = frozenset(options | {None})
+            self.city_of[pos] = city_id
+        self.adjacent = {pos: tuple(adjacent_positions(pos)) for pos in self.poss}
+        self._prune_options()
+        self.twin = self._twins()
+        self.market_bound = {
+            pos: self._market_bound(pos) for pos, options in self.poss.items() if 'market' in options
+        }
+
+    def _prune_options(self):
+        """Drop options that can never add income, then options dominated by another."""
+        changed = True
+        while changed:
+            changed = False
+            for pos in self.city_of:
+                options = frozenset(b for b in self.poss[pos] if b is None or self._useful(pos, b))
+                if options != self.poss[pos]:
+                    self.poss[pos] = options
+                    changed = True
+        for pos in self.city_of:
+            options = self.poss[pos]
+            # A market or resource building never lowers income, so it beats an empty tile
+            if len(options) > 1 and options & ({'market'} | set(_FEEDS)):
+                self.poss[pos] = options - {None}
+
+    def _twins(self):
+        """Chain each tile to the latest earlier twin not already chained."""
+        def neighbours(pos):
+            return {adj for adj in self.adjacent[pos] if self.poss.get(adj, {None}) != {None}}
+
+        twin = {}
+        chained = set()
+        tiles = sorted(self.city_of)
+        for i, pos in enumerate(tiles):
+            if self.poss[pos] == {None}:
+                continue
+            around = neighbours(pos)
+            for other in reversed(tiles[:i]):
+                if (
+                    other not in chained
+                    and self.city_of[other] == self.city_of[pos]
+                    and self.poss[other] == self.poss[pos]
+                    and around - {other} == neighbours(other) - {pos}
+                ):
+                    twin[pos] = other
+                    chained.add(other)
+                    break
+        return twin
+
+    def _useful(self, pos, building):
+        if building == 'market':
+            return self._market_bound(pos) > 0
+        if is_multiplier(building):
+            return (
+                self._level_bound(pos, building) > 0
+                and any('market' in self.poss.get(adj, ()) for adj in self.adjacent[pos])
+            )
+        if building in _FEEDS:
+            return any(_FEEDS[building] in self.poss.get(adj, ()) for adj in self.adjacent[pos])
+        return False
+
+    def _level_bound(self, pos, multiplier):
+        m = MULTIPLIERS[multiplier]
+        return m['weight'] * sum(
+            1 for adj in self.adjacent[pos] if m['resource'] in self.poss.get(adj, ())
+        )
+
+    def _market_bound(self, pos):
+        """Highest income a market at pos could still reach.
+
+        A city holds at most one multiplier of each type, so only the best
+        neighbour per (city, multiplier type) counts.
+        """
+        best = {}
+        for adj in self.adjacent[pos]:
+            for b in self.poss.get(adj, ()):
+                if b is not None and is_multiplier(b):
+                    group = (self.city_of.get(adj, adj), b)
+                    level = self._level_bound(adj, b)
+                    if level > best.get(group, 0):
+                        best[group] = level
+        return min(sum(best.values()), MARKET_CAP)
+
+    def _components(self):
+        """Split positions into groups that cannot affect each other's income.
+
+        Buildings interact over at most two steps (market, multiplier,
+        resource building) and the one-per-city rule ties a city's tiles
+        together, so anything further apart is independent.
+        """
+        parent = {pos: pos for pos in self.poss}
+
+        def find(pos):
+            while parent[pos] != pos:
+                parent[pos] = parent[parent[pos]]
+                pos = parent[pos]
+            return pos
+
+        first_tile = {}
+        for pos in self.poss:
+            for dr in range(-2, 3):
+                for dc in range(-2, 3):
+                    other = (pos[0] + dr, pos[1] + dc)
+                    if other in parent:
+                        parent[find(other)] = find(pos)
+            if pos in self.city_of:
+                city_id = self.city_of[pos]
+                parent[find(pos)] = find(first_tile.setdefault(city_id, pos))
+
+        groups = {}
+        for pos in sorted(self.poss):
+            groups.setdefault(find(pos), []).append(pos)
+        return list(groups.values())
+
+    def run(self, seed=None):
+        components = []
+        for group in self._components():
+            tiles = [pos for pos in group if pos in self.city_of]
+            markets = [pos for pos in group if pos in self.market_bound]
+            components.append((tiles, markets))
+        # Dives give every component a plan before any branching, so an
+        # early stop still returns something sensible: one along the best
+        # bounds, and one following seed where its buildings are options.
+        incumbents = [
+            max(self._dive(tiles, markets), self._dive(tiles, markets, seed or {}),
+                key=lambda dive: dive[0])
+            for tiles, markets in components
+        ]
+        for income, assignment in incumbents:
+            self.assignment.update(assignment)
+
+        for i, (tiles, markets) in enumerate(components):
+            if not self.complete:
+                self.upper_bound += sum(self.market_bound[m] for m in markets)
+                continue
+            income, assignment = incumbents[i]
+            self._start(tiles, markets, income, assignment)
+            try:
+                self._search(0)
+            except _Stop:
+                self.complete = False
+                self.upper_bound += max(self.remaining_bound, self.best_income)
+            else:
+                self.upper_bound += self.best_income
+            self.assignment.update(self.best_assignment)
+
+    def _start(self, tiles, markets, best_income=-1, best_assignment=None):
+        self.tiles = tiles
+        self.city_tiles = {}
+        for i, pos in enumerate(tiles):
+            self.city_tiles.setdefault(self.city_of[pos], []).append((i, pos))
+        self.bound = sum(self.market_bound[m] for m in markets)
+        self.best_income = best_income
+        self.best_assignment = best_assignment or {}
+        self.remaining_bound = 0
+
+    def _dive(self, tiles, markets, prefer=None):
+        """Fix each tile in turn to its best-bound option, without backtracking.
+
+        prefer, {pos: building}, overrides the choice wherever it is still
+        an option; tiles missing from it prefer staying empty.
+        """
+        self._start(tiles, markets)
+        records = []
+        for depth, pos in enumerate(tiles):
+            children = self._children(depth, symmetry=False)
+            option = children[0][2]
+            if prefer is not None and any(o == prefer.get(pos) for _, _, o in children):
+                option = prefer.get(pos)
+            records.append(self._assign(depth, option))
+        result = (self.bound, {pos: next(iter(self.poss[pos])) for pos in tiles})
+        for record in reversed(records):
+            self._undo(record)
+        return result
+
+    def _assign(self, depth, option):
+        """Fix tiles[depth] to option; return the record that undoes it."""
+        pos = self.tiles[depth]
+        changed = [(pos, self.poss[pos])]
+        self.poss[pos] = frozenset({option})
+        if option in ONE_PER_CITY:
+            for i, other in self.city_tiles[self.city_of[pos]]:
+                if i > depth and option in self.poss[other]:
+                    changed.append((other, self.poss[other]))
+                    self.poss[other] = self.poss[other] - {option}
+        affected = set()
+        for changed_pos, _ in changed:
+            for dr in range(-2, 3):
+                for dc in range(-2, 3):
+                    market = (changed_pos[0] + dr, changed_pos[1] + dc)
+                    if market in self.market_bound:
+                        affected.add(market)
+        old_bounds = []
+        for market in affected:
+            old = self.market_bound[market]
+            new = self._market_bound(market) if 'market' in self.poss[market] else 0
+            old_bounds.append((market, old))
+            self.market_bound[market] = new
+            self.bound += new - old
+        return changed, old_bounds
+
+    def _undo(self, record):
+        changed, old_bounds = record
+        for pos, options in changed:
+            self.poss[pos] = options
+        for market, old in old_bounds:
+            self.bound += old - self.market_bound[market]
+            self.market_bound[market] = old
+
+    def _children(self, depth, symmetry=True):
+        """(bound, tiebreak, option) for each option at tiles[depth], best first.
+
+        With symmetry, options ranked above the twin's are left out; that
+        can leave none, when the swapped assignment is the one searched.
+        """
+        pos = self.tiles[depth]
+        options = self.poss[pos]
+        if symmetry and pos in self.twin:
+            limit = _rank(next(iter(self.poss[self.twin[pos]])))
+            options = [option for option in options if _rank(option) <= limit]
+        children = []
+        for option in options:
+            record = self._assign(depth, option)
+            children.append((self.bound, _option_order(option), option))
+            self._undo(record)
+        children.sort(reverse=True)
+        return children
+
+    def _search(self, depth):
+        self.nodes += 1
+        if (
+            (self.node_limit is not None and self.nodes > self.node_limit)
+            or (self.deadline is not None and self.nodes % 256 == 0
+                and time.monotonic() > self.deadline)
+        ):
+            self.remaining_bound = max(self.remaining_bound, self.bound)
+            raise _Stop
+
+        if depth == len(self.tiles):
+            # Every option is fixed, so the bound is the exact income
+            if self.bound > self.best_income:
+                self.best_income = self.bound
+                self.best_assignment = {pos: next(iter(self.poss[pos])) for pos in self.tiles}
+            return
+
+        children = self._children(depth)
+        for i, (bound, _, option) in enumerate(children):
+            if bound <= self.best_income:
+                break
+            record = self._assign(depth, option)
+            try:
+                self._search(depth + 1)
+            except _Stop:
+                self.remaining_bound = max(
+                    [self.remaining_bound] + [b for b, _, _ in children[i:]]
+                )
+                raise
+            finally:
+                self._undo(record)
+
+
+def _rank(option):
+    """Total order on options for symmetry pruning."""
+    return (_option_order(option), option or '')
+
+
+def _option_order(option):
+    """Tiebreak among options with equal bounds: markets, then multipliers, then the rest."""
+    if option == 'market':
+        return 3
+    if option is not None and is_multiplier(option):
+        return 2
+    if option in BUILDINGS:
+        return 1
+    return 0
@@ -79,6 +79,8 @@ let resultClears = {};      // "r,c" -> true
 let resultBurns = {};       // "r,c" -> true
 let nextCityId = 1;
 let territoryOwnership = {};  // "r,c" -> city_id
+let lastActions = null;       // actions of the last finished plan, to warm-start from
+let changedTiles = new Set(); // "r,c" keys edited since that plan
 
 // --- API data conversion ---
 
@@ -237,8 +239,15 @@ function renderGrid() {
 
 // --- Tile interaction ---
 
+// Forget the last plan, so the next optimise starts from scratch
+function resetWarmStart() {
+  lastActions = null;
+  changedTiles.clear();
+}
+
 function applyTool(r, c) {
   const key = `${r},${c}`;
+  changedTiles.add(key);
   let cityChanged = false;
   if (activeTool === 'city') {
     const existingIdx = state.cities.findIndex(ct => ct.row === r && ct.col === c);
@@ -296,6 +305,7 @@ function onTileRightClick(e) {
   const c = +e.currentTarget.dataset.c;
   const city = state.cities.find(ct => ct.row === r && ct.col === c);
   if (city) {
+    changedTiles.add(`${r},${c}`);
     city.expanded = !city.expanded;
     if (city.expanded) {
       state.events.push({ action: 'expand', city_id: city.id });
@@ -349,30 +359,13 @@ document.querySelectorAll('.building-toggle').forEach(cb => {
       }
     }
     updateBuildingToggles();
+    resetWarmStart();
   });
 });
 
 // --- Optimise ---
 
-document.getElementById('btn-optimise').addEventListener('click', async () => {
-  const pinnedArr = Object.entries(state.pinned).map(([key, building]) => {
-    const [r, c] = key.split(',').map(Number);
-    return { row: r, col: c, building };
-  });
-  const payload = {
-    tiles: buildTilesArray(),
-    cities: buildCitiesArray(),
-    pinned: pinnedArr,
-    techs: buildTechsArray(),
-  };
-
-  const resp = await fetch('/optimize', {
-    method: 'POST',
-    headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify(payload),
-  });
-  const result = await resp.json();
-
+function showResult(result, searching) {
   resultPlacements = {};
   for (const p of result.placements) {
     resultPlacements[`${p.row},${p.col}`] = p.building;
@@ -393,10 +386,83 @@ document.getElementById('btn-optimise').addEventListener('click', async () => {
   const summary = result.markets
     .map(m => `Market (${m.row},${m.col}): ${m.income}/turn`)
     .join(' | ');
+  const status = searching ? 'Searching… best so far: ' : '';
   document.getElementById('summary').textContent =
-    `Total: ${result.total_income}/turn (cost: ${result.total_cost}★)  |  ${summary}`;
+    `${status}Total: ${result.total_income}/turn (cost: ${result.total_cost}★)  |  ${summary}`;
 
   renderGrid();
+}
+
+// Read a Server-Sent Events response, calling onEvent(name, data) per event
+async function readEvents(resp, onEvent) {
+  const reader = resp.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) return;
+    buffer += value;
+    let end;
+    while ((end = buffer.indexOf('\n\n')) !== -1) {
+      const frame = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+      let name = 'message';
+      let data = '';
+      for (const line of frame.split('\n')) {
+        if (line.startsWith('event: ')) name = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      }
+      onEvent(name, JSON.parse(data));
+    }
+  }
+}
+
+document.getElementById('btn-optimise').addEventListener('click', async () => {
+  const pinnedArr = Object.entries(state.pinned).map(([key, building]) => {
+    const [r, c] = key.split(',').map(Number);
+    return { row: r, col: c, building };
+  });
+  const payload = {
+    tiles: buildTilesArray(),
+    cities: buildCitiesArray(),
+    pinned: pinnedArr,
+    techs: buildTechsArray(),
+  };
+  // Re-search only around the edits made since the last plan; with no
+  // tile edits (say, new techs) the whole map is searched after it
+  if (lastActions) {
+    payload.seed_actions = lastActions;
+    if (changedTiles.size) {
+      payload.changed = [...changedTiles].map(key => {
+        const [r, c] = key.split(',').map(Number);
+        return { row: r, col: c };
+      });
+    }
+  }
+
+  document.getElementById('summary').textContent = 'Searching…';
+  const resp = await fetch('/optimize/stream', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(payload),
+  });
+  if (!resp.ok) {
+    const result = await resp.json();
+    document.getElementById('summary').textContent = `Error: ${result.error}`;
+    return;
+  }
+
+  // Partial plans render as they arrive; the result event replaces them
+  await readEvents(resp, (name, data) => {
+    if (name === 'progress') {
+      showResult(data.plan, true);
+    } else if (name === 'result') {
+      showResult(data, false);
+      lastActions = data.actions;
+      changedTiles.clear();
+    } else if (name === 'error') {
+      document.getElementById('summary').textContent = `Error: ${data.error}`;
+    }
+  });
 });
 
 // --- Clear result ---
@@ -406,6 +472,7 @@ document.getElementById('btn-clear-result').addEventListener('click', () => {
   resultMarkets = [];
   resultClears = {};
   resultBurns = {};
+  resetWarmStart();
   document.getElementById('summary').textContent = 'No optimisation run yet.';
   renderGrid();
 });
@@ -440,6 +507,7 @@ document.getElementById('file-input').addEventListener('change', e => {
       resultMarkets = [];
       resultClears = {};
       resultBurns = {};
+      resetWarmStart();
       updateBuildingToggles();
       fetchTerritory().then(() => renderGrid());
     } catch {
@@ -454,6 +522,7 @@ document.getElementById('file-input').addEventListener('change', e => {
 document.getElementById('btn-resize').addEventListener('click', () => {
   state.rows = +document.getElementById('rows-input').value;
   state.cols = +document.getElementById('cols-input').value;
+  resetWarmStart();
   renderGrid();
 });
 
@@ -0,0 +1,112 @@
+from itertools import combinations
+
+from economics import ActionPath
+from optimizer import optimize
+from relevance import relevant_actions
+from rules import RULES, TECHS, HARVEST_ACTIONS
+
+# Techs that unlock a building, a terrain action or a harvest, in TECHS order
+ECONOMY_TECHS = tuple(
+    name for name, tech in TECHS.items()
+    if tech['unlocks_buildings'] or tech['unlocks_actions']
+    or name in {h['tech'] for h in HARVEST_ACTIONS.values()}
+)
+
+
+def prerequisites(tech):
+    """Techs that must be researched before tech, nearest first."""
+    chain = []
+    while (tech := TECHS[tech]['requires']) is not None:
+        chain.append(tech)
+    return chain
+
+
+def tech_sets(techs=ECONOMY_TECHS, held=frozenset()):
+    """
+    Researchable subsets of techs, smallest first.
+
+    A subset is researchable when every prerequisite of its techs that is
+    itself among techs is either in the subset or held; prerequisites
+    outside techs are taken as researched along the way.
+    """
+    techs = tuple(techs)
+    unknown = [t for t in techs if t not in TECHS]
+    if unknown:
+        raise ValueError(f"Unknown techs: {', '.join(unknown)}")
+    swept = set(techs)
+    sets = []
+    for size in range(len(techs) + 1):
+        for subset in combinations(techs, size):
+            chosen = set(subset) | set(held)
+            if all(p in chosen for t in subset for p in prerequisites(t) if p in swept):
+                sets.append(frozenset(subset))
+    return sets
+
+
+def with_prerequisites(techs):
+    """techs together with every prerequisite of them."""
+    return frozenset(techs).union(*(prerequisites(t) for t in techs))
+
+
+def sweep(state, score_fn, techs=ECONOMY_TECHS, held=frozenset(), prune=True, **options):
+    """
+    Optimize state once for every researchable subset of techs.
+
+    Each subset is searched with held and the prerequisites of its techs
+    added. Subsets are taken smallest first and share work two ways:
+
+    - Tech sets that unlock the same moves on this map (with prune, the
+      same relevance.relevant_actions that their techs can carry out)
+      share one search, run for the first of them.
+    - The best-scoring plan among a subset's immediate subsets seeds its
+      search (optimize's seed_actions). Every plan legal under fewer techs
+      stays legal under more, so a tech set never scores below any of its
+      subsets; a shared result is searched again from that seed if it
+      would.
+
+    options go to optimize; seed_actions is set here. max_depth counts
+    the actions taken after the seed plan. Returns 'results', the
+    optimize result of each tech set (techs without held or
+    prerequisites), the same object for tech sets sharing a search, and
+    'searches', the number of optimize runs.
+    """
+    held = frozenset(held)
+    results = {}
+    scores = {}
+    solved = {}
+    searches = 0
+    for subset in tech_sets(techs, held):
+        full = with_prerequisites(held | subset)
+        seeds = [subset - {t} for t in subset if subset - {t} in results]
+        seed = max(seeds, key=scores.get, default=None)
+        key = _unlock_key(state, full, prune)
+        result = solved.get(key)
+        if result is None or (seed is not None and scores[seed] > scores[result['techs']]):
+            result = optimize(state, full, score_fn, prune=prune,
+                              seed_actions=results[seed]['actions'] if seed is not None else None,
+                              **options)
+            result['techs'] = subset
+            scores[subset] = score_fn(result['state'], ActionPath().replay(result['actions'], state))
+            solved[key] = result
+            searches += 1
+        else:
+            scores[subset] = scores[result['techs']]
+        results[subset] = result
+    return {'results': results, 'searches': searches}
+
+
+def _unlock_key(state, techs, prune):
+    """What techs let a search do on state; equal keys give equal searches."""
+    mask = RULES.tech_mask(techs)
+    if prune:
+        # relevant_actions allows any harvest; the harvest tech decides it
+        return frozenset(
+            action for action in relevant_actions(state, techs)
+            if action[0] != 'harvest' or RULES.unlocked(
+                RULES.harvest_unlock[RULES.resource_ids[state.resource_at(action[1])]], mask
+            )
+        )
+    return tuple(
+        RULES.unlocked(unlock, mask)
+        for unlock in RULES.building_unlock + RULES.action_unlock + RULES.harvest_unlock
+    )
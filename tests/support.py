@@ -0,0 +1,70 @@
+"""Maps, tech sets and scorers shared by the test modules."""
+import random
+
+from economics import total_income, building_value
+from map_state import MapState
+from rules import BUILDINGS
+
+# Enough for every building, terrain action and harvest on sample_map
+SAMPLE_TECHS = frozenset({'mathematics', 'forestry', 'farming', 'construction', 'trade',
+                          'mining', 'smithery', 'spiritualism', 'hunting', 'organization'})
+
+# Every multiplier, its resource building and the market, for the planners
+PLANNER_TECHS = frozenset({'mathematics', 'forestry', 'construction', 'farming',
+                           'trade', 'mining', 'smithery', 'climbing'})
+
+
+def score(state, actions):
+    return (total_income(state), building_value(state))
+
+
+def score_with_cost(state, actions):
+    return (total_income(state), building_value(state), -actions.cost)
+
+
+def sample_map():
+    """A 9x9 map with every terrain kind, a village, a monument and two cities."""
+    terrain = {(r, c): 'land' for r in range(9) for c in range(9)}
+    terrain[(0, 8)] = 'mountain'
+    terrain[(8, 0)] = 'water'
+    del terrain[(4, 8)]
+    return MapState(
+        terrain=terrain,
+        resources={(0, 1): 'forest', (1, 0): 'forest', (2, 2): 'crop', (0, 8): 'metal',
+                   (6, 6): 'animal', (3, 0): 'forest', (1, 2): 'crop'},
+        buildings={(0, 1): 'lumber_hut'},
+        villages=frozenset({(6, 5)}),
+        monuments=frozenset({(2, 0)}),
+        cities=(
+            {'id': 1, 'row': 1, 'col': 1, 'population': 1, 'border_level': 1},
+            {'id': 2, 'row': 2, 'col': 4, 'population': 1, 'border_level': 2},
+        ),
+    )
+
+
+def random_map(seed, size=11, count=70):
+    """All-land map with count buildings of random kinds, no cities."""
+    rng = random.Random(seed)
+    positions = [(r, c) for r in range(size) for c in range(size)]
+    buildings = {pos: rng.choice(sorted(BUILDINGS)) for pos in rng.sample(positions, count)}
+    return MapState(terrain={pos: 'land' for pos in positions}, buildings=buildings)
+
+
+def patterned_map(centres=((1, 1), (6, 6))):
+    """8x8 land in diagonal stripes of forest, crop and bare tiles, a city at each centre."""
+    terrain = {(r, c): 'land' for r in range(8) for c in range(8)}
+    resources = {}
+    for r in range(8):
+        for c in range(8):
+            if (r + c) % 3 == 0:
+                resources[(r, c)] = 'forest'
+            elif (r + c) % 3 == 1:
+                resources[(r, c)] = 'crop'
+    return MapState(
+        terrain=terrain,
+        resources=resources,
+        cities=tuple(
+            {'id': i, 'row': r, 'col': c, 'population': 5, 'border_level': 1}
+            for i, (r, c) in enumerate(centres, 1)
+        ),
+    )
@@ -220,3 +220,23 @@ def test_validate_build_must_be_in_territory():
     )
     result = validate_action(m, ('build', (5, 5), 'sawmill'), techs=frozenset({'mathematics'}))
     assert result is not None
+
+
+def test_apply_actions_keep_territory_index_consistent():
+    m = MapState(
+        terrain={(r, c): 'land' for r in range(8) for c in range(8)},
+        villages=frozenset({(5, 5)}),
+        cities=({'id': 1, 'row': 2, 'col': 2, 'population': 1, 'border_level': 1},),
+    )
+    m.territory_ownership()
+    for action in [
+        ('build', (2, 2), 'sawmill'),
+        ('found_city', (5, 5)),
+        ('expand_borders', 2),
+        ('expand_borders', 1),
+    ]:
+        m = apply_action(m, action)
+        fresh = MapState(terrain=m.terrain, cities=m.cities)
+        assert m.territory_ownership() == fresh.territory_ownership()
+        for city in m.cities:
+            assert m.tiles_owned_by(city['id']) == fresh.tiles_owned_by(city['id'])
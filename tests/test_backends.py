@@ -0,0 +1,100 @@
+import pytest
+
+from actions import apply_action, validate_action
+from bitboard_state import BitboardState
+from economics import total_income, income_delta
+from grid_state import GridState
+from map_state import MapState
+from moves import legal_moves, MoveGenerator
+from optimizer import optimize
+from rules import BUILDINGS
+from tests.support import SAMPLE_TECHS as TECHS, sample_map, score
+
+# MapState stand-ins: every test checks one against MapState on the same map
+BACKENDS = pytest.mark.parametrize('backend', [GridState, BitboardState])
+
+
+@BACKENDS
+def test_round_trip(backend):
+    m = sample_map()
+    assert backend.from_map_state(m).to_map_state() == m
+
+
+@BACKENDS
+def test_queries_match_map_state(backend):
+    m = sample_map()
+    b = backend.from_map_state(m)
+    for r in range(-1, 12):
+        for c in range(-1, 12):
+            pos = (r, c)
+            assert b.terrain_at(pos) == m.terrain_at(pos)
+            assert b.resource_at(pos) == m.resource_at(pos)
+            assert b.building_at(pos) == m.building_at(pos)
+            assert b.owner_of(pos) == m.owner_of(pos)
+            assert b.is_occupied(pos) == m.is_occupied(pos)
+    assert b.defined_positions() == m.defined_positions()
+    assert b.occupied_positions() == m.occupied_positions()
+    assert b.territory_ownership() == m.territory_ownership()
+    assert b.tiles_owned_by(2) == m.tiles_owned_by(2)
+    assert b.city_has_building(1, 'lumber_hut')
+    assert not b.city_has_building(2, 'lumber_hut')
+    assert b.zobrist() == m.zobrist()
+
+
+@BACKENDS
+def test_actions_moves_and_income_match_map_state(backend):
+    m = sample_map()
+    b = backend.from_map_state(m)
+    for action in [
+        ('build', (1, 1), 'sawmill'),
+        ('build', (1, 0), 'lumber_hut'),
+        ('found_city', (6, 5)),
+        ('expand_borders', 1),
+        ('burn_forest', (3, 0)),
+        ('build', (0, 0), 'market'),
+        ('harvest', (6, 6)),
+        ('build', (2, 2), 'farm'),
+    ]:
+        for pos in m.defined_positions():
+            for building in BUILDINGS:
+                build = ('build', pos, building)
+                assert validate_action(b, build, TECHS) == validate_action(m, build, TECHS)
+        assert sorted(legal_moves(b, TECHS)) == sorted(legal_moves(m, TECHS))
+        assert income_delta(b, action) == income_delta(m, action)
+        m = apply_action(m, action)
+        b = apply_action(b, action)
+        assert b.to_map_state() == m
+        assert b.zobrist() == m.zobrist()
+        assert total_income(b) == total_income(m)
+
+
+@BACKENDS
+def test_move_generator_runs_on_backend(backend):
+    b = backend.from_map_state(sample_map())
+    gen = MoveGenerator(b, TECHS)
+    for action in [('build', (1, 1), 'sawmill'), ('found_city', (6, 5)), ('expand_borders', 3)]:
+        gen.apply(action)
+        assert sorted(gen.moves()) == sorted(legal_moves(gen.state, TECHS))
+
+
+@BACKENDS
+def test_move_generator_keeps_unchanged_territories_clean(backend):
+    b = backend.from_map_state(sample_map())
+    gen = MoveGenerator(b, TECHS)
+    after = apply_action(b, ('found_city', (6, 5)))
+    gen.apply(('found_city', (6, 5)), after)
+    dirty = gen._dirty_tiles(b, ('found_city', (6, 5)))
+    assert dirty == after.tiles_owned_by(after.cities[-1]['id'])
+
+
+@BACKENDS
+def test_optimize_on_backend_matches_map_state(backend):
+    m = MapState(
+        terrain={(r, c): 'land' for r in range(5) for c in range(5)},
+        resources={(0, 1): 'forest', (1, 0): 'forest', (0, 2): 'crop', (2, 1): 'crop'},
+        cities=({'id': 1, 'row': 2, 'col': 2, 'population': 5, 'border_level': 2},),
+    )
+    techs = frozenset({'forestry', 'mathematics', 'farming', 'construction', 'trade'})
+    expected = optimize(m, techs, score)
+    result = optimize(backend.from_map_state(m), techs, score)
+    assert result['income'] == expected['income']
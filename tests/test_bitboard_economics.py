@@ -0,0 +1,33 @@
+from bitboard_economics import multiplier_levels, market_raw, total_income, building_value
+from bitboard_state import BitboardState
+from economics import (
+    total_income as map_total_income, building_value as map_building_value,
+    multiplier_level, market_income,
+)
+from map_state import MapState
+from rules import MARKET_CAP, is_multiplier
+from tests.support import random_map
+
+
+def test_levels_and_incomes_match_per_tile_functions():
+    for seed in range(5):
+        m = random_map(seed)
+        b = BitboardState.from_map_state(m)
+        levels = multiplier_levels(b)
+        raw = market_raw(b, levels)
+        for pos, bldg in m.buildings.items():
+            if is_multiplier(bldg):
+                assert levels[b.index(pos)] == multiplier_level(pos, m)
+            if bldg == 'market':
+                assert min(raw[b.index(pos)], MARKET_CAP) == market_income(pos, m)
+        assert total_income(b) == map_total_income(m)
+        assert building_value(b) == map_building_value(m)
+
+
+def test_edge_tiles_do_not_wrap():
+    # A farm in the last column must not feed a windmill in the next row's first column
+    m = MapState(
+        terrain={(r, c): 'land' for r in range(11) for c in range(11)},
+        buildings={(0, 10): 'farm', (1, 0): 'windmill', (2, 0): 'market'},
+    )
+    assert total_income(BitboardState.from_map_state(m)) == 0
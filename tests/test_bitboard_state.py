@@ -0,0 +1,44 @@
+import random
+
+from bitboard_state import BitboardState, layout, neighbours, dilate, bits
+from map_state import MapState, adjacent_positions
+from moves import legal_moves
+from rules import BUILDINGS, MAP_SHAPES
+from tests.support import SAMPLE_TECHS as TECHS
+
+
+def test_neighbours_match_adjacent_positions_without_wrapping():
+    for size in sorted(MAP_SHAPES):
+        stride, full, neighbourhoods = layout(size)
+        for pos in [(0, 0), (0, size - 1), (size - 1, 0), (size // 2, size - 1), (3, 0)]:
+            i = pos[0] * stride + pos[1]
+            expected = {
+                (r, c) for r, c in adjacent_positions(pos) if 0 <= r < size and 0 <= c < size
+            }
+            assert {divmod(j, stride) for j in bits(neighbourhoods[i])} == expected
+        assert dilate(full, size) == full
+        assert neighbours(0, size) == 0
+
+
+def test_legal_moves_match_on_random_maps():
+    for seed in range(10):
+        rng = random.Random(seed)
+        terrain, resources, buildings = {}, {}, {}
+        for r in range(11):
+            for c in range(11):
+                terrain[(r, c)] = rng.choice(('land', 'land', 'land', 'mountain', 'water'))
+                if terrain[(r, c)] == 'land' and rng.random() < 0.4:
+                    resources[(r, c)] = rng.choice(('forest', 'crop', 'animal', 'fruit'))
+                elif terrain[(r, c)] == 'mountain' and rng.random() < 0.5:
+                    resources[(r, c)] = 'metal'
+                if rng.random() < 0.15:
+                    buildings[(r, c)] = rng.choice(sorted(BUILDINGS))
+        cities = tuple(
+            {'id': i + 1, 'row': rng.randrange(11), 'col': rng.randrange(11),
+             'population': 1, 'border_level': rng.randint(1, 2)}
+            for i in range(3)
+        )
+        m = MapState(terrain=terrain, resources=resources, buildings=buildings, cities=cities)
+        b = BitboardState.from_map_state(m)
+        for techs in (frozenset(), TECHS):
+            assert sorted(legal_moves(b, techs)) == sorted(legal_moves(m, techs))
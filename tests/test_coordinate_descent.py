@@ -0,0 +1,83 @@
+import time
+
+from actions import validate_action, apply_action
+from coordinate_descent import Problem, descend, solve, _best_reply
+from economics import total_income
+from map_state import MapState
+from optimizer import optimize
+from solver_exact import solve as solve_exact
+from tests.support import PLANNER_TECHS as TECHS, patterned_map, score
+
+# City centres on patterned_map; the middle city's square touches both others
+CENTRES = ((1, 1), (3, 4), (6, 6))
+
+
+def test_enumeration_respects_one_per_city():
+    problem = Problem(patterned_map(CENTRES), TECHS)
+    for _, combos, _, _ in problem.cities:
+        assert combos[0] == ()
+        for combo in combos:
+            buildings = [b for _, b in combo]
+            assert len(buildings) == len(set(buildings))
+            assert len({pos for pos, _ in combo}) == len(combo)
+
+
+def test_descend_is_deterministic_and_reuses_replies():
+    problem = Problem(patterned_map(CENTRES), TECHS)
+    responses = {}
+    first = descend(problem, 7, responses)
+    cached = len(responses)
+    assert cached > 0
+    assert descend(problem, 7, responses) == first
+    assert len(responses) == cached
+
+
+def test_descend_stops_inside_a_best_reply_at_the_deadline():
+    """A city with thousands of combos is cut short, not searched to the end."""
+    terrain = {(r, c): 'land' for r in range(5) for c in range(5)}
+    m = MapState(
+        terrain=terrain,
+        resources={pos: ('forest', 'crop')[sum(pos) % 3] for pos in terrain if sum(pos) % 3 < 2},
+        cities=({'id': 1, 'row': 2, 'col': 2, 'population': 5, 'border_level': 2},),
+    )
+    problem = Problem(m, TECHS)
+    _, combos, zone, _ = problem.cities[0]
+    assert len(combos) > 1000
+    start = time.monotonic()
+    _best_reply(problem.layout([0]), combos, zone)
+    full = time.monotonic() - start
+
+    start = time.monotonic()
+    income, choices, converged = descend(problem, 0, {}, start + full / 10)
+    assert time.monotonic() - start < full / 2
+    assert not converged
+    assert income == total_income(MapState(terrain=terrain, buildings=problem.layout(choices)))
+
+
+def test_plan_is_legal_and_between_greedy_and_exact():
+    m = patterned_map(CENTRES)
+    result = optimize(m, TECHS, score, strategy='coordinate')
+    state = m
+    for action in result['actions']:
+        assert validate_action(state, action, TECHS) is None
+        state = apply_action(state, action)
+    assert result['income'] == total_income(state)
+    greedy = optimize(m, TECHS, score)
+    assert greedy['income'] <= result['income'] <= solve_exact(m, TECHS)['income']
+
+
+def test_finds_optimum_around_one_city():
+    m = MapState(
+        terrain={(r, c): 'land' for r in range(5) for c in range(5)},
+        resources={(0, 1): 'forest', (1, 0): 'forest', (0, 2): 'crop', (2, 1): 'crop'},
+        cities=({'id': 1, 'row': 2, 'col': 2, 'population': 5, 'border_level': 2},),
+    )
+    result = optimize(m, TECHS, score, strategy='coordinate')
+    assert result['income'] == solve_exact(m, TECHS)['income']
+
+
+def test_parallel_restarts_match_serial():
+    m = patterned_map(CENTRES)
+    serial = solve(m, TECHS, score, restarts=4, patience=4, seed=3)
+    parallel = solve(m, TECHS, score, restarts=4, patience=4, seed=3, workers=2)
+    assert parallel['actions'] == serial['actions']
@@ -0,0 +1,55 @@
+from decompose import components, merge
+from economics import total_income
+from map_state import MapState
+from optimizer import optimize
+from tests.support import score
+
+TECHS = frozenset({'mathematics', 'forestry', 'farming', 'construction', 'trade'})
+
+
+def _clusters(gap):
+    """Two copies of a small sawmill cluster, gap columns apart."""
+    terrain, resources, cities = {}, {}, []
+    for i, offset in enumerate((0, gap)):
+        for r in range(5):
+            for c in range(5):
+                terrain[(r, c + offset)] = 'land'
+        resources[(1, 1 + offset)] = 'forest'
+        resources[(1, 3 + offset)] = 'forest'
+        cities.append({'id': i + 1, 'row': 2, 'col': 2 + offset,
+                       'population': 1, 'border_level': 1})
+    return MapState(terrain=terrain, resources=resources, cities=tuple(cities))
+
+
+def test_far_clusters_split():
+    parts = components(_clusters(10))
+    assert [[c['id'] for c in p.cities] for p in parts] == [[1], [2]]
+    assert set(parts[0].terrain).isdisjoint(parts[1].terrain)
+
+
+def test_close_clusters_stay_together():
+    m = _clusters(6)
+    assert components(m) == [m]
+
+
+def test_decomposed_plan_is_sum_of_parts():
+    m = _clusters(10)
+    parts = components(m)
+    result = optimize(m, TECHS, score, decompose=True)
+    assert result['income'] == sum(optimize(p, TECHS, score)['income'] for p in parts)
+    assert result['income'] == total_income(result['state']) > 0
+    assert result['complete']
+
+
+def test_merge_renumbers_founded_cities():
+    m = MapState(
+        terrain={(r, c): 'land' for r in range(3) for c in range(20)},
+        cities=({'id': 1, 'row': 1, 'col': 1, 'population': 1, 'border_level': 1},
+                {'id': 2, 'row': 1, 'col': 18, 'population': 1, 'border_level': 1}),
+        villages=frozenset({(1, 8)}),
+    )
+    part = next(p for p in components(m) if p.villages)
+    # The part has no cities, so the new one is id 1 there, which is taken on the full map
+    state, actions = merge(m, TECHS, [(part, [('found_city', (1, 8)), ('expand_borders', 1)])])
+    assert actions == [('found_city', (1, 8)), ('expand_borders', 3)]
+    assert {c['id']: c['border_level'] for c in state.cities} == {1: 1, 2: 1, 3: 2}
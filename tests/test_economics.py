@@ -1,5 +1,13 @@
-from economics import market_income, total_income, multiplier_level, action_cost, sequence_cost, action_population, sequence_population
+import random
+
+from economics import (
+    market_income, total_income, multiplier_level, action_cost, sequence_cost,
+    action_population, sequence_population, income_delta, building_value, ActionPath,
+    apply_with_income,
+)
+from actions import apply_action
 from map_state import MapState
+from rules import BUILDINGS, is_multiplier
 
 
 def test_multiplier_level_sawmill():
@@ -93,6 +101,23 @@ def test_sequence_cost():
     assert sequence_cost(actions, m) == -1 + 5
 
 
+def test_action_path_carries_running_totals():
+    m = MapState(
+        terrain={(0, 0): 'land', (0, 1): 'land'},
+        resources={(0, 0): 'forest', (0, 1): 'forest'},
+    )
+    first = ActionPath().then(('build', (0, 1), 'lumber_hut'), m)
+    path = first.replay([('clear_forest', (0, 0)), ('build', (0, 0), 'sawmill')],
+                        m.with_building((0, 1), 'lumber_hut'))
+    assert path == (('build', (0, 1), 'lumber_hut'), ('clear_forest', (0, 0)),
+                    ('build', (0, 0), 'sawmill'))
+    assert path.cost == sequence_cost(list(path), m) == 3 - 1 + 5
+    assert path.population == sequence_population(list(path), m) == 1 + 1
+    assert first.cost == 3
+    joined = first + ActionPath().then(('clear_forest', (0, 0)), m)
+    assert (joined.cost, joined.population) == (2, 1)
+
+
 def test_build_lumber_hut_population():
     m = MapState(terrain={(0, 0): 'land'}, resources={(0, 0): 'forest'})
     assert action_population(('build', (0, 0), 'lumber_hut'), m) == 1
@@ -121,3 +146,46 @@ def test_build_sawmill_population_depends_on_adjacency():
 def test_harvest_population():
     m = MapState(terrain={(0, 0): 'land'}, resources={(0, 0): 'animal'})
     assert action_population(('harvest', (0, 0)), m) == 1
+
+
+def test_income_delta_market_next_to_sawmill():
+    m = MapState(
+        terrain={(0, 0): 'land', (0, 1): 'land', (1, 0): 'land'},
+        buildings={(0, 0): 'sawmill', (0, 1): 'lumber_hut'},
+    )
+    assert income_delta(m, ('build', (1, 0), 'market')) == 1
+
+
+def test_income_delta_respects_cap():
+    terrain = {(r, c): 'land' for r in range(5) for c in range(5)}
+    buildings = {(2, 2): 'market', (1, 1): 'sawmill'}
+    for pos in [(0, 0), (0, 1), (0, 2), (1, 0), (1, 2), (2, 0), (2, 1)]:
+        buildings[pos] = 'lumber_hut'
+    m = MapState(terrain=terrain, buildings=buildings)
+    assert total_income(m) == 7
+    assert income_delta(m, ('build', (3, 2), 'windmill')) == 0
+    m2 = apply_action(m, ('build', (2, 3), 'forge'))
+    assert income_delta(m2, ('build', (3, 3), 'mine')) == 1
+
+
+def test_income_delta_non_build_is_zero():
+    m = MapState(terrain={(0, 0): 'land'}, resources={(0, 0): 'forest'})
+    assert income_delta(m, ('clear_forest', (0, 0))) == 0
+
+
+def test_income_delta_matches_total_income_on_random_builds():
+    rng = random.Random(7)
+    positions = [(r, c) for r in range(6) for c in range(6)]
+    m = MapState(terrain={pos: 'land' for pos in positions})
+    tracked = m
+    for pos in rng.sample(positions, 30):
+        action = ('build', pos, rng.choice(sorted(BUILDINGS)))
+        expected = total_income(apply_action(m, action)) - total_income(m)
+        assert income_delta(m, action) == expected
+        m = apply_action(m, action)
+        tracked = apply_with_income(tracked, action)
+        assert total_income(tracked) == total_income(m)
+        assert building_value(tracked) == sum(
+            multiplier_level(p, m) if is_multiplier(b) else 1
+            for p, b in m.buildings.items()
+        )
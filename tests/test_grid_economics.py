@@ -0,0 +1,44 @@
+import numpy as np
+
+from economics import (
+    total_income, building_value, multiplier_level, market_income, apply_all_with_income,
+)
+from grid_economics import multiplier_levels, market_incomes, total_incomes, score_candidates
+from grid_state import GridState
+from rules import BUILDINGS, is_multiplier
+from tests.support import random_map
+
+
+def test_levels_and_incomes_match_per_tile_functions():
+    for seed in range(5):
+        m = random_map(seed)
+        g = GridState.from_map_state(m)
+        levels = multiplier_levels(g.building_codes)
+        incomes = market_incomes(g.building_codes)
+        for pos, bldg in m.buildings.items():
+            if is_multiplier(bldg):
+                assert levels[pos] == multiplier_level(pos, m)
+            if bldg == 'market':
+                assert incomes[pos] == market_income(pos, m)
+        assert total_incomes(g.building_codes) == total_income(m)
+
+
+def test_total_incomes_over_a_stack():
+    maps = [GridState.from_map_state(random_map(seed), size=11) for seed in range(4)]
+    stack = np.stack([g.building_codes for g in maps])
+    expected = [total_income(g.to_map_state()) for g in maps]
+    assert total_incomes(stack).tolist() == expected
+
+
+def test_score_candidates_matches_applied_states():
+    m = random_map(9, count=40)
+    g = GridState.from_map_state(m)
+    free = sorted(m.defined_positions() - set(m.buildings))
+    actions = [('build', pos, b) for pos in free[:10] for b in BUILDINGS]
+    actions.append(('clear_forest', free[0]))
+    incomes, values = score_candidates(g, actions)
+    for action, child, income, value in zip(
+        actions, apply_all_with_income(m, actions), incomes, values,
+    ):
+        assert income == total_income(child)
+        assert value == building_value(child)
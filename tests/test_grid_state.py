@@ -0,0 +1,15 @@
+import pytest
+
+from grid_state import shape_for
+from map_state import MapState
+from tests.support import sample_map
+
+
+def test_shape_for_picks_smallest_map_shape():
+    assert shape_for(sample_map()) == 11
+    assert shape_for(MapState(terrain={(20, 3): 'land'})) == 22
+
+
+def test_shape_for_rejects_oversized_map():
+    with pytest.raises(ValueError):
+        shape_for(MapState(terrain={(30, 0): 'land'}))
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+from jobs import JobQueue, QueueFull
+
+
+def _double(payload, progress):
+    progress({'step': 1})
+    return payload * 2
+
+
+def _slow(payload, progress):
+    for step in range(200):
+        progress({'step': step})
+        time.sleep(0.01)
+    return payload
+
+
+def _fail(payload, progress):
+    raise ValueError("bad payload")
+
+
+def _wait(queue, job_id, timeout=10):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        info = queue.status(job_id)
+        if info['status'] not in ('queued', 'running'):
+            return info
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+@pytest.fixture
+def queue_for():
+    queues = []
+
+    def make(fn, **kwargs):
+        queue = JobQueue(fn, max_workers=1, **kwargs)
+        queues.append(queue)
+        return queue
+    yield make
+    for queue in queues:
+        queue.shutdown()
+
+
+def test_job_runs_to_result(queue_for):
+    queue = queue_for(_double)
+    job_id = queue.submit(21)
+    info = _wait(queue, job_id)
+    assert info == {'id': job_id, 'status': 'done', 'result': 42}
+
+
+def test_failed_job_reports_error(queue_for):
+    queue = queue_for(_fail)
+    info = _wait(queue, queue.submit(None))
+    assert info['status'] == 'failed'
+    assert 'bad payload' in info['error']
+
+
+def test_running_job_reports_progress_and_cancels(queue_for):
+    queue = queue_for(_slow)
+    job_id = queue.submit('x')
+    end = time.monotonic() + 10
+    while 'progress' not in queue.status(job_id) and time.monotonic() < end:
+        time.sleep(0.02)
+    assert queue.status(job_id)['status'] == 'running'
+    assert queue.cancel(job_id)
+    assert _wait(queue, job_id)['status'] == 'cancelled'
+    assert not queue.cancel(job_id)
+
+
+def test_queue_depth_limit(queue_for):
+    queue = queue_for(_slow, max_queued=1)
+    job_id = queue.submit('x')
+    with pytest.raises(QueueFull):
+        queue.submit('y')
+    queue.cancel(job_id)
+
+
+def test_unknown_job(queue_for):
+    queue = queue_for(_double)
+    assert queue.status('missing') is None
+    assert not queue.cancel('missing')
@@ -1,3 +1,6 @@
+from dataclasses import replace
+
+from economics import total_income
 from map_state import MapState, is_adjacent, adjacent_positions
 
 
@@ -137,6 +140,60 @@ def test_tiles_owned_by():
     assert len(tiles) == 9
 
 
+def test_owner_of():
+    m = MapState(
+        terrain={(r, c): 'land' for r in range(5) for c in range(5)},
+        cities=({'id': 1, 'row': 2, 'col': 2, 'population': 1, 'border_level': 1},),
+    )
+    assert m.owner_of((1, 1)) == 1
+    assert m.owner_of((0, 0)) is None
+
+
+def test_is_occupied():
+    m = MapState(
+        terrain={(0, 0): 'land', (1, 1): 'land', (2, 2): 'land'},
+        buildings={(0, 0): 'sawmill'},
+        monuments=frozenset({(1, 1)}),
+    )
+    assert m.is_occupied((0, 0))
+    assert m.is_occupied((1, 1))
+    assert not m.is_occupied((2, 2))
+
+
+def test_with_city_updates_cached_territory():
+    m = MapState(
+        terrain={(r, c): 'land' for r in range(6) for c in range(6)},
+        cities=({'id': 1, 'row': 1, 'col': 1, 'population': 1, 'border_level': 1},),
+    )
+    m.territory_ownership()
+    city = {'id': 2, 'row': 3, 'col': 3, 'population': 1, 'border_level': 1}
+    m2 = m.with_city(city, frozenset())
+    fresh = MapState(terrain=m2.terrain, cities=m2.cities)
+    assert m2.territory_ownership() == fresh.territory_ownership()
+    assert m2.tiles_owned_by(2) == fresh.tiles_owned_by(2)
+    assert m2.owner_of((2, 2)) == 1
+    # Rows outside the new city's square are shared with the parent's index
+    assert m2.territory_ownership()._rows[0] is m.territory_ownership()._rows[0]
+
+
+def test_with_border_level_takes_tiles_from_later_city():
+    """Expanding an earlier city claims contested tiles from later ones."""
+    m = MapState(
+        terrain={(r, c): 'land' for r in range(7) for c in range(7)},
+        cities=(
+            {'id': 1, 'row': 1, 'col': 1, 'population': 1, 'border_level': 1},
+            {'id': 2, 'row': 4, 'col': 4, 'population': 1, 'border_level': 1},
+        ),
+    )
+    assert m.owner_of((3, 3)) == 2
+    m2 = m.with_border_level(1, 2)
+    fresh = MapState(terrain=m2.terrain, cities=m2.cities)
+    assert m2.owner_of((3, 3)) == 1
+    assert m2.territory_ownership() == fresh.territory_ownership()
+    assert m2.tiles_owned_by(2) == fresh.tiles_owned_by(2)
+    assert m.owner_of((3, 3)) == 2
+
+
 def test_adjacent_orthogonal():
     assert is_adjacent((0, 0), (0, 1))
     assert is_adjacent((0, 0), (1, 0))
@@ -161,3 +218,21 @@ def test_adjacent_positions():
     assert (0, 0) in adj
     assert (1, 2) in adj
     assert (1, 1) not in adj
+
+
+def test_replace_starts_with_empty_caches():
+    m = MapState(
+        terrain={(r, c): 'land' for r in range(3) for c in range(3)},
+        resources={(0, 0): 'forest'},
+        buildings={(0, 0): 'lumber_hut', (0, 1): 'sawmill', (0, 2): 'market'},
+        cities=({'id': 1, 'row': 1, 'col': 1, 'population': 1, 'border_level': 1},),
+    )
+    assert m.owner_of((0, 0)) == 1
+    assert total_income(m) == 1
+    h = hash(m)
+    moved = replace(m, cities=({'id': 2, 'row': 2, 'col': 2, 'population': 1, 'border_level': 0},),
+                    buildings={})
+    assert moved != m
+    assert moved.owner_of((0, 0)) is None
+    assert total_income(moved) == 0
+    assert hash(moved) != h
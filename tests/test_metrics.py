@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+
+from metrics import Registry
+
+
+def test_counter_and_gauge_render():
+    registry = Registry()
+    requests = registry.counter('requests_total', 'Requests.', ('endpoint',))
+    in_flight = registry.gauge('in_flight', 'Now.')
+    requests.inc(endpoint='/a')
+    requests.inc(2, endpoint='/a "b"')
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+    assert registry.render().splitlines() == [
+        '# HELP requests_total Requests.',
+        '# TYPE requests_total counter',
+        'requests_total{endpoint="/a"} 1',
+        'requests_total{endpoint="/a \\"b\\""} 2',
+        '# HELP in_flight Now.',
+        '# TYPE in_flight gauge',
+        'in_flight 1',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 3):
+        latency.observe(value)
+    assert registry.render().splitlines()[2:] == [
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        'latency_seconds_sum 4.05',
+        'latency_seconds_count 4',
+    ]
+    assert latency.count() == 4
+
+
+def test_labels_must_match():
+    counter = Registry().counter('c', 'C.', ('endpoint',))
+    with pytest.raises(ValueError):
+        counter.inc(status=200)
+    with pytest.raises(ValueError):
+        counter.inc(-1, endpoint='/a')
+
+
+def test_duplicate_names_rejected():
+    registry = Registry()
+    registry.counter('c', 'C.')
+    with pytest.raises(ValueError):
+        registry.gauge('c', 'C again.')
+
+
+def test_counters_are_thread_safe():
+    registry = Registry()
+    counter = registry.counter('c', 'C.', ('worker',))
+    latency = registry.histogram('h', 'H.')
+
+    def work():
+        for _ in range(5000):
+            counter.inc(worker='all')
+            latency.observe(0.01)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert counter.value(worker='all') == 40000
+    assert latency.count() == 40000
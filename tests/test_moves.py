@@ -1,4 +1,4 @@
-from moves import legal_moves
+from moves import legal_moves, MoveGenerator
 from map_state import MapState
 
 
@@ -77,3 +77,37 @@ def test_one_per_city_constraint():
     moves = legal_moves(m, techs=frozenset({'mathematics'}))
     sawmill_moves = [a for a in moves if a[0] == 'build' and a[2] == 'sawmill']
     assert len(sawmill_moves) == 0
+
+
+def test_move_generator_matches_legal_moves():
+    terrain = {(r, c): 'land' for r in range(8) for c in range(8)}
+    terrain[(0, 7)] = 'mountain'
+    resources = {(0, 1): 'forest', (1, 0): 'forest', (2, 2): 'crop', (0, 7): 'metal',
+                 (6, 6): 'animal', (3, 0): 'forest'}
+    m = MapState(
+        terrain=terrain,
+        resources=resources,
+        villages=frozenset({(5, 5)}),
+        cities=(
+            {'id': 1, 'row': 1, 'col': 1, 'population': 1, 'border_level': 1},
+            {'id': 2, 'row': 2, 'col': 4, 'population': 1, 'border_level': 1},
+        ),
+    )
+    techs = frozenset({'mathematics', 'forestry', 'farming', 'construction', 'trade',
+                       'mining', 'smithery', 'spiritualism', 'hunting'})
+    gen = MoveGenerator(m, techs)
+    for action in [
+        ('build', (0, 0), 'sawmill'),
+        ('build', (0, 1), 'lumber_hut'),
+        ('clear_forest', (1, 0)),
+        ('found_city', (5, 5)),
+        ('expand_borders', 1),
+        ('harvest', (6, 6)),
+        ('build', (2, 2), 'farm'),
+        ('expand_borders', 3),
+        ('build', (4, 5), 'windmill'),
+        ('burn_forest', (3, 0)),
+    ]:
+        assert action in gen.moves()
+        gen.apply(action)
+        assert gen.moves() == legal_moves(gen.state, techs)
@@ -1,6 +1,9 @@
-from optimizer import optimize
+import pytest
+
+from actions import apply_action
+from optimizer import optimize, warm_start, repair_region, SearchStats
 from map_state import MapState
-from economics import total_income, multiplier_level, sequence_cost
+from economics import total_income, multiplier_level, sequence_cost, sequence_population
 from rules import is_multiplier
 
 
@@ -85,3 +88,162 @@ def test_optimize_income_then_cost():
 
     result = optimize(m, techs, score)
     assert result['income'] >= 0
+
+
+def _chain_score(state, actions):
+    building_value = sum(
+        multiplier_level(pos, state) if is_multiplier(bldg) else 1
+        for pos, bldg in state.buildings.items()
+    )
+    return (total_income(state), building_value)
+
+
+def _two_city_map():
+    terrain = {(r, c): 'land' for r in range(8) for c in range(8)}
+    resources = {}
+    for r in range(8):
+        for c in range(8):
+            if (r + c) % 3 == 0:
+                resources[(r, c)] = 'forest'
+            elif (r + c) % 3 == 1:
+                resources[(r, c)] = 'crop'
+    return MapState(
+        terrain=terrain,
+        resources=resources,
+        cities=(
+            {'id': 1, 'row': 1, 'col': 1, 'population': 5, 'border_level': 2},
+            {'id': 2, 'row': 6, 'col': 6, 'population': 5, 'border_level': 2},
+        ),
+    )
+
+
+CHAIN_TECHS = frozenset({'mathematics', 'forestry', 'construction', 'farming', 'trade'})
+
+
+@pytest.mark.parametrize('beam_width', [1, 2, 4])
+def test_beam_search_at_least_matches_greedy(beam_width):
+    m = _two_city_map()
+    greedy = optimize(m, CHAIN_TECHS, _chain_score, max_depth=8)
+    beam = optimize(m, CHAIN_TECHS, _chain_score, max_depth=8, strategy='beam',
+                    beam_width=beam_width)
+    assert beam['income'] >= greedy['income']
+    assert _chain_score(beam['state'], []) >= _chain_score(greedy['state'], [])
+    if beam_width == 1:
+        assert beam['actions'] == greedy['actions']
+
+
+def test_beam_search_actions_reproduce_state():
+    m = _two_city_map()
+    result = optimize(m, CHAIN_TECHS, _chain_score, max_depth=6, strategy='beam', beam_width=3)
+    state = m
+    for action in result['actions']:
+        state = apply_action(state, action)
+    assert state == result['state']
+
+
+def test_parallel_beam_search_matches_serial():
+    m = _two_city_map()
+    serial = optimize(m, CHAIN_TECHS, _chain_score, max_depth=5, strategy='beam', beam_width=3)
+    parallel = optimize(m, CHAIN_TECHS, _chain_score, max_depth=5, strategy='beam',
+                        beam_width=3, workers=2)
+    assert parallel['actions'] == serial['actions']
+
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError):
+        optimize(MapState(), frozenset(), _chain_score, strategy='sideways')
+
+
+@pytest.mark.parametrize('strategy', ['greedy', 'beam', 'coordinate'])
+def test_expired_deadline_returns_valid_partial_plan(strategy):
+    m = _two_city_map()
+    result = optimize(m, CHAIN_TECHS, _chain_score, strategy=strategy, deadline=0)
+    assert result['complete'] is False
+    state = m
+    for action in result['actions']:
+        state = apply_action(state, action)
+    assert result['income'] == total_income(state)
+
+
+@pytest.mark.parametrize('strategy', ['greedy', 'beam', 'coordinate'])
+def test_running_totals_match_sequence_replay(strategy):
+    m = _two_city_map()
+    seen = []
+
+    def score(state, actions):
+        seen.append((actions.cost, actions.population, list(actions)))
+        return _chain_score(state, actions)
+
+    result = optimize(m, CHAIN_TECHS, score, max_depth=6, strategy=strategy, beam_width=3)
+    assert result['cost'] == sequence_cost(result['actions'], m)
+    assert result['population'] == sequence_population(result['actions'], m)
+    for cost, population, actions in seen[-5:]:
+        assert cost == sequence_cost(actions, m)
+        assert population == sequence_population(actions, m)
+
+
+@pytest.mark.parametrize('strategy', ['greedy', 'beam', 'coordinate'])
+def test_search_without_deadline_is_complete(strategy):
+    result = optimize(_two_city_map(), CHAIN_TECHS, _chain_score, strategy=strategy)
+    assert result['complete'] is True
+
+
+def test_warm_start_keeps_valid_actions_outside_region():
+    m = _two_city_map()
+    seed = [
+        ('build', (0, 0), 'lumber_hut'),
+        ('build', (0, 0), 'farm'),        # tile already taken by the first action
+        ('build', (6, 5), 'sawmill'),
+        ('build', (7, 7), 'market'),      # inside the region
+    ]
+    state, kept = warm_start(m, CHAIN_TECHS, seed, region={(7, 7)})
+    assert kept == [('build', (0, 0), 'lumber_hut'), ('build', (6, 5), 'sawmill')]
+    assert state.building_at((6, 5)) == 'sawmill'
+    assert state.building_at((7, 7)) is None
+
+
+def test_repair_region_covers_territory_of_edited_city():
+    m = _two_city_map()
+    region = repair_region(m, [(6, 6)])
+    assert m.tiles_owned_by(2) <= region
+    assert (1, 1) not in region
+    assert (3, 3) in region
+
+
+@pytest.mark.parametrize('strategy', ['greedy', 'beam'])
+def test_warm_start_only_searches_region(strategy):
+    m = _two_city_map()
+    full = optimize(m, CHAIN_TECHS, _chain_score, strategy=strategy)
+    region = repair_region(m, [(6, 6)])
+    repaired = optimize(m, CHAIN_TECHS, _chain_score, strategy=strategy,
+                        seed_actions=full['actions'], region=region)
+    kept = [a for a in full['actions'] if a[1] not in region]
+    assert repaired['actions'][:len(kept)] == kept
+    assert all(a[1] in region for a in repaired['actions'][len(kept):])
+    assert repaired['income'] >= full['income']
+
+
+@pytest.mark.parametrize('options', [
+    {'strategy': 'greedy'},
+    {'strategy': 'beam', 'beam_width': 3},
+    {'strategy': 'beam', 'beam_width': 3, 'workers': 2},
+    {'strategy': 'greedy', 'decompose': True},
+])
+def test_stats_count_search_phases(options):
+    stats = SearchStats()
+    result = optimize(_two_city_map(), CHAIN_TECHS, _chain_score, max_depth=5, stats=stats,
+                      **options)
+    plain = optimize(_two_city_map(), CHAIN_TECHS, _chain_score, max_depth=5, **options)
+    assert result['actions'] == plain['actions']
+    report = stats.as_dict()
+    phases = report['phases']
+    assert phases['optimize']['calls'] >= 1
+    assert phases['moves']['calls'] >= 1
+    assert phases['apply']['calls'] == report['candidates'] > 0
+    # Counted without stats too, for the server's metrics
+    assert plain['nodes'] == result['nodes'] == report['candidates']
+    assert plain['moves'] == result['moves'] == report['candidates']
+    assert plain['seconds'] > 0
+    assert phases['score']['calls'] >= report['candidates']
+    assert report['steps'] == len(report['candidates_per_step']) >= len(result['actions'])
+    assert report['peak_states'] > 1
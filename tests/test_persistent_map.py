@@ -0,0 +1,61 @@
+import pickle
+
+from map_state import MapState
+from persistent_map import PersistentMap
+
+
+def test_from_mapping_and_lookup():
+    m = PersistentMap.from_mapping({(0, 0): 'farm', (2, 1): 'mine'})
+    assert m[(0, 0)] == 'farm'
+    assert m.get((2, 1)) == 'mine'
+    assert m.get((1, 1)) is None
+    assert (2, 1) in m
+    assert (5, 5) not in m
+    assert len(m) == 2
+    assert m == {(0, 0): 'farm', (2, 1): 'mine'}
+
+
+def test_set_leaves_original_unchanged():
+    m = PersistentMap.from_mapping({(0, 0): 'farm'})
+    m2 = m.set((0, 1), 'mine')
+    m3 = m2.set((0, 1), 'market')
+    assert dict(m) == {(0, 0): 'farm'}
+    assert dict(m2) == {(0, 0): 'farm', (0, 1): 'mine'}
+    assert dict(m3) == {(0, 0): 'farm', (0, 1): 'market'}
+    assert len(m3) == 2
+
+
+def test_set_shares_untouched_rows():
+    m = PersistentMap.from_mapping({(0, 0): 'farm', (3, 3): 'mine'})
+    m2 = m.set((0, 1), 'market')
+    assert m2._rows[3] is m._rows[3]
+
+
+def test_set_many_copies_each_touched_row_once():
+    m = PersistentMap.from_mapping({(0, 0): 'farm', (3, 3): 'mine'})
+    m2 = m.set_many([((0, 1), 'market'), ((0, 0), 'mine'), ((1, 1), 'farm')])
+    assert dict(m2) == {(0, 0): 'mine', (0, 1): 'market', (1, 1): 'farm', (3, 3): 'mine'}
+    assert len(m2) == 4
+    assert dict(m) == {(0, 0): 'farm', (3, 3): 'mine'}
+    assert m2._rows[3] is m._rows[3]
+
+
+def test_delete():
+    m = PersistentMap.from_mapping({(0, 0): 'farm', (0, 1): 'mine'})
+    m2 = m.delete((0, 0))
+    assert dict(m2) == {(0, 1): 'mine'}
+    assert dict(m2.delete((0, 1))) == {}
+    assert m.delete((4, 4)) is m
+    assert len(m) == 2
+
+
+def test_pickle_round_trip():
+    m = PersistentMap.from_mapping({(0, 0): 'farm'})
+    assert pickle.loads(pickle.dumps(m)) == m
+
+
+def test_map_state_layers_are_persistent():
+    m = MapState(terrain={(0, 0): 'land'}, buildings={(0, 0): 'farm'})
+    assert isinstance(m.buildings, PersistentMap)
+    assert isinstance(m.resources, PersistentMap)
+    assert m == MapState(terrain={(0, 0): 'land'}, buildings={(0, 0): 'farm'})
@@ -0,0 +1,55 @@
+from map_state import MapState
+from moves import legal_moves, MoveGenerator
+from relevance import relevant_actions
+
+TECHS = frozenset({'hunting', 'forestry', 'mathematics', 'riding', 'roads', 'trade',
+                   'organization', 'farming'})
+
+
+def _strip():
+    """A 1x7 strip owned by one city: forest at both ends, plain land between."""
+    return MapState(
+        terrain={(0, c): 'land' for c in range(7)},
+        resources={(0, 0): 'forest', (0, 6): 'forest'},
+        cities=({'id': 1, 'row': 0, 'col': 3, 'population': 1, 'border_level': 3},),
+    )
+
+
+def test_lumber_hut_needs_a_possible_sawmill_and_market():
+    relevant = relevant_actions(_strip(), TECHS)
+    # (0, 1) can hold a sawmill with a market at (0, 2)
+    assert ('build', (0, 0), 'lumber_hut') in relevant
+    assert ('build', (0, 1), 'sawmill') in relevant
+    assert ('build', (0, 2), 'market') in relevant
+    # No crop anywhere and no way to make one without construction, so farms never pay
+    assert not any(a[0] == 'build' and a[2] == 'farm' for a in relevant)
+
+
+def test_forest_cut_off_from_any_sawmill_is_pruned():
+    m = MapState(
+        terrain={(0, 0): 'land', (0, 1): 'mountain', (0, 2): 'land'},
+        resources={(0, 0): 'forest'},
+        cities=({'id': 1, 'row': 0, 'col': 2, 'population': 1, 'border_level': 2},),
+    )
+    assert ('build', (0, 0), 'lumber_hut') in legal_moves(m, TECHS)
+    assert relevant_actions(m, TECHS) == frozenset()
+
+
+def test_clearing_forest_is_relevant_only_where_a_build_needs_it():
+    m = MapState(
+        terrain={(0, c): 'land' for c in range(4)},
+        resources={(0, 0): 'forest', (0, 1): 'forest', (0, 3): 'forest'},
+        cities=({'id': 1, 'row': 0, 'col': 2, 'population': 1, 'border_level': 2},),
+    )
+    relevant = relevant_actions(m, TECHS)
+    # Clearing (0, 1) makes room for a sawmill between a lumber hut and a market
+    assert ('clear_forest', (0, 1)) in relevant
+    assert ('build', (0, 1), 'sawmill') not in legal_moves(m, TECHS)
+
+
+def test_generators_agree_on_pruned_moves():
+    m = _strip()
+    relevant = relevant_actions(m, TECHS)
+    pruned = legal_moves(m, TECHS, relevant)
+    assert set(pruned) < set(legal_moves(m, TECHS))
+    assert MoveGenerator(m, TECHS, relevant).moves() == pruned
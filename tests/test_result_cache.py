@@ -0,0 +1,36 @@
+from result_cache import ResultCache, content_key
+
+
+def test_content_key_ignores_key_order():
+    assert content_key({'a': 1, 'b': [1, 2]}) == content_key({'b': [1, 2], 'a': 1})
+    assert content_key({'a': 1}) != content_key({'a': 2})
+
+
+def test_lru_eviction_and_counters():
+    cache = ResultCache(max_entries=2)
+    cache.put('a', {'v': 1})
+    cache.put('b', {'v': 2})
+    assert cache.get('a') == {'v': 1}
+    cache.put('c', {'v': 3})
+    assert cache.get('b') is None
+    assert cache.get('a') == {'v': 1}
+    assert cache.get('c') == {'v': 3}
+    assert len(cache) == 2
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['persistent']) == (3, 1, False)
+
+
+def test_sqlite_tier_survives_restart(tmp_path):
+    path = tmp_path / 'results.sqlite'
+    cache = ResultCache(max_entries=1, path=path)
+    cache.put('a', {'v': 1})
+    cache.put('b', {'v': 2})
+    # Evicted from memory but still on disk
+    assert cache.get('a') == {'v': 1}
+    assert cache.disk_hits == 1
+    cache.close()
+
+    reopened = ResultCache(path=path)
+    assert reopened.get('b') == {'v': 2}
+    assert reopened.stats()['disk_hits'] == 1
+    reopened.close()
@@ -1,3 +1,6 @@
+import threading
+
+import rules as rules_module
 from rules import (
     TERRAIN_TYPES, RESOURCE_TYPES, valid_resources_for_terrain,
     can_build, BUILDINGS,
@@ -5,7 +8,7 @@ from rules import (
     ONE_PER_CITY,
     TECHS, techs_unlocking_building, techs_unlocking_action, available_with_techs,
     TERRAIN_ACTIONS, MAP_SHAPES,
-    HARVEST_ACTIONS,
+    HARVEST_ACTIONS, RULES, RuleSet, TECH_MASK_CACHE_SIZE,
 )
 
 
@@ -195,3 +198,77 @@ def test_harvest_fruit():
     assert h['cost'] == 2
     assert h['population'] == 1
     assert h['tech'] == 'organization'
+
+
+def test_ruleset_ids_start_at_one():
+    assert RULES.terrains[0] is None and RULES.resources[0] is None
+    assert RULES.buildings[1:] == tuple(BUILDINGS)
+    assert RULES.building_ids['sawmill'] == 1
+
+
+def test_ruleset_buildable_matches_eligible():
+    for terrain in RULES.terrains[1:]:
+        for resource in RULES.resources:
+            expected = [b for b in BUILDINGS if (terrain, resource) in BUILDINGS[b]['eligible']]
+            assert RULES.names_in(RULES.buildable_at(terrain, resource)) == expected
+    assert RULES.buildable_at(None, None) == 0
+
+
+def test_ruleset_unlock_masks_match_techs():
+    for building, i in RULES.building_ids.items():
+        assert RULES.building_unlock[i] == RULES.tech_mask(techs_unlocking_building(building))
+    for action, i in RULES.action_ids.items():
+        assert RULES.action_unlock[i] == RULES.tech_mask(techs_unlocking_action(action))
+
+
+def test_ruleset_available_buildings():
+    for techs in (frozenset(), frozenset({'mining'}), frozenset(TECHS)):
+        available = available_with_techs(techs)['buildings']
+        unlocked = {b for b in BUILDINGS if not techs_unlocking_building(b)}
+        names = RULES.names_in(RULES.available_buildings(RULES.tech_mask(techs)))
+        assert set(names) == available | unlocked
+
+
+def test_ruleset_tech_mask_ignores_unknown():
+    assert RULES.tech_mask(frozenset({'mining', 'teleportation'})) == RULES.tech_bits['mining']
+    assert RULES.tech_mask(['mining']) == RULES.tech_bits['mining']
+
+
+def test_ruleset_tech_mask_cache_is_bounded():
+    rules = RuleSet()
+    rules.tech_mask(frozenset({'mining', 'teleportation'}))
+    assert frozenset({'mining', 'teleportation'}) not in rules._masks
+    names = list(TECHS)
+    sets = [frozenset(n for bit, n in enumerate(names) if i >> bit & 1)
+            for i in range(TECH_MASK_CACHE_SIZE + 10)]
+    for techs in sets:
+        assert rules.tech_mask(techs) == rules.tech_mask(iter(techs))
+    assert len(rules._masks) == TECH_MASK_CACHE_SIZE
+    assert sets[-1] in rules._masks and sets[0] not in rules._masks
+    for mask in range(TECH_MASK_CACHE_SIZE + 10):
+        rules.available_buildings(mask)
+    assert len(rules._available) == TECH_MASK_CACHE_SIZE
+
+
+def test_ruleset_caches_evict_safely_across_threads(monkeypatch):
+    monkeypatch.setattr(rules_module, 'TECH_MASK_CACHE_SIZE', 8)
+    rules = RuleSet()
+    names = list(TECHS)
+    errors = []
+
+    def work(offset):
+        try:
+            for i in range(offset, offset + 2000):
+                techs = frozenset(n for bit, n in enumerate(names) if i >> bit & 1)
+                assert rules.tech_mask(techs) == rules.tech_mask(iter(techs))
+                rules.available_buildings(i)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(n * 2000,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(rules._masks) <= 8 and len(rules._available) <= 8
@@ -1,4 +1,11 @@
+import json
+import time
+
 import pytest
+
+import server
+from jobs import JobQueue
+from result_cache import ResultCache
 from server import app
 
 @pytest.fixture
@@ -29,6 +36,8 @@ def test_optimize_returns_expected_keys(client):
     assert 'placements' in data
     assert 'markets' in data
     assert 'total_income' in data
+    assert data['total_cost'] == 0
+    assert data['total_population'] == 0
 
 def test_optimize_bad_request(client):
     resp = client.post('/optimize', data='not json', content_type='text/plain')
@@ -60,3 +69,355 @@ def test_end_to_end_realistic(client):
     assert len(data['markets']) >= 1
     market = data['markets'][0]
     assert 0 <= market['income'] <= 8
+
+
+# Land around one city, with forest to build lumber huts on
+THREE_TILES = [
+    {'row': 0, 'col': 0, 'terrain': 'land', 'resource': 'forest'},
+    {'row': 0, 'col': 1, 'terrain': 'land'},
+    {'row': 1, 'col': 1, 'terrain': 'land'},
+]
+FOUR_TILES = [*THREE_TILES, {'row': 1, 'col': 0, 'terrain': 'land', 'resource': 'forest'}]
+
+
+def _payload(tiles=THREE_TILES, **fields):
+    """Request body for one city at (1, 1) on tiles, with sawmill techs; fields are added."""
+    return {
+        'tiles': tiles,
+        'cities': [{'id': 1, 'row': 1, 'col': 1, 'population': 1, 'border_level': 1}],
+        'techs': ['mathematics', 'trade', 'forestry'],
+        **fields,
+    }
+
+
+@pytest.fixture
+def job_queue(monkeypatch):
+    """Make server.jobs a JobQueue built with the given options; shut down after the test."""
+    queues = []
+
+    def make(**options):
+        queues.append(JobQueue(server._optimize_job, **options))
+        monkeypatch.setattr(server, 'jobs', queues[-1])
+        return queues[-1]
+
+    yield make
+    for queue in queues:
+        queue.shutdown()
+
+
+@pytest.fixture
+def pool_workers(monkeypatch):
+    """Set server.POOL_WORKERS for a test, with a shared pool of its own."""
+    monkeypatch.setattr(server, '_pool', None)
+    yield lambda workers: monkeypatch.setattr(server, 'POOL_WORKERS', workers)
+    if server._pool is not None:
+        server._pool.shutdown()
+
+
+def test_optimize_beam_strategy(client):
+    payload = _payload(FOUR_TILES, strategy='beam', beam_width=2)
+    resp = client.post('/optimize', json=payload)
+    assert resp.status_code == 200
+    assert resp.get_json()['total_income'] > 0
+
+
+def test_optimize_unknown_strategy(client):
+    payload = {
+        'tiles': [{'row': 0, 'col': 0, 'terrain': 'land'}],
+        'strategy': 'sideways',
+    }
+    resp = client.post('/optimize', json=payload)
+    assert resp.status_code == 400
+
+
+def test_optimize_time_budget(client):
+    payload = _payload(time_budget_ms=5000)
+    resp = client.post('/optimize', json=payload)
+    assert resp.status_code == 200
+    assert resp.get_json()['complete'] is True
+
+
+def test_optimize_stats(client):
+    payload = _payload()
+    assert 'stats' not in client.post('/optimize', json=payload).get_json()
+    # Served from the cache without stats, but a stats request runs the search
+    stats = client.post('/optimize', json={**payload, 'stats': True}).get_json()['stats']
+    assert set(stats['phases']) >= {'optimize', 'moves', 'apply', 'score'}
+    assert stats['phases']['apply']['calls'] == stats['candidates'] > 0
+    assert stats['steps'] == len(stats['candidates_per_step'])
+    assert client.post('/optimize', json={**payload, 'stats': 1}).status_code == 400
+
+
+def test_optimize_invalid_time_budget(client):
+    payload = {'tiles': [{'row': 0, 'col': 0, 'terrain': 'land'}], 'time_budget_ms': -1}
+    resp = client.post('/optimize', json=payload)
+    assert resp.status_code == 400
+
+
+def test_job_submit_and_poll(client, job_queue):
+    job_queue()
+    payload = _payload(FOUR_TILES)
+    resp = client.post('/jobs', json=payload)
+    assert resp.status_code == 202
+    job_id = resp.get_json()['id']
+    assert resp.headers['Location'] == f'/jobs/{job_id}'
+
+    end = time.monotonic() + 10
+    while True:
+        info = client.get(f'/jobs/{job_id}').get_json()
+        if info['status'] == 'done' or time.monotonic() > end:
+            break
+        time.sleep(0.02)
+    assert info['status'] == 'done'
+    assert info['result']['total_income'] > 0
+    assert client.delete(f'/jobs/{job_id}').status_code == 409
+
+
+def test_unknown_job(client):
+    assert client.get('/jobs/missing').status_code == 404
+    assert client.delete('/jobs/missing').status_code == 404
+
+
+def test_job_queue_full(client, job_queue):
+    job_queue(max_queued=0)
+    resp = client.post('/jobs', json={'tiles': [{'row': 0, 'col': 0, 'terrain': 'land'}]})
+    assert resp.status_code == 429
+
+
+def test_optimize_stream(client):
+    payload = _payload(FOUR_TILES)
+    resp = client.post('/optimize/stream', json=payload)
+    assert resp.status_code == 200
+    assert resp.mimetype == 'text/event-stream'
+    events = []
+    for frame in resp.get_data(as_text=True).strip().split('\n\n'):
+        kind, data = frame.split('\n')
+        events.append((kind.removeprefix('event: '), json.loads(data.removeprefix('data: '))))
+    *progress, (last_kind, result) = events
+    assert last_kind == 'result'
+    assert progress and all(kind == 'progress' for kind, _ in progress)
+    assert [e['step'] for _, e in progress] == list(range(1, len(progress) + 1))
+    assert progress[-1][1]['income'] == result['total_income'] > 0
+    assert result['complete'] is True
+
+
+def test_optimize_stream_uses_cache(client, monkeypatch):
+    monkeypatch.setattr(server, 'result_cache', ResultCache())
+    payload = _payload()
+    first = client.post('/optimize/stream', json=payload)
+    assert first.headers['X-Cache'] == 'miss'
+    result = first.get_data(as_text=True).strip().split('\n\n')[-1]
+    again = client.post('/optimize/stream', json=payload)
+    assert again.headers['X-Cache'] == 'hit'
+    assert again.get_data(as_text=True).strip() == result
+    # The stream and /optimize share one cache
+    plain = client.post('/optimize', json=payload)
+    assert plain.headers['X-Cache'] == 'hit'
+    assert json.loads(result.split('data: ', 1)[1]) == plain.get_json()
+
+
+def test_optimize_stream_rejects_bad_options(client):
+    resp = client.post('/optimize/stream', json={'tiles': [], 'strategy': 'sideways'})
+    assert resp.status_code == 400
+
+
+def test_optimize_cache(client, monkeypatch):
+    monkeypatch.setattr(server, 'result_cache', ResultCache())
+    payload = _payload()
+    first = client.post('/optimize', json=payload)
+    assert first.headers['X-Cache'] == 'miss'
+
+    reordered = {**payload, 'tiles': THREE_TILES[::-1], 'techs': payload['techs'][::-1]}
+    second = client.post('/optimize', json=reordered)
+    assert second.headers['X-Cache'] == 'hit'
+    assert second.get_json() == first.get_json()
+
+    other = client.post('/optimize', json={**payload, 'strategy': 'beam'})
+    assert other.headers['X-Cache'] == 'miss'
+    stats = client.get('/cache').get_json()
+    assert (stats['hits'], stats['misses']) == (1, 2)
+
+
+def test_optimize_warm_start(client):
+    payload = _payload(FOUR_TILES)
+    first = client.post('/optimize', json=payload).get_json()
+    warm = client.post('/optimize', json={
+        **payload, 'seed_actions': first['actions'], 'changed': [{'row': 0, 'col': 1}],
+    })
+    assert warm.status_code == 200
+    assert warm.get_json()['total_income'] == first['total_income']
+    # No listed changes: the rest of the map is still searched after the seed
+    resumed = client.post('/optimize', json={
+        **payload, 'seed_actions': first['actions'][:1], 'changed': [],
+    })
+    assert resumed.get_json()['total_income'] == first['total_income'] > 0
+
+    for seed in ['build', [['build', [0, 0]]], [['build', [0, 1], 'castle']],
+                 [['teleport', [0, 1]]], [['clear_forest', [0]]], [['harvest', [0, 'a']]],
+                 [['expand_borders', [1, 1]]], [[['build'], [0, 1], 'sawmill']]]:
+        bad = client.post('/optimize', json={**payload, 'seed_actions': seed})
+        assert bad.status_code == 400, seed
+    batch = client.post('/optimize/batch', json={
+        'base': payload, 'scenarios': [{}, {'seed_actions': [['build', [0, 0]]]}],
+    })
+    assert batch.status_code == 400
+    assert batch.get_json()['error'].startswith('scenarios[1]: seed_actions[0]')
+
+
+def test_optimize_decompose(client):
+    tiles = [
+        {'row': r, 'col': c, 'terrain': 'land', **({'resource': 'forest'} if r == 0 else {})}
+        for r in range(3) for c in list(range(3)) + list(range(12, 15))
+    ]
+    payload = {
+        'tiles': tiles,
+        'cities': [
+            {'id': 1, 'row': 1, 'col': 1, 'population': 1, 'border_level': 1},
+            {'id': 2, 'row': 1, 'col': 13, 'population': 1, 'border_level': 1},
+        ],
+        'techs': ['mathematics', 'trade', 'forestry'],
+    }
+    whole = client.post('/optimize', json=payload).get_json()
+    split = client.post('/optimize', json={**payload, 'decompose': True})
+    assert split.status_code == 200
+    assert split.get_json()['total_income'] == whole['total_income'] > 0
+    assert client.post('/optimize', json={**payload, 'decompose': 'yes'}).status_code == 400
+
+
+def _metric(text, sample):
+    for line in text.splitlines():
+        if line.startswith(sample + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+
+def test_metrics(client):
+    before = client.get('/metrics').get_data(as_text=True)
+    payload = _payload(techs=['mathematics', 'trade', 'forestry', 'hunting'],
+                       strategy='beam', beam_width=2)
+    plan = client.post('/optimize', json=payload).get_json()
+    client.post('/optimize', data='not json', content_type='text/plain')
+    client.get('/rules/map-shapes')
+    resp = client.get('/metrics')
+    assert resp.status_code == 200
+    assert resp.mimetype == 'text/plain'
+    after = resp.get_data(as_text=True)
+
+    def grew(sample):
+        return _metric(after, sample) - _metric(before, sample)
+
+    assert grew('http_request_duration_seconds_count{endpoint="/optimize"}') == 2
+    assert grew('http_request_duration_seconds_count{endpoint="/rules/map-shapes"}') == 1
+    assert grew('http_requests_total{endpoint="/optimize",method="POST",status="200"}') == 1
+    assert grew('http_request_errors_total{endpoint="/optimize",status="400"}') == 1
+    # Only the /metrics request itself is in flight; streams left open by
+    # other tests count until their responses close
+    assert grew('http_requests_in_flight') == 0
+    assert grew('optimizer_runs_total{strategy="beam"}') == 1
+    assert grew('optimizer_nodes_total') > 0
+    # Beam search scores every child it builds
+    assert grew('optimizer_moves_evaluated_total') == grew('optimizer_nodes_total')
+    assert grew('optimizer_steps_total') == len(plan['actions']) > 0
+    assert grew('optimizer_search_duration_seconds_count{strategy="beam"}') == 1
+    assert grew('optimizer_map_side_tiles_bucket{le="11"}') == 1
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_optimize_batch(client, monkeypatch, pool_workers, workers):
+    pool_workers(workers)
+    monkeypatch.setattr(server, 'result_cache', ResultCache())
+    base = {
+        'tiles': [
+            {'row': r, 'col': c, 'terrain': 'land', **({'resource': 'forest'} if r == 0 else {})}
+            for r in range(3) for c in range(3)
+        ],
+        'cities': [{'id': 1, 'row': 1, 'col': 1, 'population': 1, 'border_level': 1}],
+        'techs': ['mathematics', 'trade', 'forestry'],
+    }
+    scenarios = [
+        {},
+        {'techs': ['forestry']},
+        {'pinned': [{'row': 1, 'col': 0, 'building': 'market'}]},
+        {'tiles': [{'row': 0, 'col': 0, 'terrain': 'land'}], 'strategy': 'beam'},
+    ]
+    before = client.get('/metrics').get_data(as_text=True)
+    resp = client.post('/optimize/batch', json={'base': base, 'scenarios': scenarios})
+    assert resp.status_code == 200
+    results = resp.get_json()['results']
+    assert len(results) == len(scenarios)
+    after = client.get('/metrics').get_data(as_text=True)
+
+    def grew(sample):
+        return _metric(after, sample) - _metric(before, sample)
+
+    assert grew('optimizer_runs_total{strategy="greedy"}') == 3
+    assert grew('optimizer_runs_total{strategy="beam"}') == 1
+    assert grew('optimizer_nodes_total') > 0
+    assert grew('optimizer_search_duration_seconds_count{strategy="greedy"}') == 3
+    assert grew('optimizer_map_side_tiles_bucket{le="11"}') == 4
+    monkeypatch.setattr(server, 'result_cache', ResultCache())
+    for scenario, result in zip(scenarios, results):
+        single = client.post('/optimize', json={**base, **scenario})
+        assert single.headers['X-Cache'] == 'miss'
+        assert result == single.get_json()
+    # Complete plans are cached for later batches
+    again = client.post('/optimize/batch', json={'base': base, 'scenarios': scenarios})
+    assert again.get_json()['results'] == results
+    assert results[0]['total_income'] > results[1]['total_income'] == 0
+
+
+def test_optimize_batch_rejects_invalid_scenarios(client):
+    assert client.post('/optimize/batch', json={'scenarios': []}).status_code == 400
+    resp = client.post('/optimize/batch', json={'scenarios': [{}, {'strategy': 'sideways'}]})
+    assert resp.status_code == 400
+    assert resp.get_json()['error'].startswith('scenarios[1]')
+    resp = client.post('/optimize/batch', json={'scenarios': [{'tiles': [{'row': 0}]}]})
+    assert resp.status_code == 400
+
+
+def test_optimize_sweep(client):
+    payload = {
+        'tiles': [{'row': r, 'col': c, 'terrain': 'land',
+                   **({'resource': 'forest'} if (r + c) % 3 == 0 else {})}
+                  for r in range(5) for c in range(5)],
+        'cities': [{'id': 1, 'row': 2, 'col': 2, 'population': 1, 'border_level': 2}],
+        'techs': ['hunting'],
+        'sweep': ['trade', 'forestry', 'mathematics'],
+    }
+    data = client.post('/optimize/sweep', json=payload).get_json()
+    assert data['techs'] == ['forestry', 'mathematics', 'trade']
+    lattice = {tuple(entry['techs']): entry for entry in data['lattice']}
+    assert len(lattice) == 6
+    assert data['searches'] <= len(data['plans']) < len(lattice)
+    full = lattice[('forestry', 'mathematics', 'trade')]
+    assert full['total_income'] > 0
+    assert data['plans'][full['plan']]['total_income'] == full['total_income']
+    single = client.post('/optimize', json={
+        **payload, 'techs': ['hunting', 'forestry', 'mathematics', 'trade'],
+    }).get_json()
+    assert full['total_income'] >= single['total_income']
+
+
+def test_optimize_sweep_rejects_other_techs(client):
+    resp = client.post('/optimize/sweep', json={'tiles': [], 'sweep': ['sailing']})
+    assert resp.status_code == 400
+
+
+def test_metrics_time_streams_until_closed(client, monkeypatch):
+    monkeypatch.setattr(server, 'result_cache', ResultCache())
+    payload = _payload()
+    sample = 'http_request_duration_seconds_count{endpoint="/optimize/stream"}'
+    before = client.get('/metrics').get_data(as_text=True)
+
+    def grew(text, name):
+        return _metric(text, name) - _metric(before, name)
+
+    resp = client.post('/optimize/stream', json=payload)
+    during = client.get('/metrics').get_data(as_text=True)
+    assert grew(during, sample) == 0
+    assert grew(during, 'http_requests_in_flight') == 1
+    resp.get_data()
+    resp.close()
+    after = client.get('/metrics').get_data(as_text=True)
+    assert grew(after, sample) == 1
+    assert grew(after, 'http_requests_in_flight') == 0
@@ -0,0 +1,78 @@
+import coordinate_descent
+import solver_exact
+from actions import validate_action, apply_action
+from economics import total_income, building_value
+from map_state import MapState
+from optimizer import optimize
+from solver_exact import solve
+from tests.support import PLANNER_TECHS as TECHS, patterned_map
+
+
+def test_single_market_optimum():
+    """Sawmill with two lumber huts next to the only free tile: the market is worth 2."""
+    m = MapState(
+        terrain={(r, c): 'land' for r in range(3) for c in range(3)},
+        resources={(0, 1): 'forest', (1, 0): 'forest'},
+        buildings={(0, 0): 'sawmill', (0, 1): 'lumber_hut', (1, 0): 'lumber_hut'},
+        cities=({'id': 1, 'row': 1, 'col': 1, 'population': 5, 'border_level': 1},),
+    )
+    result = solve(m, TECHS)
+    assert result['optimal']
+    assert result['income'] == 2
+    assert result['gap'] == 0
+    assert any(a[2] == 'market' for a in result['actions'])
+
+
+def test_plan_is_legal_and_scores_its_income():
+    m = patterned_map()
+    result = solve(m, TECHS)
+    state = m
+    for action in result['actions']:
+        assert validate_action(state, action, TECHS) is None
+        state = apply_action(state, action)
+    assert state == result['state']
+    assert result['income'] == total_income(state)
+    assert result['optimal']
+    assert result['bound'] == result['income']
+
+
+def test_at_least_as_good_as_greedy():
+    m = patterned_map()
+    greedy = optimize(m, TECHS, lambda s, a: (total_income(s), building_value(s)))
+    assert solve(m, TECHS)['income'] >= greedy['income']
+
+
+def test_node_limit_reports_bound():
+    m = patterned_map()
+    full = solve(m, TECHS)
+    partial = solve(m, TECHS, node_limit=1)
+    assert not partial['optimal']
+    assert partial['income'] == total_income(partial['state'])
+    assert partial['bound'] >= full['income'] >= partial['income']
+    assert partial['gap'] == partial['bound'] - partial['income']
+
+
+def test_symmetry_pruning_keeps_the_optimum(monkeypatch):
+    # The forests at (0, 0) and (1, 0) have the same neighbours with options
+    terrain = {(r, c): 'land' for r in range(3) for c in range(3)}
+    terrain[(2, 0)] = terrain[(2, 1)] = 'mountain'
+    m = MapState(
+        terrain=terrain,
+        resources={(0, 0): 'forest', (1, 0): 'forest', (0, 2): 'forest'},
+        cities=({'id': 1, 'row': 1, 'col': 1, 'population': 5, 'border_level': 1},),
+    )
+    search = solver_exact._Search(m, TECHS, None, None)
+    assert search.twin
+    pruned = solve(m, TECHS)
+    monkeypatch.setattr(solver_exact._Search, '_twins', lambda self: {})
+    plain = solve(m, TECHS)
+    assert pruned['optimal'] and plain['optimal']
+    assert pruned['income'] == plain['income']
+    assert pruned['nodes'] <= plain['nodes']
+
+
+def test_incumbent_starts_from_coordinate_descent():
+    m = patterned_map()
+    seeded = solve(m, TECHS, node_limit=1)
+    descent = coordinate_descent.solve(m, TECHS, lambda s, a: total_income(s), workers=1)
+    assert seeded['income'] >= descent['income']
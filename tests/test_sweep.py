@@ -0,0 +1,49 @@
+from map_state import MapState
+from optimizer import optimize
+from sweep import sweep, tech_sets, with_prerequisites, prerequisites, ECONOMY_TECHS
+from tests.support import score_with_cost
+
+
+def _map():
+    terrain = {(r, c): 'land' for r in range(6) for c in range(6)}
+    terrain[(0, 0)] = terrain[(0, 1)] = 'mountain'
+    resources = {(0, 0): 'metal', (0, 1): 'metal', (2, 0): 'forest', (3, 0): 'forest',
+                 (0, 3): 'crop', (1, 4): 'crop', (4, 4): 'animal'}
+    return MapState(
+        terrain=terrain, resources=resources,
+        cities=({'id': 1, 'row': 2, 'col': 2, 'population': 1, 'border_level': 2},),
+    )
+
+
+def test_tech_sets_are_researchable():
+    sets = tech_sets(('forestry', 'mathematics', 'trade'))
+    assert sets == [
+        frozenset(), frozenset({'forestry'}), frozenset({'trade'}),
+        frozenset({'forestry', 'mathematics'}), frozenset({'forestry', 'trade'}),
+        frozenset({'forestry', 'mathematics', 'trade'}),
+    ]
+    # A held prerequisite frees the techs that need it
+    assert frozenset({'mathematics'}) in tech_sets(('mathematics',), held={'forestry'})
+    assert prerequisites('mathematics') == ['forestry', 'hunting']
+    assert with_prerequisites({'smithery'}) == {'smithery', 'mining', 'climbing'}
+    assert 'climbing' not in ECONOMY_TECHS and 'hunting' in ECONOMY_TECHS
+
+
+def test_sweep_matches_separate_searches():
+    state = _map()
+    techs = ('mining', 'smithery', 'forestry', 'mathematics', 'trade')
+    out = sweep(state, score_with_cost, techs, max_depth=30)
+    results = out['results']
+    assert set(results) == set(tech_sets(techs))
+    # Without trade there is no market, so every such set shares one search
+    assert out['searches'] < len(results)
+    assert results[frozenset({'mining'})] is results[frozenset()]
+    for subset, result in results.items():
+        alone = optimize(state, with_prerequisites(subset), score_with_cost, max_depth=30)
+        assert result['income'] >= alone['income']
+        # Seeded from a subset's plan, income never drops as techs are added
+        for t in subset:
+            if subset - {t} in results:
+                assert result['income'] >= results[subset - {t}]['income']
+    lumber = results[frozenset({'forestry', 'mathematics', 'trade'})]
+    assert results[frozenset(techs)]['income'] > lumber['income'] > 0
@@ -0,0 +1,55 @@
+from actions import apply_action
+from grid_state import GridState
+from map_state import MapState
+from zobrist import state_hash
+
+
+def _map():
+    return MapState(
+        terrain={(r, c): 'land' for r in range(6) for c in range(6)},
+        resources={(0, 0): 'forest', (4, 4): 'forest'},
+        villages=frozenset({(4, 1)}),
+        cities=({'id': 1, 'row': 1, 'col': 1, 'population': 1, 'border_level': 1},),
+    )
+
+
+ACTIONS = [
+    ('build', (1, 2), 'sawmill'),
+    ('clear_forest', (0, 0)),
+    ('found_city', (4, 1)),
+    ('expand_borders', 1),
+    ('grow_forest', (2, 2)),
+    ('burn_forest', (4, 4)),
+    ('build', (0, 0), 'market'),
+]
+
+
+def test_incremental_hash_matches_full_hash():
+    for m in (_map(), GridState.from_map_state(_map())):
+        m.zobrist()
+        for action in ACTIONS:
+            m = apply_action(m, action)
+            assert m.zobrist() == state_hash(m)
+
+
+def test_same_state_by_different_orders_hashes_equal():
+    m = _map()
+    m.zobrist()
+    a = apply_action(apply_action(m, ('build', (1, 2), 'sawmill')), ('build', (2, 1), 'market'))
+    b = apply_action(apply_action(m, ('build', (2, 1), 'market')), ('build', (1, 2), 'sawmill'))
+    assert a == b
+    assert hash(a) == hash(b)
+    assert len({a, b}) == 1
+
+
+def test_different_states_hash_differently():
+    m = _map()
+    a = apply_action(m, ('build', (1, 2), 'sawmill'))
+    b = apply_action(m, ('build', (1, 2), 'market'))
+    assert hash(a) != hash(b)
+
+
+def test_grid_and_map_states_hash_alike():
+    m = _map()
+    assert GridState.from_map_state(m).zobrist() == m.zobrist()
+
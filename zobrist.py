@@ -0,0 +1,45 @@
+from functools import lru_cache
+from hashlib import blake2b
+
+
+@lru_cache(maxsize=None)
+def key(*parts):
+    """Pseudo-random 64-bit key for one map feature, stable across processes."""
+    digest = blake2b(repr(parts).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def city_key(city):
+    return key('city', city['id'], city['row'], city['col'], city['border_level'])
+
+
+def layer_delta(layer, pos, old, new):
+    """XOR that replaces old with new at pos in a layer; None means absent."""
+    delta = 0
+    if old is not None:
+        delta ^= key(layer, pos, old)
+    if new is not None:
+        delta ^= key(layer, pos, new)
+    return delta
+
+
+def state_hash(state):
+    """Full Zobrist hash of a MapState-like state; equal states hash equal."""
+    h = 0
+    for layer, values in (
+        ('terrain', state.terrain),
+        ('resource', state.resources),
+        ('building', state.buildings),
+    ):
+        for pos, value in values.items():
+            h ^= key(layer, pos, value)
+    for city in state.cities:
+        h ^= city_key(city)
+    for layer, positions in (
+        ('village', state.villages),
+        ('monument', state.monuments),
+        ('lighthouse', state.lighthouses),
+    ):
+        for pos in positions:
+            h ^= key(layer, pos)
+    return h